@@ -0,0 +1,33 @@
+"""接口批量导入/导出的目录只能落在 BULK_LOAD_DIR 下"""
+
+import os
+
+import pytest
+
+from app.Utils.Bulk_Load import resolve_directory
+
+
+def test_relative_directory_is_resolved_under_root(tmp_path):
+    assert resolve_directory("clone/kb", str(tmp_path)) == os.path.join(os.path.realpath(tmp_path), "clone", "kb")
+
+
+@pytest.mark.parametrize("directory", ["", "/etc", "../outside", "a/../../outside", "a\\..\\..\\outside"])
+def test_escaping_directory_is_rejected(tmp_path, directory):
+    with pytest.raises(ValueError):
+        resolve_directory(directory, str(tmp_path))
+
+
+def test_symlink_out_of_root_is_rejected(tmp_path):
+    root = tmp_path / "bulk"
+    root.mkdir()
+    (root / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        resolve_directory("link/..data", str(root))
+    with pytest.raises(ValueError):
+        resolve_directory("link", str(root))
+
+
+def test_path_already_under_root_is_accepted(tmp_path):
+    # 快照接口返回的 snapshot_dir 已经带着根目录，可以直接传给 /restore
+    snapshot = tmp_path / "kb" / "20260101_000000"
+    assert resolve_directory(str(snapshot), str(tmp_path)) == os.path.realpath(snapshot)
@@ -0,0 +1,72 @@
+"""知识库驻留：已加载的知识库不受其他知识库加载的阻塞，被其他进程释放后重新加载"""
+
+import threading
+import time
+
+from pymilvus.client.types import LoadState
+
+from app.Utils import Collection_Residency
+from app.Utils.Collection_Residency import CollectionResidencyManager
+
+
+class FakeClient:
+    def __init__(self, loaded):
+        self.loaded = set(loaded)
+        self.loads = []
+        self.load_gate = threading.Event()
+        self.load_gate.set()
+
+    def list_collections(self):
+        return sorted(self.loaded | {"b"})
+
+    def get_load_state(self, collection_name):
+        return {"state": LoadState.Loaded if collection_name in self.loaded else LoadState.NotLoad}
+
+    def get_collection_stats(self, collection_name):
+        return {"row_count": 10}
+
+    def describe_collection(self, collection_name):
+        return {"fields": []}
+
+    def load_collection(self, collection_name):
+        self.load_gate.wait(5)
+        self.loads.append(collection_name)
+        self.loaded.add(collection_name)
+
+    def release_collection(self, collection_name):
+        self.loaded.discard(collection_name)
+
+
+def make_manager(monkeypatch, client):
+    monkeypatch.setattr(Collection_Residency, "MilvusConnection", lambda: type("Connection", (), {"client": client})())
+    return CollectionResidencyManager(budget_mb=1024, pinned=[])
+
+
+def test_synced_collections_are_not_evicted_first(monkeypatch):
+    manager = make_manager(monkeypatch, FakeClient({"a"}))
+    assert manager.status()["resident_collections"][0]["idle_seconds"] is not None
+
+
+def test_resident_collection_not_blocked_by_loading(monkeypatch):
+    client = FakeClient({"a"})
+    manager = make_manager(monkeypatch, client)
+    client.load_gate.clear()
+    loader = threading.Thread(target=manager.ensure_loaded, args=("b",))
+    loader.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    manager.ensure_loaded("a")
+    assert time.perf_counter() - start < 0.5
+    client.load_gate.set()
+    loader.join()
+    assert manager.is_resident("b")
+
+
+def test_reload_after_release_by_other_process(monkeypatch):
+    monkeypatch.setattr(Collection_Residency, "COLLECTION_LOAD_CHECK_SECONDS", 0)
+    client = FakeClient({"a"})
+    manager = make_manager(monkeypatch, client)
+    client.release_collection("a")
+    manager.ensure_loaded("a")
+    assert client.loads == ["a"]
+    assert "a" in client.loaded
@@ -0,0 +1,71 @@
+"""知识库索引度量缓存与 EMBEDDING_NORMALIZE 兼容性检查"""
+
+import pytest
+
+from app.Utils import Collection_Schema
+from app.Utils.Collection_Schema import CollectionSchemaCache
+
+
+class FakeClient:
+    def __init__(self, indexes):
+        self.indexes = indexes  # {知识库: {字段: metric_type}}
+        self.describe_calls = 0
+
+    def has_collection(self, collection_name):
+        return collection_name in self.indexes
+
+    def list_indexes(self, collection_name):
+        return list(self.indexes[collection_name])
+
+    def describe_index(self, collection_name, index_name):
+        self.describe_calls += 1
+        return {"field_name": index_name, "metric_type": self.indexes[collection_name][index_name]}
+
+    def describe_collection(self, collection_name):
+        return {"fields": [{"name": "id"}] + [{"name": field} for field in self.indexes[collection_name]]}
+
+
+def test_metric_type_is_cached_until_invalidated():
+    client = FakeClient({"kb": {"embedding": "L2"}})
+    cache = CollectionSchemaCache(ttl_seconds=0)
+    assert cache.metric_type(client, "kb") == "L2"
+    client.indexes["kb"]["embedding"] = "IP"
+    assert cache.metric_type(client, "kb") == "L2"
+    assert client.describe_calls == 1
+    cache.invalidate("kb")
+    assert cache.metric_type(client, "kb") == "IP"
+
+
+def test_missing_collection_is_not_cached():
+    client = FakeClient({})
+    cache = CollectionSchemaCache(ttl_seconds=0)
+    assert cache.metric_type(client, "kb") is None
+    client.indexes["kb"] = {"embedding": "COSINE"}
+    assert cache.metric_type(client, "kb") == "COSINE"
+
+
+def test_field_names_follow_invalidation():
+    # 其他路径（快照恢复、删除重建）改变字段结构后，invalidate 或过期后重新读取
+    client = FakeClient({"kb": {"embedding": "IP", "sparse_embedding": "IP"}})
+    cache = CollectionSchemaCache(ttl_seconds=0)
+    assert "sparse_embedding" in cache.field_names(client, "kb")
+    client.indexes["kb"] = {"embedding": "IP"}
+    assert "sparse_embedding" in cache.field_names(client, "kb")
+    cache.invalidate("kb")
+    assert cache.field_names(client, "kb") == {"id", "embedding"}
+    assert cache.field_names(client, "missing") == frozenset()
+
+
+@pytest.mark.parametrize("normalize, metric, allowed", [
+    (True, "IP", True), (True, "COSINE", True), (True, "L2", False),
+    (False, "COSINE", True), (False, "L2", True), (False, "IP", False),
+])
+def test_check_vectors(monkeypatch, normalize, metric, allowed):
+    monkeypatch.setattr(Collection_Schema, "EMBEDDING_NORMALIZE", normalize)
+    cache = CollectionSchemaCache(ttl_seconds=0)
+    client = FakeClient({"kb": {"embedding": metric}})
+    if allowed:
+        cache.check_vectors(client, "kb")
+    else:
+        with pytest.raises(ValueError):
+            cache.check_vectors(client, "kb")
@@ -0,0 +1,66 @@
+"""按文件ID删除：一次查询被删除的文件，计数只包含确实存在的文件"""
+
+import json
+import threading
+
+from app.Utils.milvus_utils import My_MilvusClient
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = rows  # [{"file_id": ..., "file_name": ...}]
+        self.filters = []
+
+    def query(self, collection_name, filter=None, output_fields=None, limit=None, **kwargs):
+        self.filters.append(filter)
+        matched = [row for row in self.rows if json.dumps(row["file_id"]) in filter]
+        return [{field: row[field] for field in output_fields} for row in matched[:limit]]
+
+    def delete(self, collection_name, filter=None, **kwargs):
+        before = len(self.rows)
+        self.rows = [row for row in self.rows if json.dumps(row["file_id"]) not in filter]
+        return {"delete_count": before - len(self.rows)}
+
+
+def make_client(rows) -> My_MilvusClient:
+    # 不连接Milvus，只替换底层客户端
+    client = object.__new__(My_MilvusClient)
+    client.client = FakeClient(rows)
+    client.collection_name = "kb"
+    client._catalog_lock = threading.Lock()
+    client._file_catalog = None
+    return client
+
+
+def test_missing_ids_are_not_counted():
+    client = make_client([
+        {"file_id": "f1", "file_name": "a.xlsx"},
+        {"file_id": "f1", "file_name": "a.xlsx"},
+        {"file_id": "f2", "file_name": "b.xlsx"},
+    ])
+    result = client.delete_by_file_ids(["f1", "nope", "f2"])
+    assert result["file_names"] == {"f1": "a.xlsx", "f2": "b.xlsx"}
+    assert result["missing_file_ids"] == ["nope"]
+    assert result["delete_count"] == 3
+    # 所有文件ID合并为一次查询，没有全量加载文件目录
+    assert client.client.filters == [My_MilvusClient.file_id_filter(["f1", "nope", "f2"])]
+    assert client._file_catalog is None
+
+
+def test_nothing_found_skips_delete():
+    client = make_client([{"file_id": "f1", "file_name": "a.xlsx"}])
+    result = client.delete_by_file_ids(["nope"])
+    assert result == {"delete_count": 0, "file_names": {}, "missing_file_ids": ["nope"], "delete_result": None}
+    assert len(client.client.rows) == 1
+
+
+def test_full_window_queries_only_unseen_ids(monkeypatch):
+    from app.Utils import milvus_utils
+    monkeypatch.setattr(milvus_utils, "QUERY_WINDOW", 2)
+    client = make_client([
+        {"file_id": "f1", "file_name": "a.xlsx"},
+        {"file_id": "f1", "file_name": "a.xlsx"},
+        {"file_id": "f2", "file_name": "b.xlsx"},
+    ])
+    assert client._lookup_file_names(["f1", "f2"]) == {"f1": "a.xlsx", "f2": "b.xlsx"}
+    assert client.client.filters == [My_MilvusClient.file_id_filter(["f1", "f2"]), My_MilvusClient.file_id_filter(["f2"])]
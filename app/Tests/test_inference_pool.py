@@ -0,0 +1,69 @@
+"""推理池：维度握手，以及 max_length 随请求转发并按截断长度分组计算"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from app.Utils.Inference_Pool import InferenceClient, InferenceWorker, socket_path
+
+
+def start_worker(socket_dir, model_name="embedding") -> list:
+    calls = []
+
+    def compute(texts, max_length=None):
+        calls.append((list(texts), max_length))
+        # 第一列记录截断长度，方便断言结果按请求拆分正确
+        return np.array([[max_length or 0, len(text), 0] for text in texts], dtype=np.float32)
+
+    # 不加载模型，只替换前向计算
+    worker = object.__new__(InferenceWorker)
+    worker.model_name = model_name
+    worker.path = socket_path(model_name, 0, str(socket_dir))
+    worker.max_batch = 64
+    worker.max_wait = 0.05
+    worker._queue = queue.Queue()
+    worker._compute = compute
+    worker._op, worker._field = ("embed", "texts") if model_name == "embedding" else ("score", "pairs")
+    worker._info = {"model": model_name, "dim": 3}
+    threading.Thread(target=worker.serve, daemon=True).start()
+    for _ in range(100):
+        if InferenceClient(model_name, str(socket_dir))._discover(force=True):
+            break
+        time.sleep(0.02)
+    return calls
+
+
+def test_info_handshake_returns_dim(tmp_path):
+    start_worker(tmp_path)
+    info = InferenceClient("embedding", str(tmp_path)).info()
+    assert info["ok"] and info["dim"] == 3
+
+
+def test_max_length_is_forwarded_per_request(tmp_path):
+    calls = start_worker(tmp_path)
+    client = InferenceClient("embedding", str(tmp_path))
+    results = {}
+
+    def embed(key, texts, max_length):
+        results[key] = client.embed(texts, max_length)
+
+    threads = [
+        threading.Thread(target=embed, args=("short", ["a", "bb"], 16)),
+        threading.Thread(target=embed, args=("full", ["ccc"], None)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    np.testing.assert_array_equal(results["short"][:, :2], [[16, 1], [16, 2]])
+    np.testing.assert_array_equal(results["full"][:, :2], [[0, 3]])
+    assert sorted(max_length or 0 for _, max_length in calls) == [0, 16]
+
+
+def test_score_forwards_passage_max_length(tmp_path):
+    calls = start_worker(tmp_path, "reranker")
+    scores = InferenceClient("reranker", str(tmp_path)).score([["q", "passage"]], 32)
+    assert calls == [([["q", "passage"]], 32)]
+    assert scores.shape[0] == 1 and scores[0, 0] == 32
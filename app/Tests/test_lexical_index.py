@@ -0,0 +1,90 @@
+"""组件名称词法索引：精确匹配与按交易系统分区的BM25"""
+
+from app.Utils import Lexical_Index
+from app.Utils.Lexical_Index import _CollectionIndex, LexicalIndex
+
+
+def entity(name: str, system: str = "核心系统", file_id: str = "f1", description: str = "") -> dict:
+    return {"组件名称": name, "交易系统": system, "file_id": file_id, "组件说明": description}
+
+
+def make_index() -> _CollectionIndex:
+    index = _CollectionIndex()
+    index.add("1", entity("账户详情查询"))
+    index.add("2", entity("现金存款"))
+    index.add("3", entity("查询账户币种"))
+    index.add("4", entity("账户详情查询", system="手机银行"))
+    index.add("5", entity("查询二类账户编号", file_id="f2"))
+    return index
+
+
+def names(index: _CollectionIndex, pks) -> list:
+    return [index.docs[pk]["组件名称"] for pk in pks]
+
+
+def test_exact_match_filters_system_and_file():
+    index = make_index()
+    assert names(index, index.exact_match(" 账户详情查询", "核心系统", None)) == ["账户详情查询"]
+    assert index.exact_match("账户详情查询", "核心系统", "f2") == []
+
+
+def test_bm25_stays_in_system_partition():
+    index = make_index()
+    assert names(index, index.bm25("账户详情", "核心系统", None, 1)) == ["账户详情查询"]
+    assert index.bm25("账户详情", "不存在的系统", None, 5) == []
+    assert [index.docs[pk]["交易系统"] for pk in index.bm25("账户详情", "手机银行", None, 5)] == ["手机银行"]
+    assert names(index, index.bm25("账户编号", "核心系统", "f2", 5)) == ["查询二类账户编号"]
+
+
+def test_bm25_skips_common_terms(monkeypatch):
+    monkeypatch.setattr(Lexical_Index, "MIN_DF_CUTOFF", 1)
+    monkeypatch.setattr(Lexical_Index, "LEXICAL_MAX_DF_RATIO", 0.5)
+    index = _CollectionIndex()
+    for i in range(10):
+        index.add(str(i), entity(f"查询组件{i}"))
+    index.add("x", entity("查询现金存款"))
+    # 查询 出现在全部文档中，被跳过后只剩 现金存款 的二元组参与打分
+    assert names(index, index.bm25("查询现金", "核心系统", None, 5)) == ["查询现金存款"]
+    # 全部词项都很常见时仍保留最少见的一个
+    assert len(index.bm25("查询", "核心系统", None, 3)) == 3
+
+
+def test_remove_drops_postings():
+    index = make_index()
+    index.remove("4")
+    assert "手机银行" not in index.postings
+    assert index.bm25("账户详情", "手机银行", None, 5) == []
+    assert index.partition_counts["核心系统"] == 4
+
+
+class FakeClient:
+    def __init__(self, ids):
+        self.ids = set(ids)
+        self.calls = []
+
+    def query(self, collection_name, ids=None, output_fields=None, **kwargs):
+        self.calls.append((list(ids), kwargs))
+        return [{"id": pk} for pk in ids if pk in self.ids]
+
+
+def test_hits_deleted_by_other_workers_are_dropped():
+    lexical = LexicalIndex(collections=["kb"], enabled=True)
+    lexical._indexes["kb"] = make_index()
+    # 其他工作进程删除了主键 1，本进程的索引不知道
+    lexical._client = FakeClient({"2", "3", "4", "5"})
+    assert lexical.exact_match("kb", "账户详情查询", "核心系统") == []
+    assert "1" not in lexical._indexes["kb"].docs
+    assert [entity["组件名称"] for entity, _ in lexical.exact_match("kb", "现金存款", "核心系统")] == ["现金存款"]
+
+
+def test_one_verification_query_per_request():
+    lexical = LexicalIndex(collections=["kb"], enabled=True)
+    lexical._indexes["kb"] = make_index()
+    lexical._client = FakeClient({"1", "2", "3", "4", "5"})
+    results = lexical.exact_match_many("kb", ["账户详情查询", "现金存款", "不存在的组件"], "核心系统")
+    assert [len(results[name]) for name in ["账户详情查询", "现金存款", "不存在的组件"]] == [1, 1, 0]
+    searched = lexical.search_many("kb", ["账户详情", "账户编号"], "核心系统", 5)
+    assert searched["账户详情"][0][0]["组件名称"] == "账户详情查询"
+    # 精确匹配和BM25各一次，使用知识库默认一致性级别（不做强一致读）
+    assert len(lexical._client.calls) == 2
+    assert all("consistency_level" not in kwargs for _, kwargs in lexical._client.calls)
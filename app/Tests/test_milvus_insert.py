@@ -0,0 +1,26 @@
+"""MilvusFunctions.insert 按行分批插入，向量行保持为float32 ndarray"""
+
+import numpy as np
+
+from app.Utils.Milvus_Functions import MilvusFunctions
+
+
+class FakeClient:
+    def __init__(self):
+        self.batches = []
+
+    def has_collection(self, collection_name):
+        return True
+
+    def insert(self, collection_name, data):
+        self.batches.append(data)
+
+
+def test_rows_are_inserted_in_batches():
+    functions = object.__new__(MilvusFunctions)
+    functions.client = FakeClient()
+    embeddings = np.ones((5, 4), dtype=np.float32)
+    rows = [{"file_id": "f1", "file_name": "a.xlsx", "embedding": embeddings[i]} for i in range(5)]
+    functions.insert("kb", rows, batch_size=2)
+    assert [len(batch) for batch in functions.client.batches] == [2, 2, 1]
+    assert functions.client.batches[0][0]["embedding"].dtype == np.float32
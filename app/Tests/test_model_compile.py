@@ -0,0 +1,41 @@
+"""CompiledForward 在第一次调用时才编译：prefork 主进程创建模型时不执行前向计算"""
+
+import torch
+import torch.nn as nn
+
+from app.Utils.Model_Warmup import CompiledForward
+
+
+class TinyModel(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.embedding = nn.Embedding(16, 4)
+        self.calls = 0
+
+    def forward(self, input_ids, attention_mask=None, return_dict=True):
+        self.calls += 1
+        hidden = self.embedding(input_ids)
+        if attention_mask is not None:
+            hidden = hidden * attention_mask.unsqueeze(-1)
+        return (hidden,)
+
+
+def tokenizer(texts, padding=True, return_tensors="pt"):
+    length = max(len(text) for text in texts)
+    ids = [[1 + i % 15 for i in range(len(text))] + [0] * (length - len(text)) for text in texts]
+    mask = [[1] * len(text) + [0] * (length - len(text)) for text in texts]
+    return {"input_ids": torch.tensor(ids), "attention_mask": torch.tensor(mask)}
+
+
+def test_torchscript_trace_is_deferred_to_first_call():
+    model = TinyModel()
+    infer = CompiledForward("tiny", model, tokenizer, torch.device("cpu"), mode="torchscript")
+    assert model.calls == 0
+    assert infer.mode == "none"
+
+    inputs = tokenizer(["预热文本", "预热"])
+    with torch.no_grad():
+        output = infer(inputs)
+        expected = model(**inputs)[0]
+    assert infer.mode == "torchscript"
+    torch.testing.assert_close(output, expected)
@@ -0,0 +1,41 @@
+"""归一化向量的点积与原始向量的余弦相似度排序一致"""
+
+import numpy as np
+
+from app.Utils.embedding_utils import l2_normalize, cosine_similarities
+
+
+def make_vectors(seed: int = 0, rows: int = 500, dim: int = 64):
+    rng = np.random.default_rng(seed)
+    # 模长随机缩放，未归一化时内积与余弦的排序不同
+    vectors = (rng.standard_normal((rows, dim)) * rng.uniform(0.1, 10, (rows, 1))).astype(np.float32)
+    queries = rng.standard_normal((20, dim)).astype(np.float32)
+    return vectors, queries
+
+
+def test_l2_normalize():
+    vectors = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    np.testing.assert_allclose(l2_normalize(vectors), [[0.6, 0.8], [0.0, 0.0]])
+    np.testing.assert_allclose(np.linalg.norm(l2_normalize(vectors[0])), 1.0, rtol=1e-6)
+
+
+def test_normalized_dot_matches_raw_cosine():
+    vectors, queries = make_vectors()
+    normalized = l2_normalize(vectors)
+    for query in queries:
+        raw = cosine_similarities(query, vectors, normalized=False)
+        expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        dot = cosine_similarities(l2_normalize(query), normalized, normalized=True)
+        np.testing.assert_allclose(raw, expected, atol=1e-5)
+        np.testing.assert_allclose(dot, raw, atol=1e-5)
+        assert list(np.argsort(-dot)[:10]) == list(np.argsort(-raw)[:10])
+
+
+def test_raw_inner_product_ranks_differently():
+    # 对照：不归一化直接做内积时排序会被模长改变，上面的一致性检查才有意义
+    vectors, queries = make_vectors()
+    differs = [
+        list(np.argsort(-(vectors @ query))[:10]) != list(np.argsort(-cosine_similarities(query, vectors, normalized=False))[:10])
+        for query in queries
+    ]
+    assert any(differs)
@@ -0,0 +1,37 @@
+"""查询缓存：语义命中默认关闭；开启后向量索引按行追加/删除，与逐条计算的结果一致"""
+
+import numpy as np
+
+from app.Utils.Query_Cache import SemanticQueryCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_hits_are_opt_in():
+    cache = SemanticQueryCache(max_entries=8, ttl_seconds=0, enabled=True)
+    cache.put("/rerank/single", "查询二类账户编号", "二类", embedding=unit(1, 0.01))
+    cached, _ = cache.lookup("/rerank/single", "查询三类账户编号", lambda: unit(1, 0.02))
+    assert cached is None
+    assert cache._scopes == {}
+    cached, embedding = cache.lookup("/rerank/single", " 查询二类账户编号 ", lambda: unit(1, 0))
+    assert cached == "二类" and embedding is None
+
+
+def test_index_grows_and_shrinks_in_place():
+    cache = SemanticQueryCache(max_entries=40, ttl_seconds=0, similarity_threshold=0.99, enabled=True)
+    rng = np.random.default_rng(0)
+    vectors = {f"q{i}": unit(*rng.normal(size=8)) for i in range(60)}
+    for question, vector in vectors.items():
+        cache.put("/retrieval/search", question, question, embedding=vector)
+    # 超出容量按LRU淘汰，索引中只保留仍在缓存中的条目
+    index = next(iter(cache._scopes.values()))
+    assert sorted(key[-1] for key in index.keys) == sorted(f"q{i}" for i in range(20, 60))
+    for row, key in enumerate(index.keys):
+        np.testing.assert_allclose(index.matrix[row], vectors[key[-1]], atol=1e-6)
+    cached, _ = cache.lookup("/retrieval/search", "other", lambda: vectors["q42"])
+    assert cached == "q42"
+    cached, _ = cache.lookup("/retrieval/search", "other", lambda: vectors["q3"])
+    assert cached is None
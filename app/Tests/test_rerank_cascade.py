@@ -0,0 +1,48 @@
+"""级联重排：归一化/距离类的初始分数不能让向量检索第一名跳过重排模型"""
+
+from app.Utils.reranker_utils import RerankerModel
+
+# 重排模型更偏好 账户详情查询
+MODEL_SCORES = {"现金存款": 0.2, "账户详情查询": 0.9, "账户信息查询": 0.5}
+
+
+def make_model() -> RerankerModel:
+    # 不加载权重，只替换 rerank 的打分
+    model = object.__new__(RerankerModel)
+    model.calls = []
+
+    def rerank(query, passages, top_k=None, passage_max_tokens=None):
+        model.calls.append(list(passages))
+        scored = sorted(((passage, MODEL_SCORES[passage]) for passage in passages), key=lambda item: -item[1])
+        return scored[:top_k] if top_k is not None else scored
+
+    model.rerank = rerank
+    return model
+
+
+def test_normalized_top_hit_can_be_demoted():
+    # milvus_utils.search_similar 做 min-max 归一化，最好的一条总是 1.0
+    results = make_model().rerank_with_scores("查询账户详细信息", [("现金存款", 1.0), ("账户详情查询", 0.99)], top_k=2)
+    assert [text for text, _, _ in results] == ["账户详情查询", "现金存款"]
+    assert [initial for _, _, initial in results] == [0.99, 1.0]
+
+
+def test_l2_distance_is_not_accepted():
+    model = make_model()
+    results = model.rerank_with_scores("查询账户详细信息", [("现金存款", 1.5), ("账户详情查询", 0.2)], top_k=2, metric_type="L2")
+    assert results[0][0] == "账户详情查询"
+    assert sorted(model.calls[0]) == ["现金存款", "账户详情查询"]
+
+
+def test_similarity_metric_accepts_without_model():
+    model = make_model()
+    results = model.rerank_with_scores("查询账户详细信息", [("现金存款", 0.98), ("账户详情查询", 0.6)], top_k=1, metric_type="IP")
+    assert results == [("现金存款", 0.98, 0.98)]
+    assert model.calls == []
+
+
+def test_exact_name_is_accepted_for_any_metric():
+    model = make_model()
+    results = model.rerank_with_scores("现金存款", [("账户详情查询", 1.0), ("现金存款", 0.4)], top_k=1)
+    assert results[0][0] == "现金存款"
+    assert model.calls == []
@@ -0,0 +1,39 @@
+"""就绪前业务接口返回503，不在事件循环上同步创建组件"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.Utils.Startup import StartupManager
+
+
+def make_app():
+    manager = StartupManager(workers=1, retry_seconds=0.01)
+    created = []
+    component = manager.lazy("component", lambda: created.append(1) or "ok")
+    app = FastAPI()
+    app.middleware("http")(manager.middleware)
+
+    @app.get("/query")
+    async def query():
+        return {"value": component.get()}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    return manager, app, created
+
+
+def test_requests_wait_for_ready():
+    manager, app, created = make_app()
+    client = TestClient(app)
+    response = client.get("/query")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert created == []
+    assert client.get("/health").status_code == 200
+
+    manager.start()
+    assert manager._ready.wait(5)
+    assert client.get("/query").json() == {"value": "ok"}
+    assert created == [1]
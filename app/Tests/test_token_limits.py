@@ -0,0 +1,23 @@
+"""按用途/接口的截断token数：接口专属配置优先，未配置时回落到用途配置"""
+
+from app.Utils import Sequence_Length
+from app.Utils.Metrics import current_endpoint
+from app.Utils.Sequence_Length import token_limit
+
+
+def test_endpoint_override_and_fallback(monkeypatch):
+    monkeypatch.setattr(Sequence_Length, "TOKEN_LIMITS", {"query": 64, "/rerank/single:query": 32})
+    assert token_limit("query") == 64
+    assert token_limit("query", "/rerank/single") == 32
+    assert token_limit("query", "/rag/recall") == 64
+    assert token_limit("passage", "/rerank/single") is None
+
+
+def test_endpoint_defaults_to_current_request(monkeypatch):
+    monkeypatch.setattr(Sequence_Length, "TOKEN_LIMITS", {"query": 64, "/rerank/single:query": 32})
+    token = current_endpoint.set("/rerank/single")
+    try:
+        assert token_limit("query") == 32
+    finally:
+        current_endpoint.reset(token)
+    assert token_limit("query") == 64
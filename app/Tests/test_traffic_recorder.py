@@ -0,0 +1,38 @@
+"""流量录制：多个工作进程写同一个文件时每行都是完整记录，关闭时写完队列"""
+
+import json
+import multiprocessing
+
+from app.Utils.Traffic_Recorder import TrafficRecorder
+
+
+def record(path: str, worker: int, count: int):
+    recorder = TrafficRecorder(path=path)
+    for i in range(count):
+        recorder.put({"ts": i, "worker": worker, "body": {"question": "查询账户详情" * 50}})
+    recorder.stop()
+
+
+def test_workers_append_whole_lines(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=record, args=(path, worker, 500)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2000
+    assert sorted({record["worker"] for record in records}) == [0, 1, 2, 3]
+
+
+def test_stop_flushes_pending_records(tmp_path):
+    path = str(tmp_path / "traffic.jsonl")
+    recorder = TrafficRecorder(path=path)
+    for i in range(100):
+        recorder.put({"ts": i})
+    recorder.stop()
+    with open(path, "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 100
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线批量导入/导出向量数据
+目录格式：
+    manifest.json           集合类型、向量字段、行数等元信息
+    scalars.parquet         标量字段（含动态字段）
+    <向量字段名>.npy         float32 向量矩阵，shape = (行数, 维度)，导入时以内存映射方式读取
+导入时不经过向量模型，直接复用已有向量，用于新环境初始化或环境克隆
+稀疏向量字段（混合检索的BM25向量）不导出，导入时按目标集合的字段结构由名称字段重新计算
+"""
+
+import json
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from pymilvus import Collection, DataType
+
+from .Milvus_Functions import MilvusFunctions
+from .embedding_utils import l2_normalize
+from .Sparse_Encoder import sparse_encoder, SPARSE_SOURCE_FIELDS
+from ..config import BULK_LOAD_BATCH_SIZE, BULK_LOAD_WORKERS, BULK_LOAD_DIR
+
+MANIFEST_FILE = "manifest.json"
+SCALAR_FILE = "scalars.parquet"
+
+# 集合类型 -> MilvusFunctions 中对应的建表方法
+COLLECTION_CREATORS = {
+    "component": "create_collection",
+    "transaction": "create_transaction_collection",
+    "transaction_v3": "create_transaction_collection_v3",
+    "dataItem_v1": "create_dataItem_v1",
+}
+
+
+def resolve_directory(directory: str, root: str = BULK_LOAD_DIR) -> str:
+    """
+    把接口传入的目录解析为 root 下的路径，防止读写任意服务器目录
+
+    已经位于 root 下的路径（如快照接口返回的 snapshot_dir）原样接受，
+    其余按 root 的相对路径解析，拒绝绝对路径和 ..
+
+    Raises:
+        ValueError: 目录为空、是绝对路径、包含 .. 或解析后不在 root 下
+    """
+    root = os.path.realpath(root)
+    if directory and os.path.commonpath([root, os.path.realpath(directory)]) == root:
+        return os.path.realpath(directory)
+    if not directory or os.path.isabs(directory) or ".." in directory.replace("\\", "/").split("/"):
+        raise ValueError(f"目录必须是 {root} 下的相对路径，且不能包含 ..: {directory}")
+    resolved = os.path.realpath(os.path.join(root, directory))
+    # 符号链接也可能指向 root 之外
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"目录不在 {root} 下: {directory}")
+    return resolved
+
+
+class BulkLoader:
+    """批量导入/导出器，围绕 MilvusFunctions.insert 和已有的建表方法实现"""
+
+    def __init__(self):
+        try:
+            self.milvus_functions = MilvusFunctions()
+            self.client = self.milvus_functions.client
+            logger.info("批量导入导出器初始化成功")
+        except Exception as e:
+            logger.error(f"初始化批量导入导出器失败: {e}")
+            raise
+
+    def _describe_fields(self, collection_name: str) -> List[Dict[str, Any]]:
+        return self.client.describe_collection(collection_name).get("fields", [])
+
+    def _metric_types(self, collection_name: str) -> Dict[str, str]:
+        """各向量字段索引的度量类型 {字段名: metric_type}"""
+        metric_types = {}
+        for index_name in self.client.list_indexes(collection_name):
+            index = self.client.describe_index(collection_name, index_name)
+            metric_types[index.get("field_name")] = index.get("metric_type")
+        return metric_types
+
+    def _ensure_collection(self, collection_name: str, collection_type: Optional[str], dim: int, metric_type: str):
+        if self.client.has_collection(collection_name):
+            return
+        if collection_type not in COLLECTION_CREATORS:
+            raise ValueError(f"集合 {collection_name} 不存在，且未指定有效的集合类型: {collection_type}，可选: {list(COLLECTION_CREATORS)}")
+        creator = getattr(self.milvus_functions, COLLECTION_CREATORS[collection_type])
+        creator(collection_name, dimension=dim, metric_type=metric_type)
+
+    def import_directory(
+        self,
+        directory: str,
+        collection_name: Optional[str] = None,
+        collection_type: Optional[str] = None,
+        batch_size: int = BULK_LOAD_BATCH_SIZE,
+        workers: int = BULK_LOAD_WORKERS,
+    ) -> Dict[str, Any]:
+        """
+        从目录导入预先计算好的向量和标量字段
+
+        Args:
+            directory: 数据目录
+            collection_name: 目标集合，默认使用 manifest 中的集合名
+            collection_type: 集合不存在时用于建表的类型，默认使用 manifest 中的类型
+            batch_size: 每批插入的行数
+            workers: 并行插入的线程数
+
+        Returns:
+            Dict[str, Any]: 导入结果，包含行数、耗时和吞吐
+        """
+        manifest = {}
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+        collection_name = collection_name or manifest.get("collection_name")
+        collection_type = collection_type or manifest.get("collection_type")
+        if not collection_name:
+            raise ValueError("未指定目标集合名称")
+
+        vector_fields = manifest.get("vector_fields") or [
+            os.path.splitext(name)[0] for name in sorted(os.listdir(directory)) if name.endswith(".npy")
+        ]
+        vectors = {field: np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r") for field in vector_fields}
+        scalars = pd.read_parquet(os.path.join(directory, SCALAR_FILE))
+        scalars = scalars.astype(object).where(scalars.notna(), None)
+
+        num_rows = manifest.get("row_count", len(scalars))
+        for field, matrix in vectors.items():
+            if matrix.shape[0] < num_rows:
+                raise ValueError(f"向量文件 {field}.npy 行数 {matrix.shape[0]} 少于标量行数 {num_rows}")
+        dim = next(iter(vectors.values())).shape[1] if vectors else manifest.get("dim", 1024)
+
+        self._ensure_collection(collection_name, collection_type, dim, manifest.get("metric_type", "COSINE"))
+
+        # IP度量的字段要求单位向量，旧快照中未归一化的向量在导入时归一化
+        normalized_fields = {
+            field for field, metric_type in self._metric_types(collection_name).items()
+            if metric_type == "IP" and field in vectors
+        }
+
+        # 自增主键由 Milvus 生成，导入时去掉
+        sparse_fields = []
+        for field in self._describe_fields(collection_name):
+            if field.get("is_primary") and field.get("auto_id") and field["name"] in scalars.columns:
+                scalars = scalars.drop(columns=[field["name"]])
+            if field.get("type") == DataType.SPARSE_FLOAT_VECTOR:
+                sparse_fields.append(field["name"])
+        # 稀疏向量的 idf 按整个导入批次统计，与上传时一致
+        sparse_vectors = sparse_encoder.encode_documents(
+            scalars.to_dict("records"), field_name_mapping=SPARSE_SOURCE_FIELDS
+        ) if sparse_fields else []
+
+        logger.info(f"开始导入 {directory} -> {collection_name}，共 {num_rows} 行，向量字段: {vector_fields}")
+        start_time = time.time()
+
+        def insert_batch(start: int) -> int:
+            end = min(start + batch_size, num_rows)
+            rows = scalars.iloc[start:end].to_dict("records")
+            for field, matrix in vectors.items():
+                batch = np.ascontiguousarray(matrix[start:end], dtype=np.float32)
+                if field in normalized_fields:
+                    batch = l2_normalize(batch)
+                for row, vector in zip(rows, batch):
+                    row[field] = vector
+            for field in sparse_fields:
+                for row, vector in zip(rows, sparse_vectors[start:end]):
+                    row[field] = vector
+            self.milvus_functions.insert(collection_name, rows, batch_size=batch_size)
+            return end - start
+
+        inserted = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(insert_batch, start) for start in range(0, num_rows, batch_size)]
+            for future in as_completed(futures):
+                inserted += future.result()
+                elapsed = time.time() - start_time
+                logger.info(f"导入进度: {inserted}/{num_rows} 行，{inserted / max(elapsed, 1e-9):.0f} 行/秒")
+
+        elapsed = time.time() - start_time
+        logger.info(f"导入完成: {collection_name}，{inserted} 行，耗时 {elapsed:.2f}s")
+        return {
+            "collection_name": collection_name,
+            "row_count": inserted,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": inserted / max(elapsed, 1e-9),
+        }
+
+    def export_collection(
+        self,
+        collection_name: str,
+        directory: str,
+        collection_type: Optional[str] = None,
+        batch_size: int = BULK_LOAD_BATCH_SIZE,
+    ) -> Dict[str, Any]:
+        """
+        把集合导出为与 import_directory 相同的目录格式
+
+        Args:
+            collection_name: 要导出的集合
+            directory: 输出目录
+            collection_type: 写入 manifest 的集合类型，导入到新环境时用于建表
+            batch_size: 每次迭代读取的行数
+
+        Returns:
+            Dict[str, Any]: 导出结果，包含行数、耗时和吞吐
+        """
+        if not self.client.has_collection(collection_name):
+            raise ValueError(f"集合不存在: {collection_name}")
+        os.makedirs(directory, exist_ok=True)
+
+        fields = self._describe_fields(collection_name)
+        vector_dims = {
+            field["name"]: int(field["params"]["dim"])
+            for field in fields
+            if field.get("type") == DataType.FLOAT_VECTOR
+        }
+        sparse_fields = [field["name"] for field in fields if field.get("type") == DataType.SPARSE_FLOAT_VECTOR]
+        metric_type = "COSINE"
+        try:
+            metric_types = self._metric_types(collection_name)
+            metric_type = next((metric_types[name] for name in vector_dims if name in metric_types), None) or metric_type
+        except Exception as e:
+            logger.warning(f"获取集合 {collection_name} 的索引信息失败，使用默认度量 {metric_type}: {e}")
+
+        total = self.client.query(collection_name, filter="", output_fields=["count(*)"])[0]["count(*)"]
+        vector_files = {
+            name: np.lib.format.open_memmap(
+                os.path.join(directory, f"{name}.npy"), mode="w+", dtype=np.float32, shape=(total, dim)
+            )
+            for name, dim in vector_dims.items()
+        }
+
+        logger.info(f"开始导出 {collection_name} -> {directory}，共 {total} 行")
+        start_time = time.time()
+        scalar_rows = []
+        offset = 0
+        iterator = Collection(collection_name, using=self.client._using).query_iterator(
+            batch_size=batch_size, output_fields=["*"]
+        )
+        try:
+            while offset < total:
+                rows = iterator.next()
+                if not rows:
+                    break
+                rows = rows[: total - offset]
+                for name, matrix in vector_files.items():
+                    matrix[offset:offset + len(rows)] = np.asarray([row.pop(name) for row in rows], dtype=np.float32)
+                for row in rows:
+                    for name in sparse_fields:
+                        row.pop(name, None)
+                scalar_rows.extend(rows)
+                offset += len(rows)
+                elapsed = time.time() - start_time
+                logger.info(f"导出进度: {offset}/{total} 行，{offset / max(elapsed, 1e-9):.0f} 行/秒")
+        finally:
+            iterator.close()
+
+        for matrix in vector_files.values():
+            matrix.flush()
+        pd.DataFrame(scalar_rows).to_parquet(os.path.join(directory, SCALAR_FILE), index=False)
+
+        manifest = {
+            "collection_name": collection_name,
+            "collection_type": collection_type,
+            "vector_fields": list(vector_dims),
+            "sparse_fields": sparse_fields,
+            "dim": next(iter(vector_dims.values()), None),
+            "metric_type": metric_type,
+            "row_count": offset,
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        elapsed = time.time() - start_time
+        logger.info(f"导出完成: {collection_name}，{offset} 行，耗时 {elapsed:.2f}s")
+        return {
+            "collection_name": collection_name,
+            "directory": directory,
+            "row_count": offset,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": offset / max(elapsed, 1e-9),
+        }
+
+
+def main():
+    """命令行主函数"""
+    parser = argparse.ArgumentParser(description="批量导入/导出预先计算好的向量数据")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import_parser = subparsers.add_parser("import", help="从目录导入向量数据")
+    import_parser.add_argument("--dir", required=True, help="数据目录")
+    import_parser.add_argument("--collection", help="目标集合名称")
+    import_parser.add_argument("--type", choices=list(COLLECTION_CREATORS), help="集合不存在时的建表类型")
+    import_parser.add_argument("--batch-size", type=int, default=BULK_LOAD_BATCH_SIZE, help="每批插入的行数")
+    import_parser.add_argument("--workers", type=int, default=BULK_LOAD_WORKERS, help="并行插入线程数")
+
+    export_parser = subparsers.add_parser("export", help="把集合导出到目录")
+    export_parser.add_argument("--collection", required=True, help="要导出的集合名称")
+    export_parser.add_argument("--dir", required=True, help="输出目录")
+    export_parser.add_argument("--type", choices=list(COLLECTION_CREATORS), help="写入manifest的集合类型")
+    export_parser.add_argument("--batch-size", type=int, default=BULK_LOAD_BATCH_SIZE, help="每次读取的行数")
+
+    args = parser.parse_args()
+
+    try:
+        loader = BulkLoader()
+        if args.command == "import":
+            result = loader.import_directory(args.dir, args.collection, args.type, args.batch_size, args.workers)
+        elif args.command == "export":
+            result = loader.export_collection(args.collection, args.dir, args.type, args.batch_size)
+        else:
+            parser.print_help()
+            return
+        print(f"✅ {args.command} 完成: {result['row_count']} 行，耗时 {result['elapsed_seconds']:.2f}s，"
+              f"{result['rows_per_second']:.0f} 行/秒")
+    except Exception as e:
+        logger.error(f"程序执行失败: {e}")
+        print(f"程序执行失败: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from pymilvus import DataType
+from pymilvus.client.types import LoadState
+
+from .Milvus_Connection import MilvusConnection
+from .Startup import startup_manager
+from ..config import COLLECTION_MEMORY_BUDGET_MB, COLLECTION_PINNED, COLLECTION_LOAD_CHECK_SECONDS
+
+# 估算内存时每行标量字段按固定字节数计算
+SCALAR_BYTES_PER_ROW = 512
+
+
+class CollectionResidencyManager:
+    """
+    知识库驻留管理器：按需加载知识库，超出内存预算时按LRU释放最久未使用的知识库
+
+    记录每个知识库的最近使用时间和估算内存，pinned 中的知识库不会被释放。
+    已加载的知识库不加锁直接返回；加载只持有该知识库自己的锁，不阻塞其他知识库上的检索。
+    驻留记录是进程内的，其他工作进程/副本可能已按自己的LRU释放了知识库，
+    距上次确认超过 COLLECTION_LOAD_CHECK_SECONDS 时重新读取加载状态
+    """
+
+    def __init__(self, budget_mb: int = COLLECTION_MEMORY_BUDGET_MB, pinned: Optional[List[str]] = None):
+        self.client = MilvusConnection().client
+        self.budget_bytes = budget_mb * 1024 ** 2
+        self.pinned = set(pinned if pinned is not None else COLLECTION_PINNED)
+        # {collection_name: {"last_used": float, "estimated_bytes": int, "loaded_at": float, "checked_at": float}}
+        self._resident: Dict[str, Dict[str, Any]] = {}
+        # _lock 只保护驻留记录，加载/释放的RPC在各知识库自己的锁内进行
+        self._lock = threading.RLock()
+        self._collection_locks: Dict[str, threading.Lock] = {}
+        self._sync()
+
+    def _sync(self):
+        """启动时把 Milvus 中已加载的知识库纳入管理，按刚使用过记录，不会因为没有使用记录而最先被释放"""
+        try:
+            for name in self.client.list_collections():
+                if self.client.get_load_state(collection_name=name).get("state") == LoadState.Loaded:
+                    now = time.time()
+                    self._resident[name] = {
+                        "last_used": now,
+                        "estimated_bytes": self._estimate_bytes(name),
+                        "loaded_at": now,
+                        "checked_at": now,
+                    }
+            logger.info(f"知识库驻留管理器初始化，已加载: {list(self._resident)}")
+        except Exception as e:
+            logger.warning(f"同步知识库加载状态失败: {e}")
+
+    def _vector_fields(self, collection_name: str) -> Dict[str, int]:
+        fields = self.client.describe_collection(collection_name).get("fields", [])
+        return {
+            field["name"]: int(field["params"]["dim"])
+            for field in fields
+            if field.get("type") == DataType.FLOAT_VECTOR
+        }
+
+    def _estimate_bytes(self, collection_name: str) -> int:
+        """估算加载后占用的内存：原始向量 + IVF_FLAT索引中的向量副本 + 标量字段"""
+        try:
+            row_count = int(self.client.get_collection_stats(collection_name).get("row_count", 0))
+            vector_bytes = sum(dim * 4 for dim in self._vector_fields(collection_name).values())
+            return row_count * (vector_bytes * 2 + SCALAR_BYTES_PER_ROW)
+        except Exception as e:
+            logger.warning(f"估算知识库 {collection_name} 内存失败: {e}")
+            return 0
+
+    def _used_bytes(self) -> int:
+        with self._lock:
+            return sum(info["estimated_bytes"] for info in self._resident.values())
+
+    def _warm_up(self, collection_name: str):
+        """加载后对每个向量字段做一次检索，提前触发索引和缓存的初始化"""
+        for field, dim in self._vector_fields(collection_name).items():
+            try:
+                self.client.search(collection_name=collection_name, data=[[1.0] * dim], limit=1, anns_field=field)
+            except Exception as e:
+                logger.warning(f"知识库 {collection_name} 字段 {field} 预热检索失败: {e}")
+
+    def _collection_lock(self, collection_name: str) -> threading.Lock:
+        with self._lock:
+            return self._collection_locks.setdefault(collection_name, threading.Lock())
+
+    def _evict_for(self, collection_name: str, needed_bytes: int):
+        with self._lock:
+            candidates = sorted(
+                (name for name in self._resident if name != collection_name and name not in self.pinned),
+                key=lambda name: self._resident[name]["last_used"]
+            )
+        for name in candidates:
+            if self._used_bytes() + needed_bytes <= self.budget_bytes:
+                break
+            self.release(name)
+        if self._used_bytes() + needed_bytes > self.budget_bytes:
+            logger.warning(f"加载知识库 {collection_name} 后将超出内存预算 {self.budget_bytes / 1024 ** 2:.0f}MB")
+
+    def _still_loaded(self, collection_name: str, info: Dict[str, Any]) -> bool:
+        """距上次确认超过 COLLECTION_LOAD_CHECK_SECONDS 时向 Milvus 确认仍处于加载状态"""
+        now = time.time()
+        if now - info["checked_at"] < COLLECTION_LOAD_CHECK_SECONDS:
+            return True
+        try:
+            loaded = self.client.get_load_state(collection_name=collection_name).get("state") == LoadState.Loaded
+        except Exception as e:
+            logger.warning(f"读取知识库 {collection_name} 加载状态失败: {e}")
+            return True
+        if loaded:
+            info["checked_at"] = now
+        else:
+            logger.info(f"知识库 {collection_name} 已被其他进程释放，重新加载")
+            with self._lock:
+                if self._resident.get(collection_name) is info:
+                    self._resident.pop(collection_name)
+        return loaded
+
+    def ensure_loaded(self, collection_name: str):
+        """确保知识库已加载并记录本次使用；未加载时先按LRU腾出内存，再加载并预热"""
+        info = self._resident.get(collection_name)
+        if info is not None and self._still_loaded(collection_name, info):
+            info["last_used"] = time.time()
+            return
+
+        with self._collection_lock(collection_name):
+            info = self._resident.get(collection_name)
+            if info is not None:
+                info["last_used"] = time.time()
+                return
+
+            start_time = time.time()
+            needed_bytes = self._estimate_bytes(collection_name)
+            self._evict_for(collection_name, needed_bytes)
+            self.client.load_collection(collection_name=collection_name)
+            self._warm_up(collection_name)
+            now = time.time()
+            with self._lock:
+                self._resident[collection_name] = {
+                    "last_used": now,
+                    "estimated_bytes": needed_bytes,
+                    "loaded_at": now,
+                    "checked_at": now,
+                }
+            logger.info(f"已加载知识库 {collection_name}，估算内存 {needed_bytes / 1024 ** 2:.1f}MB，耗时 {now - start_time:.2f}s")
+
+    def warm_up_pinned(self):
+        """启动预热：加载常驻知识库并对每个向量字段检索一次，检索失败时抛出异常"""
+        for name in self.pinned:
+            if not self.client.has_collection(name):
+                continue
+            self.ensure_loaded(name)
+            for field, dim in self._vector_fields(name).items():
+                self.client.search(collection_name=name, data=[[1.0] * dim], limit=1, anns_field=field)
+
+    def release(self, collection_name: str):
+        """释放知识库占用的查询节点内存"""
+        with self._collection_lock(collection_name):
+            try:
+                self.client.release_collection(collection_name=collection_name)
+                logger.info(f"已释放知识库 {collection_name}")
+            except Exception as e:
+                logger.warning(f"释放知识库 {collection_name} 失败: {e}")
+            with self._lock:
+                self._resident.pop(collection_name, None)
+
+    def forget(self, collection_name: str):
+        """知识库被删除后移除其驻留记录"""
+        with self._lock:
+            self._resident.pop(collection_name, None)
+
+    def is_resident(self, collection_name: str) -> bool:
+        return collection_name in self._resident
+
+    def status(self) -> Dict[str, Any]:
+        """返回当前驻留状态"""
+        with self._lock:
+            now = time.time()
+            collections = [
+                {
+                    "collection_name": name,
+                    "estimated_memory_mb": info["estimated_bytes"] / 1024 ** 2,
+                    "idle_seconds": now - info["last_used"] if info["last_used"] else None,
+                    "loaded_seconds": now - info["loaded_at"],
+                    "pinned": name in self.pinned,
+                }
+                for name, info in sorted(self._resident.items(), key=lambda item: -item[1]["last_used"])
+            ]
+            return {
+                "budget_mb": self.budget_bytes / 1024 ** 2,
+                "used_mb": self._used_bytes() / 1024 ** 2,
+                "resident_collections": collections,
+            }
+
+
+# 创建全局实例
+residency_manager = startup_manager.lazy("residency_manager", CollectionResidencyManager, stage=1)
+startup_manager.add_warmup("milvus_search", lambda: residency_manager.warm_up_pinned())
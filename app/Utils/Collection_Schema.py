@@ -0,0 +1,105 @@
+"""
+知识库向量索引的度量类型（describe_index）和字段名（describe_collection）
+
+检索分数的含义取决于知识库建立时的索引度量，而不是当前的 VECTOR_METRIC_TYPE：IP/COSINE 返回相似度，
+L2 返回距离，EMBEDDING_NORMALIZE 开启前建立的知识库仍可能是 L2 或 COSINE。
+L2/IP 的排序还依赖向量模长，存量向量与当前 EMBEDDING_NORMALIZE 下的查询向量/新向量不一致时，
+check_vectors 拒绝在该知识库上检索和写入，直到用 /collection/migrate_to_ip 迁移（COSINE 不受影响）。
+字段名用于判断知识库是否有稀疏向量字段等按结构选择检索方式的场景。
+按知识库缓存，知识库被删除、覆盖恢复或重建时由调用方 invalidate；其他进程（多工作进程/多副本）做的改动
+在 COLLECTION_SCHEMA_TTL_SECONDS 后重新读取
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+from loguru import logger
+
+from ..config import COLLECTION_SCHEMA_TTL_SECONDS, EMBEDDING_NORMALIZE
+
+# 分数为相似度（越大越相似）的度量
+SIMILARITY_METRICS = ("IP", "COSINE")
+
+
+class CollectionSchemaCache:
+    def __init__(self, ttl_seconds: float = COLLECTION_SCHEMA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # {知识库: (读取时间, {向量字段: metric_type})}
+        self._metrics: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        # {知识库: (读取时间, 字段名集合)}
+        self._fields: Dict[str, Tuple[float, FrozenSet[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, entry: Optional[Tuple[float, Any]]) -> bool:
+        return entry is not None and (self.ttl_seconds <= 0 or time.monotonic() - entry[0] < self.ttl_seconds)
+
+    def _cached(self, cache: Dict[str, Tuple[float, Any]], client, collection_name: str, load: Callable[[], Any], empty: Any) -> Any:
+        with self._lock:
+            entry = cache.get(collection_name)
+        if self._fresh(entry):
+            return entry[1]
+        if not client.has_collection(collection_name):
+            # 不存在的知识库不缓存，随后创建时不必等待过期
+            return empty
+        value = load()
+        with self._lock:
+            cache[collection_name] = (time.monotonic(), value)
+        return value
+
+    def metric_types(self, client, collection_name: str) -> Dict[str, str]:
+        """各向量字段索引的度量类型 {字段名: metric_type}，知识库不存在时返回空字典"""
+        def load() -> Dict[str, str]:
+            metric_types = {}
+            for index_name in client.list_indexes(collection_name):
+                index = client.describe_index(collection_name, index_name)
+                metric_types[index.get("field_name")] = index.get("metric_type")
+            return metric_types
+
+        return self._cached(self._metrics, client, collection_name, load, {})
+
+    def field_names(self, client, collection_name: str) -> FrozenSet[str]:
+        """知识库的字段名集合，知识库不存在时返回空集合"""
+        def load() -> FrozenSet[str]:
+            return frozenset(field["name"] for field in client.describe_collection(collection_name).get("fields", []))
+
+        return self._cached(self._fields, client, collection_name, load, frozenset())
+
+    def metric_type(self, client, collection_name: str, field: str = "embedding") -> Optional[str]:
+        """向量字段的度量类型，读取失败或字段没有索引时返回 None"""
+        try:
+            return self.metric_types(client, collection_name).get(field)
+        except Exception as e:
+            logger.warning(f"读取知识库 {collection_name} 的索引度量失败: {e}")
+            return None
+
+    def check_vectors(self, client, collection_name: str):
+        """
+        检查知识库的索引度量与当前编码方式是否兼容：EMBEDDING_NORMALIZE 开启时查询向量和新写入的向量是单位向量，
+        L2 知识库中的存量向量未归一化，新写入的向量模长小，总是排在最近；关闭时 IP 知识库要求的单位向量得不到保证
+        """
+        incompatible = "L2" if EMBEDDING_NORMALIZE else "IP"
+        try:
+            fields = [field for field, metric in self.metric_types(client, collection_name).items() if metric == incompatible]
+        except Exception as e:
+            logger.warning(f"读取知识库 {collection_name} 的索引度量失败，跳过度量检查: {e}")
+            return
+        if fields:
+            action = "先调用 /collection/migrate_to_ip 迁移为IP度量" if EMBEDDING_NORMALIZE else "开启 EMBEDDING_NORMALIZE"
+            raise ValueError(
+                f"知识库 {collection_name} 的向量字段 {fields} 使用{incompatible}度量，"
+                f"与 EMBEDDING_NORMALIZE={EMBEDDING_NORMALIZE} 编码的向量不可比，请{action}"
+            )
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        with self._lock:
+            if collection_name is None:
+                self._metrics.clear()
+                self._fields.clear()
+            else:
+                self._metrics.pop(collection_name, None)
+                self._fields.pop(collection_name, None)
+
+
+# 创建全局实例
+collection_schema = CollectionSchemaCache()
@@ -1,9 +1,24 @@
 from loguru import logger
 from typing import Dict, Any, List, Optional
+from pymilvus import DataType
+import json
+import os
+import shutil
+import time
+import numpy as np
 from .milvus_utils import My_MilvusClient
-from ..config import MILVUS_COLLECTION
+from .Bulk_Load import BulkLoader, MANIFEST_FILE, SCALAR_FILE
+from .embedding_utils import l2_normalize
+from .Collection_Residency import residency_manager
+from .Query_Cache import query_cache
+from .Lexical_Index import lexical_index
+from .Collection_Schema import collection_schema
+from .Startup import startup_manager
+from ..config import MILVUS_COLLECTION, SNAPSHOT_DIR, BULK_LOAD_WORKERS, BULK_LOAD_BATCH_SIZE, VECTOR_METRIC_TYPE, EMBEDDING_NORMALIZE
 from ..entitys.Delete_Collection import CollectionInfo
 
+SCHEMA_FILE = "schema.json"
+
 
 class CollectionManager:
     """知识库管理器，用于管理Milvus中的Collection"""
@@ -12,6 +27,7 @@ class CollectionManager:
         """初始化Milvus客户端"""
         try:
             self.milvus_client = My_MilvusClient()
+            self.bulk_loader = BulkLoader()
             logger.info("知识库管理器初始化成功")
         except Exception as e:
             logger.error(f"初始化知识库管理器失败: {e}")
@@ -68,6 +84,10 @@ class CollectionManager:
             try:
                 # 直接删除Collection
                 self.milvus_client.client.drop_collection(collection_name=collection_name)
+                residency_manager.forget(collection_name)
+                query_cache.clear()
+                lexical_index.invalidate(collection_name)
+                collection_schema.invalidate(collection_name)
                 logger.info(f"已删除Collection: {collection_name}")
                 
                 return {
@@ -125,7 +145,8 @@ class CollectionManager:
                     collection_name=collection["name"],
                     document_count=document_count,
                     description=collection.get("description", ""),
-                    is_current=collection["name"] == MILVUS_COLLECTION
+                    is_current=collection["name"] == MILVUS_COLLECTION,
+                    is_loaded=residency_manager.is_resident(collection["name"])
                 )
                 collections_info.append(collection_info)
             
@@ -195,6 +216,7 @@ class CollectionManager:
                     "file_count": len(file_ids),
                     "description": target_collection.get("description", ""),
                     "is_current": target_collection["name"] == MILVUS_COLLECTION,
+                    "is_loaded": residency_manager.is_resident(target_collection["name"]),
                     "statistics": {
                         "total_documents": document_count,
                         "total_files": len(file_ids),
@@ -311,7 +333,7 @@ class CollectionManager:
             index_params.add_index(
                 "embedding",
                 index_type="IVF_FLAT",
-                metric_type="L2",
+                metric_type=VECTOR_METRIC_TYPE,
                 params={"nlist": 1024}
             )
             
@@ -361,8 +383,9 @@ class CollectionManager:
                     "collection_name": collection_name
                 }
             
-            # 加载Collection
-            self.milvus_client.client.load_collection(collection_name=collection_name)
+            # 加载Collection（超出内存预算时按LRU释放最久未使用的知识库）
+            residency_manager.ensure_loaded(collection_name)
+            query_cache.clear()
             
             logger.info(f"成功切换到知识库: {collection_name}")
             
@@ -380,6 +403,256 @@ class CollectionManager:
                 "collection_name": collection_name
             }
 
+    def _describe_profile(self, collection_name: str) -> Dict[str, Any]:
+        """记录知识库的字段结构和索引配置，用于快照恢复时重建"""
+        client = self.milvus_client.client
+        description = client.describe_collection(collection_name)
+        fields = [
+            {
+                "name": field["name"],
+                "type": DataType(field["type"]).name,
+                "params": field.get("params", {}),
+                "is_primary": field.get("is_primary", False),
+                "auto_id": field.get("auto_id", False),
+            }
+            for field in description.get("fields", [])
+        ]
+        indexes = []
+        for index_name in client.list_indexes(collection_name):
+            index = dict(client.describe_index(collection_name, index_name))
+            indexes.append({
+                "field_name": index.pop("field_name"),
+                "index_name": index.pop("index_name", index_name),
+                "index_type": index.pop("index_type"),
+                "metric_type": index.pop("metric_type"),
+                "params": {k: int(v) if str(v).isdigit() else v for k, v in index.items() if k != "dim"},
+            })
+        return {
+            "collection_name": collection_name,
+            "description": description.get("description", ""),
+            "auto_id": description.get("auto_id", False),
+            "enable_dynamic_field": description.get("enable_dynamic_field", False),
+            "fields": fields,
+            "indexes": indexes,
+        }
+
+    def _create_from_profile(self, collection_name: str, profile: Dict[str, Any]):
+        """按快照中记录的字段结构和索引配置重建知识库"""
+        client = self.milvus_client.client
+        schema = client.create_schema(
+            auto_id=profile["auto_id"],
+            enable_dynamic_field=profile["enable_dynamic_field"],
+            description=profile.get("description", "")
+        )
+        for field in profile["fields"]:
+            params = {k: int(v) if str(v).isdigit() else v for k, v in field["params"].items()}
+            schema.add_field(field["name"], DataType[field["type"]], is_primary=field["is_primary"], **params)
+
+        index_params = client.prepare_index_params()
+        for index in profile["indexes"]:
+            index_params.add_index(
+                index["field_name"],
+                index_name=index["index_name"],
+                index_type=index["index_type"],
+                metric_type=index["metric_type"],
+                params=index["params"]
+            )
+        client.create_collection(collection_name=collection_name, schema=schema, index_params=index_params)
+
+    def snapshot_collection(self, collection_name: str, snapshot_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        为知识库创建快照，用于快速回滚或在副本上做基准测试
+
+        向量写入内存映射的float32 .npy文件，标量写入parquet列式文件，
+        字段结构和索引配置写入 schema.json
+
+        Args:
+            collection_name: 知识库名称
+            snapshot_dir: 快照目录，默认为 SNAPSHOT_DIR/<知识库名称>/<时间戳>
+
+        Returns:
+            Dict[str, Any]: 快照结果，包含行数、耗时和吞吐
+        """
+        try:
+            if not self.milvus_client.client.has_collection(collection_name=collection_name):
+                return {
+                    "success": False,
+                    "message": f"知识库不存在: {collection_name}",
+                    "collection_name": collection_name
+                }
+
+            snapshot_dir = snapshot_dir or os.path.join(SNAPSHOT_DIR, collection_name, time.strftime("%Y%m%d_%H%M%S"))
+            logger.info(f"开始创建知识库快照: {collection_name} -> {snapshot_dir}")
+
+            profile = self._describe_profile(collection_name)
+            result = self.bulk_loader.export_collection(collection_name, snapshot_dir)
+            with open(os.path.join(snapshot_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+
+            logger.info(f"知识库快照完成: {collection_name}，{result['row_count']} 行，{result['rows_per_second']:.0f} 行/秒")
+            return {
+                "success": True,
+                "message": f"成功创建知识库快照: {collection_name}",
+                "snapshot_dir": snapshot_dir,
+                **result
+            }
+
+        except Exception as e:
+            logger.error(f"创建知识库快照失败: {e}")
+            return {
+                "success": False,
+                "message": f"创建知识库快照失败: {str(e)}",
+                "collection_name": collection_name
+            }
+
+    def restore_collection(self, snapshot_dir: str, collection_name: Optional[str] = None, overwrite: bool = False,
+                           workers: int = BULK_LOAD_WORKERS) -> Dict[str, Any]:
+        """
+        从快照恢复知识库：按记录的字段结构和索引配置重建，再并行批量插入
+
+        Args:
+            snapshot_dir: 快照目录
+            collection_name: 恢复后的知识库名称，默认使用快照中的原名称
+            overwrite: 目标知识库已存在时是否先删除
+            workers: 并行插入线程数
+
+        Returns:
+            Dict[str, Any]: 恢复结果，包含行数、耗时和吞吐
+        """
+        try:
+            with open(os.path.join(snapshot_dir, SCHEMA_FILE), "r", encoding="utf-8") as f:
+                profile = json.load(f)
+            collection_name = collection_name or profile["collection_name"]
+            logger.info(f"开始从快照恢复知识库: {snapshot_dir} -> {collection_name}")
+
+            client = self.milvus_client.client
+            if client.has_collection(collection_name=collection_name):
+                if not overwrite:
+                    return {
+                        "success": False,
+                        "message": f"知识库已存在: {collection_name}",
+                        "collection_name": collection_name
+                    }
+                client.drop_collection(collection_name=collection_name)
+                residency_manager.forget(collection_name)
+                query_cache.clear()
+                lexical_index.invalidate(collection_name)
+                collection_schema.invalidate(collection_name)
+                logger.info(f"已删除待覆盖的知识库: {collection_name}")
+
+            self._create_from_profile(collection_name, profile)
+            result = self.bulk_loader.import_directory(snapshot_dir, collection_name, workers=workers)
+
+            logger.info(f"知识库恢复完成: {collection_name}，{result['row_count']} 行，{result['rows_per_second']:.0f} 行/秒")
+            return {
+                "success": True,
+                "message": f"成功从快照恢复知识库: {collection_name}",
+                "snapshot_dir": snapshot_dir,
+                **result
+            }
+
+        except Exception as e:
+            logger.error(f"从快照恢复知识库失败: {e}")
+            return {
+                "success": False,
+                "message": f"从快照恢复知识库失败: {str(e)}",
+                "collection_name": collection_name
+            }
+
+    def migrate_to_inner_product(self, collection_name: str, snapshot_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        把已有知识库迁移为 单位向量 + IP度量
+
+        先创建快照作为回滚点，再生成向量已归一化、索引度量改为IP的迁移快照，覆盖恢复原知识库；
+        需要回滚时调用 restore_collection(回滚快照目录, overwrite=True)
+
+        Args:
+            collection_name: 知识库名称
+            snapshot_dir: 回滚快照目录，默认为 SNAPSHOT_DIR/<知识库名称>/<时间戳>
+
+        Returns:
+            Dict[str, Any]: 迁移结果，包含回滚快照目录、迁移的向量字段、行数和耗时
+        """
+        try:
+            if not EMBEDDING_NORMALIZE:
+                return {
+                    "success": False,
+                    "message": "EMBEDDING_NORMALIZE 未开启，新写入的向量不是单位向量，迁移到IP度量后分数将不正确",
+                    "collection_name": collection_name
+                }
+            if not self.milvus_client.client.has_collection(collection_name=collection_name):
+                return {
+                    "success": False,
+                    "message": f"知识库不存在: {collection_name}",
+                    "collection_name": collection_name
+                }
+
+            profile = self._describe_profile(collection_name)
+            vector_fields = [field["name"] for field in profile["fields"] if field["type"] == DataType.FLOAT_VECTOR.name]
+            indexes = [index for index in profile["indexes"] if index["field_name"] in vector_fields and index["metric_type"] != "IP"]
+            if not indexes:
+                return {
+                    "success": True,
+                    "message": f"知识库已使用IP度量，无需迁移: {collection_name}",
+                    "collection_name": collection_name
+                }
+
+            start_time = time.time()
+            snapshot = self.snapshot_collection(collection_name, snapshot_dir)
+            if not snapshot["success"]:
+                return snapshot
+            rollback_dir = snapshot["snapshot_dir"]
+            migrated_dir = rollback_dir.rstrip(os.sep) + "_ip"
+            os.makedirs(migrated_dir, exist_ok=True)
+            logger.info(f"开始迁移知识库为IP度量: {collection_name}，回滚快照: {rollback_dir}")
+
+            shutil.copy2(os.path.join(rollback_dir, SCALAR_FILE), os.path.join(migrated_dir, SCALAR_FILE))
+            with open(os.path.join(rollback_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest["metric_type"] = "IP"
+            with open(os.path.join(migrated_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            for field in vector_fields:
+                source = np.load(os.path.join(rollback_dir, f"{field}.npy"), mmap_mode="r")
+                target = np.lib.format.open_memmap(
+                    os.path.join(migrated_dir, f"{field}.npy"), mode="w+", dtype=np.float32, shape=source.shape
+                )
+                for start in range(0, source.shape[0], BULK_LOAD_BATCH_SIZE):
+                    target[start:start + BULK_LOAD_BATCH_SIZE] = l2_normalize(source[start:start + BULK_LOAD_BATCH_SIZE])
+                target.flush()
+
+            for index in indexes:
+                index["metric_type"] = "IP"
+            with open(os.path.join(migrated_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+
+            result = self.restore_collection(migrated_dir, collection_name, overwrite=True)
+            if not result["success"]:
+                logger.error(f"迁移知识库 {collection_name} 失败，可从 {rollback_dir} 回滚")
+                return {**result, "rollback_snapshot_dir": rollback_dir}
+
+            elapsed = time.time() - start_time
+            logger.info(f"知识库迁移完成: {collection_name}，{result['row_count']} 行，耗时 {elapsed:.2f}s")
+            return {
+                "success": True,
+                "message": f"成功迁移知识库为IP度量: {collection_name}",
+                "collection_name": collection_name,
+                "migrated_fields": [index["field_name"] for index in indexes],
+                "rollback_snapshot_dir": rollback_dir,
+                "migrated_snapshot_dir": migrated_dir,
+                "row_count": result["row_count"],
+                "elapsed_seconds": elapsed
+            }
+
+        except Exception as e:
+            logger.error(f"迁移知识库失败: {e}")
+            return {
+                "success": False,
+                "message": f"迁移知识库失败: {str(e)}",
+                "collection_name": collection_name
+            }
+
 
 # 创建全局实例
-collection_manager = CollectionManager()
\ No newline at end of file
+collection_manager = startup_manager.lazy("collection_manager", CollectionManager)
\ No newline at end of file
@@ -11,7 +11,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from .milvus_utils import My_MilvusClient
 from loguru import logger
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import argparse
 
 
@@ -40,14 +40,11 @@ class FileDeleter:
         try:
             logger.info(f"开始删除文件ID: {file_id}")
             
-            # 首先查询该文件ID是否存在
-            existing_docs = self.milvus_client.client.query(
-                collection_name=self.milvus_client.collection_name,
-                filter=f'file_id == "{file_id}"',
-                output_fields=["id", "file_id", "file_name"]
-            )
+            # 直接按表达式删除，删除数量以Milvus返回结果为准
+            result = self.milvus_client.delete_by_file_ids([file_id])
+            deleted_count = result["delete_count"]
             
-            if not existing_docs:
+            if deleted_count == 0:
                 logger.warning(f"文件ID {file_id} 不存在")
                 return {
                     "success": False,
@@ -56,27 +53,16 @@ class FileDeleter:
                     "file_id": file_id
                 }
             
-            # 获取要删除的文档ID列表
-            doc_ids = [doc["id"] for doc in existing_docs]
-            file_name = existing_docs[0].get("file_name", "未知文件")
-            
-            logger.info(f"找到 {len(doc_ids)} 个文档需要删除，文件名: {file_name}")
-            
-            # 执行删除操作
-            delete_result = self.milvus_client.client.delete(
-                collection_name=self.milvus_client.collection_name,
-                pks=doc_ids
-            )
-            
-            logger.info(f"删除操作完成，删除结果: {delete_result}")
+            file_name = result["file_names"].get(file_id) or "未知文件"
+            logger.info(f"删除操作完成，共删除 {deleted_count} 个文档，文件名: {file_name}")
             
             return {
                 "success": True,
                 "message": f"成功删除文件 {file_name} (ID: {file_id})",
-                "deleted_count": len(doc_ids),
+                "deleted_count": deleted_count,
                 "file_id": file_id,
                 "file_name": file_name,
-                "delete_result": delete_result
+                "delete_result": result["delete_result"]
             }
             
         except Exception as e:
@@ -88,6 +74,57 @@ class FileDeleter:
                 "file_id": file_id
             }
     
+    def delete_files_by_ids(self, file_ids: List[str]) -> Dict[str, Any]:
+        """
+        批量删除多个文件ID的文档，只发起一次删除调用
+        
+        Args:
+            file_ids: 要删除的文件ID列表
+            
+        Returns:
+            Dict[str, Any]: 删除结果
+        """
+        try:
+            logger.info(f"开始批量删除文件ID: {file_ids}")
+            
+            result = self.milvus_client.delete_by_file_ids(file_ids)
+            deleted_count = result["delete_count"]
+            
+            if deleted_count == 0:
+                logger.warning(f"文件ID {file_ids} 均不存在")
+                return {
+                    "success": False,
+                    "message": f"文件ID {file_ids} 均不存在",
+                    "deleted_count": 0,
+                    "file_ids": file_ids
+                }
+            
+            # file_names 只包含删除前确实存在的文件ID
+            deleted_file_ids = list(result["file_names"].keys())
+            missing_file_ids = result["missing_file_ids"]
+            logger.info(f"批量删除完成，共删除 {len(deleted_file_ids)} 个文件、{deleted_count} 个文档")
+            if missing_file_ids:
+                logger.warning(f"以下文件ID不存在: {missing_file_ids}")
+            
+            return {
+                "success": True,
+                "message": f"成功删除 {len(deleted_file_ids)} 个文件",
+                "deleted_count": deleted_count,
+                "file_ids": deleted_file_ids,
+                "file_names": result["file_names"],
+                "missing_file_ids": missing_file_ids,
+                "delete_result": result["delete_result"]
+            }
+            
+        except Exception as e:
+            logger.error(f"批量删除文件ID {file_ids} 时发生错误: {e}")
+            return {
+                "success": False,
+                "message": f"删除失败: {str(e)}",
+                "deleted_count": 0,
+                "file_ids": file_ids
+            }
+    
     def list_all_files(self) -> Dict[str, Any]:
         """
         列出所有文件信息
@@ -183,7 +220,7 @@ class FileDeleter:
 def main():
     """命令行主函数"""
     parser = argparse.ArgumentParser(description="删除指定文件ID的文档")
-    parser.add_argument("--file-id", type=str, help="要删除的文件ID")
+    parser.add_argument("--file-id", type=str, nargs="+", help="要删除的文件ID，可同时指定多个")
     parser.add_argument("--list", action="store_true", help="列出所有文件")
     parser.add_argument("--info", type=str, help="获取指定文件ID的详细信息")
     parser.add_argument("--confirm", action="store_true", help="确认删除操作")
@@ -224,11 +261,14 @@ def main():
         elif args.file_id:
             # 删除文件
             if not args.confirm:
-                print(f"警告: 即将删除文件ID {args.file_id}")
+                print(f"警告: 即将删除文件ID {', '.join(args.file_id)}")
                 print("请使用 --confirm 参数确认删除操作")
                 return
             
-            result = deleter.delete_file_by_id(args.file_id)
+            if len(args.file_id) == 1:
+                result = deleter.delete_file_by_id(args.file_id[0])
+            else:
+                result = deleter.delete_files_by_ids(args.file_id)
             if result["success"]:
                 print(f"✅ {result['message']}")
                 print(f"删除文档数量: {result['deleted_count']}")
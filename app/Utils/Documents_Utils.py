@@ -2,6 +2,7 @@ from typing import List, Dict, Any
 from loguru import logger
 from .milvus_utils_v2 import My_MilvusClient
 from .embedding_utils import EmbeddingModel
+from .Sequence_Length import token_limit
 
 class DocumentUtils:
 
@@ -19,7 +20,7 @@ class DocumentUtils:
             
             # 只对“组件名称”列生成嵌入向量
             component_texts = texts["组件名称"]
-            embeddings = self.embedding_model.encode(component_texts)
+            embeddings = self.embedding_model.encode(component_texts, max_length=token_limit("组件名称"))
             
             # 传递完整的 texts 字典给 insert_documents，包括所有表头和内容
             self.milvus_client.insert_documents(texts, embeddings, file_id or "", file_name or "")
@@ -0,0 +1,341 @@
+"""
+进程外推理池：EmbeddingModel / RerankerModel 运行在独立的本地推理进程中，API进程通过Unix socket调用
+
+INFERENCE_MODE=pool 时 API 进程不加载模型，只做分词前的文本组装和结果处理；推理进程负责分词、
+跨请求合批和前向计算，可以独立于API进程扩缩容（新启动的推理进程会被客户端自动发现）
+
+帧格式：4字节大端头部长度 + JSON头部 + 原始字节负载
+    请求  {"op": "embed", "texts": [...], "max_length": 截断token数或null} / {"op": "score", "pairs": [[query, passage], ...], "max_length": 文档截断token数或null}
+          {"op": "info"}  握手，返回推理进程的模型信息
+    响应  {"ok": true, "dtype": "float32", "shape": [n, dim], "size": 字节数} + 矩阵内存
+          {"ok": true, "model": "embedding", "dim": 1024, "pid": ...}（info，无负载）
+          {"ok": false, "error": "..."}
+    score 返回未经sigmoid的原始分数，与 RerankerModel._score 的第一个返回值一致
+    同一批内 max_length 不同的请求分组各做一次前向计算
+响应矩阵直接以内存字节发送，客户端用 np.frombuffer 在接收缓冲区上构造数组，不做逐元素转换
+
+启动推理进程：python -m app.Utils.Inference_Pool --model embedding --workers 2
+"""
+
+import argparse
+import glob
+import json
+import os
+import queue
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from ..config import (
+    INFERENCE_MODE, INFERENCE_SOCKET_DIR, INFERENCE_WORKERS, INFERENCE_MAX_BATCH, INFERENCE_MAX_WAIT_MS,
+    TORCH_THREADS_PER_WORKER,
+)
+
+_HEADER = struct.Struct(">I")
+
+# 推理进程内为 True：模型类据此在本进程加载权重，而不是再连接推理池
+IN_WORKER = False
+
+
+class InferenceError(RuntimeError):
+    """推理进程返回错误或全部推理进程不可用"""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("连接已关闭")
+        received += count
+    return buffer
+
+
+def send_frame(sock: socket.socket, header: Dict[str, Any], payload: Optional[np.ndarray] = None):
+    if payload is not None:
+        payload = np.ascontiguousarray(payload)
+        header = {**header, "dtype": str(payload.dtype), "shape": list(payload.shape), "size": payload.nbytes}
+    encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(encoded)) + encoded)
+    if payload is not None and payload.nbytes:
+        sock.sendall(memoryview(payload).cast("B"))
+
+
+def recv_frame(sock: socket.socket) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+    (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, length).decode("utf-8"))
+    if "size" not in header:
+        return header, None
+    buffer = _recv_exact(sock, header["size"])
+    return header, np.frombuffer(buffer, dtype=header["dtype"]).reshape(header["shape"])
+
+
+def socket_path(model: str, index: int, socket_dir: str = INFERENCE_SOCKET_DIR) -> str:
+    return os.path.join(socket_dir, f"{model}-{index}.sock")
+
+
+def pool_enabled() -> bool:
+    """API进程是否应通过推理池调用模型"""
+    return INFERENCE_MODE == "pool" and not IN_WORKER
+
+
+class InferenceClient:
+    """
+    推理池客户端：按模型名发现 socket，轮询分发请求，每个 socket 维护一组可复用的连接
+
+    连接失败时换下一个推理进程重试，全部失败才抛出 InferenceError
+    """
+
+    def __init__(self, model: str, socket_dir: str = INFERENCE_SOCKET_DIR, refresh_seconds: float = 5.0):
+        self.model = model
+        self.socket_dir = socket_dir
+        self.refresh_seconds = refresh_seconds
+        self._paths: List[str] = []
+        self._refreshed_at = 0.0
+        self._next = 0
+        self._idle: Dict[str, List[socket.socket]] = {}
+        self._lock = threading.Lock()
+
+    def _discover(self, force: bool = False) -> List[str]:
+        with self._lock:
+            if force or not self._paths or time.time() - self._refreshed_at > self.refresh_seconds:
+                self._paths = sorted(glob.glob(os.path.join(self.socket_dir, f"{self.model}-*.sock")))
+                self._refreshed_at = time.time()
+            return list(self._paths)
+
+    def _acquire(self, path: str) -> socket.socket:
+        with self._lock:
+            idle = self._idle.get(path)
+            if idle:
+                return idle.pop()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(path)
+        return conn
+
+    def _release(self, path: str, conn: socket.socket):
+        with self._lock:
+            self._idle.setdefault(path, []).append(conn)
+
+    def call(self, request: Dict[str, Any]) -> np.ndarray:
+        return self._request(request)[1]
+
+    def _request(self, request: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        paths = self._discover()
+        if not paths:
+            paths = self._discover(force=True)
+        if not paths:
+            raise InferenceError(f"{self.socket_dir} 下没有可用的 {self.model} 推理进程")
+        with self._lock:
+            start = self._next
+            self._next += 1
+        last_error = None
+        for offset in range(len(paths)):
+            path = paths[(start + offset) % len(paths)]
+            try:
+                conn = self._acquire(path)
+            except OSError as e:
+                last_error = e
+                continue
+            try:
+                send_frame(conn, request)
+                header, payload = recv_frame(conn)
+            except (OSError, ConnectionError, ValueError) as e:
+                conn.close()
+                last_error = e
+                continue
+            self._release(path, conn)
+            if not header.get("ok"):
+                raise InferenceError(header.get("error", "推理失败"))
+            return header, payload
+        self._discover(force=True)
+        raise InferenceError(f"{self.model} 推理进程均不可用: {last_error}")
+
+    def info(self) -> Dict[str, Any]:
+        """握手：返回推理进程的模型信息（embedding 包含向量维度 dim）"""
+        return self._request({"op": "info"})[0]
+
+    def embed(self, texts: List[str], max_length: Optional[int] = None) -> np.ndarray:
+        return self.call({"op": "embed", "texts": texts, "max_length": max_length})
+
+    def score(self, pairs: List[List[str]], max_length: Optional[int] = None) -> np.ndarray:
+        return self.call({"op": "score", "pairs": pairs, "max_length": max_length})
+
+
+class _Pending:
+    def __init__(self, conn: socket.socket, items: List[Any], max_length: Optional[int] = None):
+        self.conn = conn
+        self.items = items
+        self.max_length = max_length
+
+
+class InferenceWorker:
+    """
+    单个推理进程：每个连接一个读线程，请求进入队列；合批线程在 max_wait_ms 内把多个请求的文本
+    拼成一次前向计算（不超过 max_batch 条），再按请求拆分结果写回
+    """
+
+    def __init__(self, model: str, path: str, max_batch: int = INFERENCE_MAX_BATCH, max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.model_name = model
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._load_model()
+
+    def _load_model(self):
+        if self.model_name == "embedding":
+            from .embedding_utils import EmbeddingModel
+            model = EmbeddingModel()
+            self._compute = model._forward
+            self._op, self._field = "embed", "texts"
+            self._info = {"model": self.model_name, "dim": model.dim}
+        elif self.model_name == "reranker":
+            from .reranker_utils import RerankerModel
+            model = RerankerModel()
+            self._compute = lambda pairs, max_length=None: model._score(pairs, max_length)[0].cpu().numpy()
+            self._op, self._field = "score", "pairs"
+            self._info = {"model": self.model_name}
+        else:
+            raise ValueError(f"未知的模型: {self.model_name}")
+        model.warm_up()
+
+    def _read_loop(self, conn: socket.socket):
+        try:
+            while True:
+                header, _ = recv_frame(conn)
+                if header.get("op") == "info":
+                    # 客户端一个连接同时只有一个请求，这里直接回复不会与合批线程交错写入
+                    send_frame(conn, {"ok": True, "pid": os.getpid(), **self._info})
+                    continue
+                if header.get("op") != self._op:
+                    send_frame(conn, {"ok": False, "error": f"{self.model_name} 推理进程不支持操作 {header.get('op')}"})
+                    continue
+                self._queue.put(_Pending(conn, header.get(self._field) or [], header.get("max_length")))
+        except (ConnectionError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"推理请求解析失败: {e}")
+        finally:
+            conn.close()
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        size = len(batch[0].items)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.items)
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            groups: Dict[Optional[int], List[_Pending]] = {}
+            for pending in self._collect():
+                groups.setdefault(pending.max_length, []).append(pending)
+            for max_length, batch in groups.items():
+                self._run_batch(batch, max_length)
+
+    def _run_batch(self, batch: List[_Pending], max_length: Optional[int]):
+        items = [item for pending in batch for item in pending.items]
+        try:
+            result = self._compute(items, max_length) if items else np.empty((0,), dtype=np.float32)
+            error = None
+        except Exception as e:
+            logger.error(f"{self.model_name} 推理失败: {e}")
+            result, error = None, str(e)
+        offset = 0
+        for pending in batch:
+            count = len(pending.items)
+            try:
+                if error is not None:
+                    send_frame(pending.conn, {"ok": False, "error": error})
+                else:
+                    send_frame(pending.conn, {"ok": True}, result[offset:offset + count])
+            except OSError:
+                pass
+            offset += count
+
+    def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(256)
+        threading.Thread(target=self._batch_loop, name="inference-batch", daemon=True).start()
+        logger.info(f"{self.model_name} 推理进程 {os.getpid()} 就绪: {self.path}")
+        try:
+            while True:
+                conn, _ = server.accept()
+                threading.Thread(target=self._read_loop, args=(conn,), daemon=True).start()
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def _run_worker(model: str, index: int, socket_dir: str, threads: int):
+    import torch
+
+    # 以 -m 启动时本文件在子进程中是 __mp_main__，标记要设在模型类导入的那个模块上
+    from . import Inference_Pool
+    Inference_Pool.IN_WORKER = True
+
+    torch.set_num_threads(threads)
+    # SIGTERM 时正常退出，删除 socket 文件，客户端不会再发现该进程
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    InferenceWorker(model, socket_path(model, index, socket_dir)).serve()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动本地推理进程")
+    parser.add_argument("--model", choices=["embedding", "reranker"], required=True)
+    parser.add_argument("--workers", type=int, default=INFERENCE_WORKERS)
+    parser.add_argument("--start-index", type=int, default=0, help="socket 编号起点，扩容时从已有进程数开始编号")
+    parser.add_argument("--socket-dir", default=INFERENCE_SOCKET_DIR)
+    args = parser.parse_args()
+
+    import multiprocessing
+
+    from .Prefork import worker_threads
+
+    threads = worker_threads(args.workers, TORCH_THREADS_PER_WORKER)
+    processes = [
+        multiprocessing.get_context("spawn").Process(
+            target=_run_worker, args=(args.model, args.start_index + index, args.socket_dir, threads), daemon=True
+        )
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+组件名称/交易名称的内存词法索引
+
+测试案例中的 <组件> 大多与库中的 组件名称 完全或几乎一致，不需要每次都做1024维向量化和ANN检索：
+- 精确匹配：规范化名称（全角转半角、小写、去空白）-> 文档，命中时跳过向量化和向量检索
+- BM25：对 组件名称/交易名称/组件说明 建立字二元组（bigram）倒排索引，名称字段的词频计两次，按交易系统分区，
+  作为第二路召回与向量检索结果按倒数排名融合（RRF）。单字（查、询……）几乎出现在每个文档中，不建倒排；
+  大分区中文档频率超过 LEXICAL_MAX_DF_RATIO 的二元组（查询、账户……）同样跳过，只遍历区分度高的倒排表
+
+索引首次使用时（或启动预热时）从Milvus全量加载，insert_documents / delete_by_file_ids 时增量更新，
+删除或覆盖整个知识库时失效，下次使用时重建。索引是进程内的，其他工作进程/副本的写入和删除同步不到：
+返回结果前按主键在Milvus中确认命中的行仍然存在（并从索引中去掉已删除的行）：一次请求的全部组件合并为一次
+按主键的query，使用知识库默认的一致性级别（Bounded），与向量检索看到的数据一致，不为强一致读等待时间戳同步。
+索引建立超过 LEXICAL_INDEX_TTL_SECONDS 后在后台重建，以包含其他进程新写入的行。返回的分数为查询与名称的字二元组Dice系数（精确匹配为1.0），
+与归一化向量的内积处于同一区间，filter_score 对两路召回同样生效
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from .Query_Cache import normalize_question
+from .Metrics import track_stage, count_cache
+from ..config import (
+    LEXICAL_INDEX_ENABLED, LEXICAL_INDEX_COLLECTIONS, LEXICAL_FUSION_WEIGHT, LEXICAL_RRF_K, LEXICAL_MAX_DF_RATIO,
+    LEXICAL_INDEX_TTL_SECONDS, BULK_LOAD_BATCH_SIZE,
+)
+
+NAME_FIELDS = ("组件名称", "交易名称")
+TEXT_FIELDS = ("组件名称", "交易名称", "组件说明")
+SYSTEM_FIELD = "交易系统"
+BM25_K1 = 1.2
+BM25_B = 0.75
+QUERY_WINDOW = 16384  # Milvus 单次 query 的 offset + limit 上限
+MIN_DF_CUTOFF = 256  # 文档频率不超过该值的词项总是参与打分，小分区遍历整个倒排表的开销可以忽略
+
+
+def normalize_name(text: str) -> str:
+    return re.sub(r"\s+", "", normalize_question(text))
+
+
+def tokenize(text: str, unigrams: bool = True) -> List[str]:
+    """字 + 相邻两字，中文名称不需要分词器；unigrams=False 时只取相邻两字，单字文本保留该字"""
+    text = normalize_name(text)
+    bigrams = [text[i:i + 2] for i in range(len(text) - 1)]
+    if not unigrams:
+        return bigrams or list(text)
+    return list(text) + bigrams
+
+
+def document_name(entity: Dict[str, Any]) -> str:
+    return next((entity[field] for field in NAME_FIELDS if entity.get(field)), "")
+
+
+def document_tokens(entity: Dict[str, Any], unigrams: bool = True) -> Counter:
+    """文档的词频：组件名称/交易名称/组件说明的字和字二元组，名称字段的词频计两次"""
+    tokens = Counter()
+    for field in TEXT_FIELDS:
+        if entity.get(field):
+            tokens.update(tokenize(entity[field], unigrams))
+    tokens.update(tokenize(document_name(entity), unigrams))
+    return tokens
+
+
+def name_similarity(query: str, name: str) -> float:
+    """字二元组 Dice 系数，单字名称按字比较"""
+    query, name = normalize_name(query), normalize_name(name)
+    if not query or not name:
+        return 0.0
+    if query == name:
+        return 1.0
+    grams = lambda text: {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+    query_grams, name_grams = grams(query), grams(name)
+    return 2 * len(query_grams & name_grams) / (len(query_grams) + len(name_grams))
+
+
+def entity_key(entity: Dict[str, Any]) -> Tuple:
+    """向量检索和词法检索返回的同一行转换后字段相同，以字段内容去重"""
+    return tuple(sorted((key, str(value)) for key, value in entity.items()))
+
+
+class _CollectionIndex:
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.exact: Dict[str, set] = {}
+        # 按交易系统分区：{交易系统: {词项: {主键: 词频}}}，检索只需遍历查询所在系统的倒排表
+        self.postings: Dict[Optional[str], Dict[str, Dict[str, int]]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.partition_lengths: Counter = Counter()
+        self.partition_counts: Counter = Counter()
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, pk: str, entity: Dict[str, Any]):
+        if pk in self.docs:
+            self.remove(pk)
+        tokens = document_tokens(entity, unigrams=False)
+        system = entity.get(SYSTEM_FIELD)
+        self.docs[pk] = entity
+        self.exact.setdefault(normalize_name(document_name(entity)), set()).add(pk)
+        postings = self.postings.setdefault(system, {})
+        for token, count in tokens.items():
+            postings.setdefault(token, {})[pk] = count
+        self.lengths[pk] = sum(tokens.values())
+        self.partition_lengths[system] += self.lengths[pk]
+        self.partition_counts[system] += 1
+
+    def remove(self, pk: str):
+        entity = self.docs.pop(pk, None)
+        if entity is None:
+            return
+        name = normalize_name(document_name(entity))
+        self.exact.get(name, set()).discard(pk)
+        if not self.exact.get(name):
+            self.exact.pop(name, None)
+        system = entity.get(SYSTEM_FIELD)
+        postings = self.postings.get(system, {})
+        for token in document_tokens(entity, unigrams=False):
+            posting = postings.get(token)
+            if posting is not None:
+                posting.pop(pk, None)
+                if not posting:
+                    del postings[token]
+        if not postings:
+            self.postings.pop(system, None)
+        self.partition_lengths[system] -= self.lengths.pop(pk, 0)
+        self.partition_counts[system] -= 1
+        if self.partition_counts[system] <= 0:
+            del self.partition_counts[system], self.partition_lengths[system]
+
+    def term_count(self) -> int:
+        return sum(len(postings) for postings in self.postings.values())
+
+    @staticmethod
+    def _matches(entity: Dict[str, Any], system_name: Optional[str], file_id: Optional[str]) -> bool:
+        # 与向量检索的过滤表达式一致：交易系统必须相等，指定 file_id 时只在该文件内检索
+        return entity.get(SYSTEM_FIELD) == system_name and (not file_id or entity.get("file_id") == file_id)
+
+    def exact_match(self, name: str, system_name: Optional[str], file_id: Optional[str]) -> List[str]:
+        pks = self.exact.get(normalize_name(name), ())
+        return [pk for pk in pks if self._matches(self.docs[pk], system_name, file_id)]
+
+    def bm25(self, query: str, system_name: Optional[str], file_id: Optional[str], top_k: int) -> List[str]:
+        postings = self.postings.get(system_name)
+        count = self.partition_counts.get(system_name, 0)
+        if not postings or not count:
+            return []
+        average = self.partition_lengths[system_name] / count
+        matched = [postings[token] for token in set(tokenize(query, unigrams=False)) if token in postings]
+        if not matched:
+            return []
+        # 常见词项区分度低却要遍历整个倒排表，跳过；全部都很常见时只保留最少见的一个
+        max_df = max(MIN_DF_CUTOFF, int(count * LEXICAL_MAX_DF_RATIO))
+        selected = [posting for posting in matched if len(posting) <= max_df] or [min(matched, key=len)]
+        scores: Dict[str, float] = {}
+        for posting in selected:
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for pk, frequency in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[pk] / average)
+                scores[pk] = scores.get(pk, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        candidates = scores.items()
+        if file_id:
+            candidates = [(pk, score) for pk, score in candidates if self.docs[pk].get("file_id") == file_id]
+        return [pk for pk, _ in heapq.nlargest(top_k, candidates, key=lambda item: item[1])]
+
+
+class LexicalIndex:
+    def __init__(self, collections: Sequence[str] = LEXICAL_INDEX_COLLECTIONS, enabled: bool = LEXICAL_INDEX_ENABLED):
+        self.collections = set(collections)
+        self.enabled = enabled
+        self._indexes: Dict[str, _CollectionIndex] = {}
+        self._build_lock = threading.Lock()
+        self._refreshing: set = set()
+        self._client = None
+
+    def covers(self, collection_name: str) -> bool:
+        return self.enabled and collection_name in self.collections
+
+    @staticmethod
+    def to_entity(row: Dict[str, Any], field_name_mapping: Dict[str, str]) -> Dict[str, Any]:
+        """Milvus 行（规范化字段名）-> 与 My_MilvusClient.search_similar 返回一致的原始字段名实体"""
+        entity = {"file_id": row.get("file_id"), "file_name": row.get("file_name")}
+        for original_field, normalized_field in field_name_mapping.items():
+            if normalized_field in row:
+                entity[original_field] = row[normalized_field]
+        return entity
+
+    def _load_rows(self, client, collection_name: str, output_fields: List[str]) -> Iterable[Dict[str, Any]]:
+        total = int(client.get_collection_stats(collection_name).get("row_count", 0))
+        if total <= QUERY_WINDOW:
+            yield from client.query(collection_name=collection_name, filter="", output_fields=output_fields, limit=QUERY_WINDOW)
+            return
+        from pymilvus import Collection
+
+        iterator = Collection(collection_name, using=client._using).query_iterator(
+            batch_size=BULK_LOAD_BATCH_SIZE, output_fields=output_fields
+        )
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            iterator.close()
+
+    def build(self, collection_name: str) -> _CollectionIndex:
+        """从 Milvus 全量加载一个知识库的名称字段；知识库不存在时返回空索引"""
+        from .milvus_utils_v2 import My_MilvusClient
+        from .Collection_Residency import residency_manager
+
+        milvus = My_MilvusClient(collection_name=collection_name)
+        index = _CollectionIndex()
+        if milvus.client.has_collection(collection_name):
+            residency_manager.ensure_loaded(collection_name)
+            output_fields = ["id", "file_id", "file_name"] + list(milvus.field_name_mapping.values())
+            for row in self._load_rows(milvus.client, collection_name, output_fields):
+                index.add(row["id"], self.to_entity(row, milvus.field_name_mapping))
+        logger.info(f"词法索引已建立: {collection_name}，{len(index.docs)} 条，{index.term_count()} 个词项")
+        return index
+
+    def _get(self, collection_name: str) -> Optional[_CollectionIndex]:
+        if not self.covers(collection_name):
+            return None
+        index = self._indexes.get(collection_name)
+        if index is None:
+            with self._build_lock:
+                index = self._indexes.get(collection_name)
+                if index is None:
+                    index = self._indexes[collection_name] = self.build(collection_name)
+        elif LEXICAL_INDEX_TTL_SECONDS > 0 and time.monotonic() - index.built_at > LEXICAL_INDEX_TTL_SECONDS:
+            self._refresh(collection_name, index)
+        return index
+
+    def _refresh(self, collection_name: str, index: _CollectionIndex):
+        """后台重建过期的索引，重建期间继续使用旧索引"""
+        with self._build_lock:
+            if collection_name in self._refreshing:
+                return
+            self._refreshing.add(collection_name)
+
+        def run():
+            try:
+                fresh = self.build(collection_name)
+                with self._build_lock:
+                    # 重建期间索引被失效或替换时丢弃结果
+                    if self._indexes.get(collection_name) is index:
+                        self._indexes[collection_name] = fresh
+            except Exception as e:
+                logger.warning(f"重建词法索引 {collection_name} 失败: {e}")
+                index.built_at = time.monotonic()
+            finally:
+                with self._build_lock:
+                    self._refreshing.discard(collection_name)
+
+        threading.Thread(target=run, name=f"lexical-refresh-{collection_name}", daemon=True).start()
+
+    def _milvus(self):
+        if self._client is None:
+            from .Milvus_Connection import MilvusConnection
+
+            self._client = MilvusConnection().client
+        return self._client
+
+    def _existing(self, collection_name: str, index: _CollectionIndex, pks: Iterable[str]) -> Set[str]:
+        """按主键确认命中的行仍在 Milvus 中，返回仍存在的主键，已被其他进程删除的行从索引中去掉"""
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return set()
+        with track_stage("lexical_verify", collection_name):
+            rows = self._milvus().query(collection_name=collection_name, ids=pks, output_fields=["id"])
+        existing = {row["id"] for row in rows}
+        stale = [pk for pk in pks if pk not in existing]
+        if stale:
+            with index.lock:
+                for pk in stale:
+                    index.remove(pk)
+            logger.info(f"词法索引 {collection_name} 去掉 {len(stale)} 条已在Milvus中删除的行")
+        return existing
+
+    def build_all(self):
+        """启动预热：为全部配置的知识库建立索引"""
+        for collection_name in sorted(self.collections) if self.enabled else []:
+            self._get(collection_name)
+
+    def add_rows(self, collection_name: str, rows: List[Dict[str, Any]], field_name_mapping: Dict[str, str]):
+        """写入 Milvus 后同步更新索引；索引尚未建立时不处理，首次使用时全量加载会包含这些行"""
+        index = self._indexes.get(collection_name) if self.covers(collection_name) else None
+        if index is None:
+            return
+        with index.lock:
+            for row in rows:
+                index.add(row["id"], self.to_entity(row, field_name_mapping))
+
+    def remove_files(self, collection_name: str, file_ids: Sequence[str]):
+        index = self._indexes.get(collection_name) if self.covers(collection_name) else None
+        if index is None:
+            return
+        file_ids = set(file_ids)
+        with index.lock:
+            for pk in [pk for pk, entity in index.docs.items() if entity.get("file_id") in file_ids]:
+                index.remove(pk)
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        """知识库被删除、覆盖或绕过 insert_documents 批量写入后丢弃索引，下次使用时重建"""
+        if collection_name is None:
+            self._indexes.clear()
+        else:
+            self._indexes.pop(collection_name, None)
+
+    def exact_match_many(self, collection_name: str, names: Sequence[str], system_name: Optional[str],
+                         file_id: Optional[str] = None) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+        """多个名称的精确匹配，命中的行合并为一次 Milvus 查询确认；返回 {名称: [(文档, 1.0)]}"""
+        index = self._get(collection_name)
+        if index is None:
+            return {name: [] for name in names}
+        with index.lock:
+            candidates = {name: index.exact_match(name, system_name, file_id) for name in names}
+        existing = self._existing(collection_name, index, (pk for pks in candidates.values() for pk in pks))
+        results = {}
+        with index.lock:
+            for name, pks in candidates.items():
+                results[name] = [(index.docs[pk], 1.0) for pk in pks if pk in existing and pk in index.docs]
+                count_cache("lexical_exact", "hit" if results[name] else "miss")
+        return results
+
+    def exact_match(self, collection_name: str, name: str, system_name: Optional[str], file_id: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        return self.exact_match_many(collection_name, [name], system_name, file_id)[name]
+
+    def search_many(self, collection_name: str, queries: Sequence[str], system_name: Optional[str], top_k: int,
+                    filter_score: float = 0.0, file_id: Optional[str] = None) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+        """多个查询的 BM25 召回，召回的行合并为一次 Milvus 查询确认；分数为查询与名称的相似度（见 name_similarity）"""
+        index = self._get(collection_name)
+        if index is None:
+            return {query: [] for query in queries}
+        with track_stage("lexical_search", collection_name):
+            with index.lock:
+                candidates = {query: index.bm25(query, system_name, file_id, top_k) for query in queries}
+            existing = self._existing(collection_name, index, (pk for pks in candidates.values() for pk in pks))
+        results = {}
+        with index.lock:
+            for query, pks in candidates.items():
+                scored = [
+                    (entity, name_similarity(query, document_name(entity)))
+                    for entity in (index.docs[pk] for pk in pks if pk in existing and pk in index.docs)
+                ]
+                results[query] = [(entity, score) for entity, score in scored if score >= filter_score]
+        return results
+
+    def search(self, collection_name: str, query: str, system_name: Optional[str], top_k: int,
+               filter_score: float = 0.0, file_id: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """BM25 召回，分数为查询与名称的相似度（见 name_similarity）"""
+        return self.search_many(collection_name, [query], system_name, top_k, filter_score, file_id)[query]
+
+    @staticmethod
+    def fuse(vector_results: List[Tuple[Dict[str, Any], float]], lexical_results: List[Tuple[Dict[str, Any], float]],
+             top_k: int, weight: float = LEXICAL_FUSION_WEIGHT, k: int = LEXICAL_RRF_K) -> List[Tuple[Dict[str, Any], float]]:
+        """倒数排名融合：按 sum(权重 / (k + 名次)) 排序，分数取两路中较高的一个"""
+        fused: Dict[Tuple, List] = {}
+        for results, result_weight in ((vector_results, 1.0), (lexical_results, weight)):
+            for rank, (entity, score) in enumerate(results, start=1):
+                entry = fused.setdefault(entity_key(entity), [entity, score, 0.0])
+                entry[1] = max(entry[1], score)
+                entry[2] += result_weight / (k + rank)
+        ranked = sorted(fused.values(), key=lambda entry: -entry[2])
+        return [(entity, score) for entity, score, _ in ranked[:top_k]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "collections": {
+                name: {"documents": len(index.docs), "terms": index.term_count()}
+                for name, index in self._indexes.items()
+            },
+        }
+
+
+# 创建全局实例
+lexical_index = LexicalIndex()
@@ -0,0 +1,222 @@
+"""
+进程内指标：分阶段耗时直方图、批大小/缓存命中计数，以 Prometheus 文本格式导出
+
+不依赖 prometheus_client，每次记录只是一次 bisect 和几次整数累加，可以在生产环境常开
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.requests import Request
+from starlette.routing import Match
+
+from ..config import METRICS_ENABLED
+
+# 当前请求的接口路由模板，由中间件设置，供模型/检索等内部阶段打标签
+current_endpoint: contextvars.ContextVar = contextvars.ContextVar("current_endpoint", default="")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # {labels: [各桶计数..., +Inf计数, 总和]}，桶计数为非累积值，导出时再累加
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """{labels: (观测次数, 总和)}，基准测试前后各取一次做差得到该时段内的分阶段耗时"""
+        with self._lock:
+            return {labels: (int(sum(series[:-1])), series[-1]) for labels, series in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._values.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.histogram(
+    "rag_http_request_duration_seconds", "HTTP请求总耗时", ("endpoint", "method", "status"))
+STAGE_LATENCY = metrics.histogram(
+    "rag_stage_duration_seconds", "请求内各阶段耗时（tokenize/embed_forward/milvus_search/rerank/graph_validation/serialization）",
+    ("stage", "endpoint", "collection"))
+BATCH_SIZE = metrics.histogram(
+    "rag_batch_size", "模型每次前向计算的批大小", ("stage",), BATCH_BUCKETS)
+CACHE_REQUESTS = metrics.counter(
+    "rag_cache_requests_total", "缓存查询次数，按缓存和结果（hit/semantic_hit/miss）区分", ("cache", "result"))
+COALESCED_REQUESTS = metrics.counter(
+    "rag_coalesced_requests_total", "被合并到进行中相同请求的请求数", ("endpoint",))
+MODEL_TOKENS = metrics.counter(
+    "rag_model_tokens_total", "模型前向计算的token数，按模型和类型（real/padding）区分", ("model", "kind"))
+RERANK_CASCADE = metrics.counter(
+    "rag_rerank_cascade_candidates_total", "级联重排的候选数，按决定方式（accepted/reranked/rejected）区分", ("decision",))
+RERANK_SHADOW = metrics.counter(
+    "rag_rerank_cascade_shadow_total", "级联重排与完整重排的影子对比次数，按 top1 是否一致（agree/disagree）区分", ("top1",))
+
+
+@contextmanager
+def track_stage(stage: str, collection: str = ""):
+    """记录一个阶段的耗时，接口标签取自当前请求"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage, current_endpoint.get(), collection or "")
+
+
+def observe_batch(stage: str, size: int):
+    if METRICS_ENABLED:
+        BATCH_SIZE.observe(size, stage)
+
+
+def count_cache(cache: str, result: str, amount: int = 1):
+    if METRICS_ENABLED and amount:
+        CACHE_REQUESTS.inc(cache, result, amount=amount)
+
+
+def count_tokens(model: str, real: int, padding: int):
+    if METRICS_ENABLED:
+        MODEL_TOKENS.inc(model, "real", amount=real)
+        MODEL_TOKENS.inc(model, "padding", amount=padding)
+
+
+def count_cascade(decision: str, amount: int = 1):
+    if METRICS_ENABLED and amount:
+        RERANK_CASCADE.inc(decision, amount=amount)
+
+
+def count_shadow(result: str):
+    if METRICS_ENABLED:
+        RERANK_SHADOW.inc(result)
+
+
+def _route_path(request: Request) -> str:
+    """按路由模板而不是实际路径打标签，避免路径参数造成标签爆炸"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+
+async def metrics_middleware(request: Request, call_next):
+    """HTTP中间件：记录请求总耗时，并把路由模板写入 current_endpoint 供内部阶段和按接口的截断配置使用"""
+    endpoint = _route_path(request)
+    token = current_endpoint.set(endpoint)
+    if not METRICS_ENABLED:
+        try:
+            return await call_next(request)
+        finally:
+            current_endpoint.reset(token)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint, request.method, str(status))
+        current_endpoint.reset(token)
+
+
+def instrument_serialization():
+    """
+    给 FastAPI 的响应序列化（response_model 校验 + jsonable_encoder）计时
+    fastapi.routing 在调用时按模块全局名查找 serialize_response，替换后对所有路由生效
+    """
+    from fastapi import routing
+
+    if getattr(routing.serialize_response, "_instrumented", False):
+        return
+    original = routing.serialize_response
+
+    async def serialize_response(*args, **kwargs):
+        with track_stage("serialization"):
+            return await original(*args, **kwargs)
+
+    serialize_response._instrumented = True
+    routing.serialize_response = serialize_response
@@ -2,6 +2,11 @@ from marshmallow import schema
 from .Milvus_Connection import MilvusConnection
 from pymilvus import DataType
 from loguru import logger
+from typing import Dict, List
+from .Query_Cache import query_cache
+from .Lexical_Index import lexical_index
+from ..config import MILVUS_INSERT_BATCH_SIZE, VECTOR_METRIC_TYPE
+
 
 class MilvusFunctions:
     """
@@ -11,7 +16,7 @@ class MilvusFunctions:
         self.client = MilvusConnection().client
 
     # 创建组件名称的collection
-    def create_collection(self, collection_name, dimension = 1024, metric_type = "COSINE"):
+    def create_collection(self, collection_name, dimension = 1024, metric_type = VECTOR_METRIC_TYPE):
         
         if self.client.has_collection(collection_name):
             logger.info(f"collection {collection_name} already exists")
@@ -45,7 +50,7 @@ class MilvusFunctions:
         
 
     # 创建交易名称的collection
-    def create_transaction_collection(self, collection_name, dimension = 1024, metric_type = "COSINE"):
+    def create_transaction_collection(self, collection_name, dimension = 1024, metric_type = VECTOR_METRIC_TYPE):
         if self.client.has_collection(collection_name):
             logger.info(f"collection {collection_name} already exists")
             return
@@ -76,7 +81,7 @@ class MilvusFunctions:
             raise e
 
 #交易名称创建v3版本的collection
-    def create_transaction_collection_v3(self, collection_name, dimension = 1024, metric_type = "COSINE"):
+    def create_transaction_collection_v3(self, collection_name, dimension = 1024, metric_type = VECTOR_METRIC_TYPE):
         if self.client.has_collection(collection_name):
             logger.info(f"collection {collection_name} already exists")
             return
@@ -123,7 +128,7 @@ class MilvusFunctions:
         """
         组件信息表涉及到输入参数和输出参数的创建collection的建表操作
         """
-    def create_dataItem_v1(self, collection_name, dimension = 1024, metric_type = "COSINE"):
+    def create_dataItem_v1(self, collection_name, dimension = 1024, metric_type = VECTOR_METRIC_TYPE):
         if self.client.has_collection(collection_name):
             logger.info(f"collection {collection_name} already exists")
             return
@@ -162,15 +167,22 @@ class MilvusFunctions:
             logger.error(f"failed to create collection {collection_name}: {e}")
             raise e
 
-    def insert(self, collection_name, data):
+    def insert(self, collection_name, data: List[Dict], batch_size = MILVUS_INSERT_BATCH_SIZE):
+        """
+        按行插入，每 batch_size 行调用一次 MilvusClient.insert，控制单次请求大小
+        向量字段可以直接是float32 ndarray（编码结果矩阵的一行），不必先转换成列表
+        """
 
         if not self.client.has_collection(collection_name):
             logger.error(f"collection {collection_name} does not exist")
             raise Exception(f"collection {collection_name} does not exist")
 
         try:
-            self.client.insert(collection_name, data)
-            logger.info(f"data inserted into collection {collection_name} sussessfully")
+            for start in range(0, len(data), batch_size):
+                self.client.insert(collection_name, data[start:start + batch_size])
+            logger.info(f"{len(data)} rows inserted into collection {collection_name} sussessfully")
+            query_cache.invalidate_files({row.get("file_id") for row in data})
+            lexical_index.invalidate(collection_name)
         except Exception as e:
             logger.error(f"failed to insert data into collection {collection_name}: {e}")
             raise e
@@ -0,0 +1,143 @@
+"""
+模型预热与CPU推理图编译
+
+部署后第一个真实查询要承担算子初始化、分词器缓存、内存分配器扩容（以及 torch.compile 的编译）开销，
+这里在服务就绪前按 批大小 × 序列长度 分桶把这些开销提前付掉，并记录预热耗时和预热后首次查询耗时
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+import torch
+import torch.nn as nn
+from loguru import logger
+
+from ..config import MODEL_WARMUP_ENABLED, MODEL_WARMUP_BATCH_SIZES, MODEL_WARMUP_SEQ_LENGTHS, MODEL_COMPILE
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+class _FirstOutput(nn.Module):
+    """按位置参数调用 HF 模型并只返回第一个输出（last_hidden_state / logits），供 TorchScript 追踪"""
+
+    def __init__(self, model: nn.Module, input_names: Iterable[str]):
+        super().__init__()
+        self.model = model
+        self.input_names = tuple(input_names)
+
+    def forward(self, *tensors):
+        return self.model(**dict(zip(self.input_names, tensors)), return_dict=True)[0]
+
+
+class CompiledForward:
+    """
+    模型前向调用：forward(inputs) -> 第一个输出张量
+
+    MODEL_COMPILE 为 torch_compile / torchscript 且模型在CPU上时使用编译后的图，
+    编译或调用失败时记录警告并永久回退到 eager。
+    编译（torchscript 追踪会执行一次真实前向）推迟到第一次调用，即各进程自己的预热阶段：
+    prefork 主进程创建模型时只加载权重，不启动OpenMP线程池
+    """
+
+    def __init__(self, name: str, model: nn.Module, tokenizer, device: torch.device, mode: str = MODEL_COMPILE):
+        self.name = name
+        self.model = model
+        self.mode = "none"
+        self._tokenizer = tokenizer
+        self._compiled = None
+        self._pending_mode = None
+        self._lock = threading.Lock()
+        if mode in ("", "none"):
+            return
+        if device.type != "cpu":
+            logger.info(f"{name} 模型在 {device} 上，跳过 {mode} 编译")
+            return
+        if mode not in ("torch_compile", "torchscript"):
+            logger.warning(f"未知的 MODEL_COMPILE={mode}，{name} 使用 eager 推理")
+            return
+        self._pending_mode = mode
+
+    def _compile(self, mode: str):
+        try:
+            if mode == "torch_compile":
+                compiled = torch.compile(self.model, dynamic=True)
+                self._compiled = lambda inputs: compiled(**inputs, return_dict=True)[0]
+            else:
+                # 示例批次需包含padding，追踪出的图才会保留attention mask分支
+                example = self._tokenizer(["预热文本" * 4, "预热"], padding=True, return_tensors="pt")
+                names = [name for name in _INPUT_NAMES if name in example]
+                with torch.no_grad():
+                    traced = torch.jit.trace(_FirstOutput(self.model, names), tuple(example[name] for name in names), strict=False)
+                self._compiled = lambda inputs: traced(*(inputs[name] for name in names))
+            self.mode = mode
+            logger.info(f"{self.name} 模型启用 {mode} 推理")
+        except Exception as e:
+            logger.warning(f"{self.name} 模型 {mode} 编译失败，回退 eager: {e}")
+
+    def __call__(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        if self._pending_mode is not None:
+            with self._lock:
+                if self._pending_mode is not None:
+                    self._compile(self._pending_mode)
+                    self._pending_mode = None
+        if self._compiled is not None:
+            try:
+                return self._compiled(inputs)
+            except Exception as e:
+                logger.warning(f"{self.name} 模型 {self.mode} 推理失败，回退 eager: {e}")
+                self._compiled = None
+                self.mode = "none"
+        return self.model(**inputs, return_dict=True)[0]
+
+
+class FirstQueryTimer:
+    """预热完成后记录每个模型第一次真实调用的耗时，只记录一次"""
+
+    def __init__(self):
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def arm(self, name: str):
+        with self._lock:
+            self._pending.add(name)
+
+    def record(self, name: str, seconds: float):
+        if name not in self._pending:
+            return
+        with self._lock:
+            if name not in self._pending:
+                return
+            self._pending.discard(name)
+        logger.info(f"{name} 预热后首次查询耗时 {seconds * 1000:.1f}ms")
+
+
+def warmup_text(seq_len: int) -> str:
+    """生成约 seq_len 个token的中文文本（bge系列中文按字切分，扣除 [CLS]/[SEP]）"""
+    return ("预热文本" * (seq_len // 4 + 1))[:max(1, seq_len - 2)]
+
+
+def warm_up_model(name: str, run: Callable[[int, int], Any]) -> Dict[str, Any]:
+    """
+    按 批大小 × 序列长度 依次调用 run(batch_size, seq_len)，异常直接抛出（预热失败则服务不就绪）
+
+    MODEL_WARMUP_ENABLED 关闭时只跑一条短文本
+    """
+    batch_sizes: List[int] = MODEL_WARMUP_BATCH_SIZES if MODEL_WARMUP_ENABLED else [1]
+    seq_lengths: List[int] = MODEL_WARMUP_SEQ_LENGTHS if MODEL_WARMUP_ENABLED else [8]
+    start_time = time.time()
+    shapes = {}
+    for seq_len in seq_lengths:
+        for batch_size in batch_sizes:
+            shape_start = time.time()
+            run(batch_size, seq_len)
+            shapes[f"{batch_size}x{seq_len}"] = time.time() - shape_start
+            logger.debug(f"{name} 预热 batch={batch_size} seq={seq_len} 耗时 {shapes[f'{batch_size}x{seq_len}']:.3f}s")
+    elapsed = time.time() - start_time
+    logger.info(f"{name} 模型预热完成：{len(shapes)} 个形状，耗时 {elapsed:.2f}s")
+    first_query_timer.arm(name)
+    return {"seconds": elapsed, "shapes": shapes}
+
+
+# 创建全局实例
+first_query_timer = FirstQueryTimer()
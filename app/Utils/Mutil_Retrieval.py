@@ -1,10 +1,52 @@
 from .milvus_utils_v2 import My_MilvusClient
 from loguru import logger
-from typing import List, Tuple, Dict, Any
-from .embedding_utils  import EmbeddingModel
+from typing import List, Tuple, Dict, Any, Optional
+from .embedding_utils  import embedding_model
+from .Startup import startup_manager
+from .Lexical_Index import lexical_index
+from .Sequence_Length import token_limit
+from ..logger import summarize
+from ..config import LEXICAL_EXACT_SHORTCUT, LEXICAL_FUSION_WEIGHT
+
+milvus_client = startup_manager.lazy("multi_retrieval.milvus_client", My_MilvusClient)
+startup_manager.add_warmup("lexical_index", lambda: lexical_index.build_all())
+
+
+def _retrieve_components(components: List[str], system_name: str, filter_score: float, top_k: int, file_id: str = None) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+    """
+    一次请求全部组件的初始检索：名称精确命中的组件直接返回命中的文档，
+    其余组件做向量检索（HYBRID_SEARCH_ENABLED 时为稠密 + 稀疏混合检索），并与BM25召回按倒数排名融合。
+    词法索引的命中在每个阶段合并为一次 Milvus 查询确认，而不是每个组件一次
+    """
+    collection_name = milvus_client.collection_name
+    lexical = lexical_index.covers(collection_name)
+    all_results = {}
+    if lexical and LEXICAL_EXACT_SHORTCUT:
+        for component, exact in lexical_index.exact_match_many(collection_name, components, system_name, file_id).items():
+            if exact:
+                logger.debug(f"组件 {component} 名称精确命中 {len(exact)} 条，跳过向量检索")
+                all_results[component] = exact[:top_k]
+
+    remaining = [component for component in dict.fromkeys(components) if component not in all_results]
+    for component in remaining:
+        query_embedding = embedding_model.encode([component], max_length=token_limit("query"))[0]
+        logger.debug("Query embedding: {}", summarize(query_embedding))
+        if file_id:
+            all_results[component] = milvus_client.search_similar_in_file(system_name, query_embedding, top_k, filter_score, file_id, query_text=component)
+        else:
+            all_results[component] = milvus_client.search_similar(system_name, query_embedding, top_k, filter_score, query_text=component)
+    # 混合检索的稀疏向量已经包含BM25召回，不再重复融合
+    if remaining and lexical and LEXICAL_FUSION_WEIGHT > 0 and not milvus_client.uses_hybrid_search():
+        candidates = lexical_index.search_many(collection_name, remaining, system_name, top_k, filter_score, file_id)
+        for component in remaining:
+            all_results[component] = lexical_index.fuse(all_results[component], candidates[component], top_k)
+    return {component: all_results[component] for component in components}
+
+
+def retrieval_metric_type() -> Optional[str]:
+    """初始检索分数所用的索引度量，重排时据此判断分数是否为相似度"""
+    return milvus_client.metric_type()
 
-embedding_model = EmbeddingModel()
-milvus_client = My_MilvusClient()
 
 def Multi_Retrieval_withfile_id(components : List[str], system_name : str, file_id : str, filter_score : float, top_k : int = 5) ->  Dict[str, List] :
 
@@ -17,28 +59,12 @@ def Multi_Retrieval_withfile_id(components : List[str], system_name : str, file_
     :param top_k: The number of retrieved documents.
     :return: A list of retrieved documents and their scores.
     """
-    num = len(components)
-    logger.info(f"Number of components: {num}")
-    all_results = {}
-    for i in range(num):
-        component = components[i]
-        query_embedding = embedding_model.encode([component])[0]
-        logger.info(f"Query embedding: {query_embedding}")
-        results = milvus_client.search_similar_in_file(system_name, query_embedding, top_k, filter_score, file_id)
-        all_results[component] = results
-    return all_results
+    logger.info(f"Number of components: {len(components)}")
+    return _retrieve_components(components, system_name, filter_score, top_k, file_id=file_id)
 
 def Multi_Retrieval_withoutfile_id(components : List[str], system_name : str, filter_score : float, top_k : int = 5) ->  Dict[str, List] :
 
-    num = len(components)
-    logger.info(f"Number of components: {num}")
-    all_results = {}
-    for i in range(num):
-        component = components[i]
-        query_embedding = embedding_model.encode([component])[0]
-        logger.info(f"Query embedding: {query_embedding}")
-        results = milvus_client.search_similar(system_name, query_embedding, top_k, filter_score)
-        all_results[component] = results
-    return all_results
+    logger.info(f"Number of components: {len(components)}")
+    return _retrieve_components(components, system_name, filter_score, top_k)
 
 
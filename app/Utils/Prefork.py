@@ -0,0 +1,112 @@
+"""
+先加载后fork的多进程部署
+
+主进程加载模型权重后绑定端口并fork出工作进程：权重张量的内存页只读、子进程写时复制共享，
+N个工作进程只占一份模型内存；Milvus连接、预热等在各子进程的启动阶段（lifespan）中完成
+
+注意：主进程中不能执行模型推理，否则OpenMP线程池在fork后的子进程中不可用；
+MODEL_COMPILE 的编译（torchscript 追踪会执行前向计算）因此推迟到各子进程预热时的第一次调用
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Dict, List
+
+import torch
+from loguru import logger
+
+from .Startup import startup_manager
+from ..config import PRELOAD_COMPONENTS, TORCH_THREADS_PER_WORKER
+
+
+def worker_threads(workers: int, threads: int = TORCH_THREADS_PER_WORKER) -> int:
+    """每个工作进程的torch计算线程数，未配置时按CPU核数平分，避免多进程抢占同一批核"""
+    if threads > 0:
+        return threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_worker(app, sock: socket.socket, threads: int, log_level: str):
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    logger.info(f"工作进程 {os.getpid()} 启动，torch线程数 {threads}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def run_prefork(app, host: str, port: int, workers: int, preload: List[str] = PRELOAD_COMPONENTS, log_level: str = "info"):
+    """
+    主进程：加载 preload 中的组件、绑定端口、fork工作进程并在其异常退出时重新拉起；
+    收到 SIGTERM/SIGINT 时通知全部工作进程退出
+    """
+    start_time = time.time()
+    startup_manager.preload(preload)
+    logger.info(f"主进程预加载 {preload} 完成，耗时 {time.time() - start_time:.2f}s")
+
+    sock = _bind(host, port)
+    threads = worker_threads(workers)
+    # 把已有对象移出GC跟踪，避免子进程中的垃圾回收改写对象头触发整页复制
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(app, sock, threads, log_level)
+            except BaseException as e:
+                logger.error(f"工作进程 {os.getpid()} 异常退出: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = index
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(workers):
+        spawn(index)
+    logger.info(f"已启动 {workers} 个工作进程，监听 {host}:{port}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        if not stopping:
+            logger.warning(f"工作进程 {pid} 退出（状态 {status}），1s 后重新启动")
+            time.sleep(1)
+            spawn(index)
+    sock.close()
+    logger.info("全部工作进程已退出")
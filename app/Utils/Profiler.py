@@ -0,0 +1,254 @@
+"""
+请求级采样剖析：对单个请求周期性采集处理线程的Python调用栈，按请求ID保存为折叠栈（collapsed stack）格式，
+可直接交给 flamegraph.pl / speedscope 生成火焰图，用来判断慢请求的时间花在分词、torch、pymilvus 还是 pydantic 上
+
+- 触发：PROFILE_ENABLED 开启后（默认关闭），请求头 PROFILE_HEADER 为 1/true，或按 PROFILE_SAMPLE_RATE 随机抽样；
+  结果ID由服务端生成，响应头 X-Profile-Id 返回，客户端的 x-request-id 只作为元数据记录，不用作文件名
+- 采样：一个后台线程每 PROFILE_INTERVAL_MS 用 sys._current_frames() 读取被剖析请求所在线程的调用栈，
+  只在有请求被剖析时运行，不修改被剖析代码，开销与采样间隔成正比
+- 线程归属：请求所在的事件循环线程，以及 FastAPI 为同步接口/依赖分配的线程池线程（替换 fastapi.routing.run_in_threadpool
+  登记）。事件循环线程上并发的其他异步请求也会被采到；接口内部自建的线程池和推理池进程不在采样范围内，
+  对应时间表现为调用方线程阻塞在等待结果的位置
+"""
+
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from ..config import PROFILE_ENABLED, PROFILE_HEADER, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_FILES
+
+# 当前请求的剖析会话，由中间件设置；线程池中执行的同步接口据此把所在线程登记到会话
+current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+_PROFILE_ID = re.compile(r"^[\w-]{1,64}$")
+_MAX_DEPTH = 128
+
+
+class RequestProfile:
+    """一个请求的剖析会话：参与处理的线程和累计的折叠栈计数"""
+
+    def __init__(self, profile_id: str, request: Request):
+        self.id = profile_id
+        self.request_id = request.headers.get("x-request-id", "")[:128]
+        self.method = request.method
+        self.path = request.url.path
+        self.query = request.url.query
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.threads: Dict[int, int] = {}  # {线程ID: 登记次数}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    @contextmanager
+    def attach(self, ident: Optional[int] = None):
+        """在 with 块内把线程（默认当前线程）登记为该请求的处理线程"""
+        ident = ident or threading.get_ident()
+        self.threads[ident] = self.threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            if self.threads.get(ident, 0) <= 1:
+                self.threads.pop(ident, None)
+            else:
+                self.threads[ident] -= 1
+
+
+class SamplingProfiler:
+    def __init__(self, directory: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS, header: str = PROFILE_HEADER,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, max_files: int = PROFILE_MAX_FILES, enabled: bool = PROFILE_ENABLED):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.header = header.lower()
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.enabled = enabled
+        self._active: Dict[str, RequestProfile] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._labels: Dict[Any, str] = {}
+
+    def _should_profile(self, request: Request) -> bool:
+        if request.headers.get(self.header, "").lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename.replace("\\", "/")
+            marker = filename.rfind("-packages/")
+            if marker >= 0:
+                filename = filename[marker + len("-packages/"):]
+            elif filename.startswith(os.getcwd()):
+                filename = os.path.relpath(filename)
+            # 折叠栈以分号分隔帧、以空格分隔计数，帧名中不能出现分号
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    def _collapse(self, frame) -> Optional[str]:
+        # 事件循环线程空闲时停在 selectors 上，不计入样本
+        if frame.f_code.co_filename.endswith("selectors.py"):
+            return None
+        labels = []
+        while frame is not None and len(labels) < _MAX_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                profiles = list(self._active.values())
+            if not profiles:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                for ident in list(profile.threads):
+                    frame = frames.get(ident)
+                    stack = self._collapse(frame) if frame is not None else None
+                    if stack:
+                        profile.stacks[stack] += 1
+                        profile.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def start(self, request: Request) -> RequestProfile:
+        profile = RequestProfile(uuid.uuid4().hex, request)
+        profile.threads[threading.get_ident()] = 1
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self._sampler.start()
+        self._wakeup.set()
+        return profile
+
+    def stop(self, profile: RequestProfile):
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile: RequestProfile, status: int, duration: float):
+        os.makedirs(self.directory, exist_ok=True)
+        result = {
+            "id": profile.id,
+            "request_id": profile.request_id,
+            "method": profile.method,
+            "path": profile.path,
+            "query": profile.query,
+            "status": status,
+            "started_at": profile.started_at,
+            "duration_ms": duration * 1000,
+            "interval_ms": self.interval * 1000,
+            "samples": profile.samples,
+            "stacks": dict(profile.stacks.most_common()),
+        }
+        with open(self._path(profile.id), "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        self._prune()
+        logger.info(f"请求剖析完成: {profile.method} {profile.path} 耗时 {duration * 1000:.0f}ms，{profile.samples} 个样本，ID {profile.id}")
+
+    def _prune(self):
+        files = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    async def middleware(self, request: Request, call_next):
+        """HTTP中间件：对命中触发条件的请求开启采样，响应头 X-Profile-Id 返回结果ID"""
+        if not self.enabled or not self._should_profile(request):
+            return await call_next(request)
+        profile = self.start(request)
+        token = current_profile.set(profile)
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Profile-Id"] = profile.id
+            return response
+        finally:
+            current_profile.reset(token)
+            self.stop(profile)
+            try:
+                await run_in_threadpool(self.save, profile, status, time.perf_counter() - profile.start)
+            except Exception as e:
+                logger.error(f"保存请求剖析结果失败: {e}")
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的剖析结果（不含调用栈），按开始时间倒序"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime, reverse=True)
+        profiles = []
+        for entry in files[:limit]:
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result.pop("stacks", None)
+            profiles.append(result)
+        return profiles
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not _PROFILE_ID.match(profile_id) or not os.path.exists(self._path(profile_id)):
+            return None
+        with open(self._path(profile_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def collapsed(result: Dict[str, Any]) -> str:
+        """折叠栈文本，每行 "帧;帧;帧 样本数"，flamegraph.pl / speedscope 可直接读取"""
+        return "".join(f"{stack} {count}\n" for stack, count in result["stacks"].items())
+
+
+def instrument_threadpool():
+    """
+    同步接口和依赖由 fastapi.routing.run_in_threadpool 放到线程池执行，替换后在执行期间把线程池线程登记到当前剖析会话
+    fastapi.routing 在调用时按模块全局名查找 run_in_threadpool，替换后对所有路由生效
+    """
+    from fastapi import routing
+
+    if getattr(routing.run_in_threadpool, "_instrumented", False):
+        return
+    original = routing.run_in_threadpool
+
+    async def run_in_threadpool_profiled(func, *args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return await original(func, *args, **kwargs)
+
+        def attached(*inner_args, **inner_kwargs):
+            with profile.attach():
+                return func(*inner_args, **inner_kwargs)
+
+        return await original(attached, *args, **kwargs)
+
+    run_in_threadpool_profiled._instrumented = True
+    routing.run_in_threadpool = run_in_threadpool_profiled
+
+
+# 创建全局实例
+profiler = SamplingProfiler()
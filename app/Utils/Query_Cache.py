@@ -0,0 +1,240 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from .Metrics import count_cache
+from ..config import QUERY_CACHE_ENABLED, QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_SIMILARITY
+
+
+def normalize_question(question: str) -> str:
+    """全角转半角、去首尾空白、合并连续空白、英文小写，作为精确匹配的键"""
+    question = unicodedata.normalize("NFKC", question or "")
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+class _ScopeIndex:
+    """
+    单个检索范围内的查询向量索引：预分配的向量矩阵按行追加，容量不足时翻倍扩容；
+    删除时用最后一行填补空位，写入和删除都不重建整个矩阵
+    """
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.keys: list = []
+        self._rows: Dict[Tuple, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: Tuple, embedding: np.ndarray):
+        if len(self.keys) == self.matrix.shape[0]:
+            grown = np.empty((self.matrix.shape[0] * 2, self.matrix.shape[1]), dtype=np.float32)
+            grown[:len(self.keys)] = self.matrix[:len(self.keys)]
+            self.matrix = grown
+        self._rows[key] = len(self.keys)
+        self.matrix[len(self.keys)] = embedding
+        self.keys.append(key)
+
+    def remove(self, key: Tuple):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = self.keys.pop()
+        if last != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self._rows[last] = row
+
+    def scores(self, embedding: np.ndarray) -> np.ndarray:
+        return self.matrix[:len(self.keys)] @ embedding
+
+
+class SemanticQueryCache:
+    """
+    检索结果语义缓存
+
+    - 精确命中：(接口, 规范化问题, file_id, top_k, 过滤参数) 完全一致
+    - 语义命中（QUERY_CACHE_SIMILARITY > 0 时开启，默认关闭）：同一 (接口, file_id, top_k, 过滤参数) 范围内，
+      最近查询向量与当前查询向量的余弦相似度不低于阈值。只差一两个字的名称（如 查询二类账户编号/查询三类账户编号）
+      向量相似度也很高，开启前需按业务数据确认阈值
+    - 按 TTL 过期、按 LRU 淘汰
+    - 文件上传/删除时只失效该文件范围内的条目，以及不限定文件（全库检索）的条目
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_SIZE,
+        ttl_seconds: float = QUERY_CACHE_TTL_SECONDS,
+        similarity_threshold: float = QUERY_CACHE_SIMILARITY,
+        enabled: bool = QUERY_CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled and max_entries > 0
+        # {key: {"value", "scope", "file_id", "created_at"}}
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        # {scope: _ScopeIndex}，语义检索用的小型向量索引，只在开启语义命中时维护
+        self._scopes: Dict[Tuple, _ScopeIndex] = {}
+        self._lock = threading.Lock()
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _scope(endpoint: str, file_id: Optional[str], top_k: Optional[int], filters: Sequence[Hashable]) -> Tuple:
+        return (endpoint, file_id or None, top_k, tuple(filters))
+
+    @staticmethod
+    def _normalize_embedding(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        index = self._scopes.get(entry["scope"])
+        if index is not None:
+            index.remove(key)
+            if not len(index):
+                self._scopes.pop(entry["scope"], None)
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds
+
+    def _semantic_lookup(self, scope: Tuple, embedding: np.ndarray, now: float) -> Optional[Tuple]:
+        index = self._scopes.get(scope)
+        if index is None or self.similarity_threshold <= 0:
+            return None
+        scores = index.scores(embedding)
+        for position in np.argsort(-scores):
+            if scores[position] < self.similarity_threshold:
+                break
+            key = index.keys[position]
+            if not self._expired(self._entries[key], now):
+                return key
+        return None
+
+    def lookup(
+        self,
+        endpoint: str,
+        question: str,
+        embed: Callable[[], Any],
+        file_id: Optional[str] = None,
+        top_k: Optional[int] = None,
+        filters: Sequence[Hashable] = (),
+    ) -> Tuple[Optional[Any], Optional[Any]]:
+        """
+        查询缓存：先做精确匹配，未命中时调用 embed() 计算查询向量再做语义匹配
+
+        Returns:
+            (缓存结果, 查询向量)：精确命中时查询向量为 None；未命中时缓存结果为 None，查询向量可直接用于检索
+        """
+        if not self.enabled:
+            return None, embed()
+        scope = self._scope(endpoint, file_id, top_k, filters)
+        key = scope + (normalize_question(question),)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                count_cache("query", "hit")
+                return entry["value"], None
+
+        embedding = embed()
+        with self._lock:
+            matched = self._semantic_lookup(scope, self._normalize_embedding(embedding), now)
+            if matched is not None:
+                self._entries.move_to_end(matched)
+                self._semantic_hits += 1
+                count_cache("query", "semantic_hit")
+                logger.debug(f"语义缓存命中: {endpoint} {question[:50]} -> {matched[-1][:50]}")
+                return self._entries[matched]["value"], embedding
+            self._misses += 1
+            count_cache("query", "miss")
+            return None, embedding
+
+    def put(
+        self,
+        endpoint: str,
+        question: str,
+        value: Any,
+        file_id: Optional[str] = None,
+        top_k: Optional[int] = None,
+        filters: Sequence[Hashable] = (),
+        embedding=None,
+    ):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+        scope = self._scope(endpoint, file_id, top_k, filters)
+        key = scope + (normalize_question(question),)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "scope": scope,
+                "file_id": file_id or None,
+                "created_at": time.time(),
+            }
+            if embedding is not None and self.similarity_threshold > 0:
+                vector = self._normalize_embedding(embedding)
+                index = self._scopes.get(scope)
+                if index is None:
+                    index = self._scopes[scope] = _ScopeIndex(vector.shape[0])
+                index.add(key, vector)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_files(self, file_ids: Sequence[str]):
+        """文件上传/删除后，失效该文件范围内和全库检索的缓存条目"""
+        if not self.enabled:
+            return
+        file_ids = {file_id for file_id in file_ids if file_id}
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["file_id"] is None or entry["file_id"] in file_ids
+            ]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            logger.info(f"文件 {sorted(file_ids)} 变更，失效 {len(stale)} 条查询缓存")
+
+    def clear(self):
+        """清空缓存，用于切换/删除知识库"""
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._exact_hits + self._semantic_hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": (self._exact_hits + self._semantic_hits) / lookups if lookups else 0.0,
+            }
+
+
+# 创建全局实例
+query_cache = SemanticQueryCache()
@@ -0,0 +1,75 @@
+"""
+按实际token长度组织模型输入
+
+组件名称、测试步骤通常只有10~40个token，而批内按最长序列padding，一条长文本就会让同批的短文本
+都按它的长度计算注意力：
+- 分桶：整批先分词（不padding），按长度排序后每 batch_size 条一组分别padding；组内最长序列超过 32 个token
+  且超过最短序列的2倍时另起一组，小批次中混入的长文本也单独计算。推理池跨请求合并的批次同样受益
+- 截断：按用途/字段配置截断token数（TOKEN_LIMITS，如 query=64,passage=256），不超过模型上限
+  EMBEDDING_MAX_LENGTH / RERANKER_MAX_LENGTH；重排时按用途的截断只作用于文档一侧，查询保持完整。
+  同一用途可按接口单独配置（如 /rerank/single:query=32），接口取当前请求的路由模板（current_endpoint）
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import torch
+
+from .Metrics import count_tokens, current_endpoint
+from ..config import TOKEN_LIMITS
+
+# 组内最长/最短序列长度之比超过该值时另起一组；短于 SPLIT_MIN_LENGTH 的序列padding开销小于多一次前向调用，不拆分
+SPLIT_LENGTH_RATIO = 2.0
+SPLIT_MIN_LENGTH = 32
+
+
+def token_limit(field: str, endpoint: Optional[str] = None) -> Optional[int]:
+    """
+    用途/字段对应的截断token数：先查 "接口:用途"，再查 "用途"，都未配置时返回 None（只受模型上限约束）
+
+    endpoint 默认取当前请求的路由模板，请求之外（入库脚本、启动预热）只按用途查找
+    """
+    endpoint = current_endpoint.get() if endpoint is None else endpoint
+    if endpoint and f"{endpoint}:{field}" in TOKEN_LIMITS:
+        return TOKEN_LIMITS[f"{endpoint}:{field}"]
+    return TOKEN_LIMITS.get(field)
+
+
+def truncate_texts(tokenizer, texts: Sequence[str], max_tokens: Optional[int]) -> List[str]:
+    """把每条文本截断到最多 max_tokens 个token（不含特殊token），按分词偏移切回原文"""
+    if not max_tokens:
+        return list(texts)
+    if not getattr(tokenizer, "is_fast", False):
+        # 慢速分词器没有偏移信息，中文按一字一token近似
+        return [text[:max_tokens] for text in texts]
+    encodings = tokenizer(list(texts), add_special_tokens=False, truncation=True, max_length=max_tokens,
+                          return_offsets_mapping=True)
+    return [text[:offsets[-1][1]] if offsets else text for text, offsets in zip(texts, encodings["offset_mapping"])]
+
+
+def length_buckets(tokenizer, encodings, batch_size: int, model: str) -> Iterator[Tuple[List[int], Dict[str, torch.Tensor]]]:
+    """
+    按token长度排序后分组，逐组返回 (组内各条在原始输入中的下标, padding后的张量)
+
+    Args:
+        encodings: tokenizer(..., truncation=True) 不padding的分词结果
+        batch_size: 每组最多条数，0表示不限
+        model: 指标标签，记录实际token数和padding token数
+    """
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    groups: List[List[int]] = []
+    for index in order:
+        group = groups[-1] if groups else None
+        if group is None or (batch_size > 0 and len(group) >= batch_size) or (
+                lengths[index] > SPLIT_MIN_LENGTH and lengths[index] > SPLIT_LENGTH_RATIO * lengths[group[0]]):
+            groups.append([index])
+        else:
+            group.append(index)
+    # 已经分过词，pad 只做补齐，不需要 transformers 关于快速分词器先编码再 pad 的提示
+    if hasattr(tokenizer, "deprecation_warnings"):
+        tokenizer.deprecation_warnings["Asking-to-pad-a-fast-tokenizer"] = True
+    for indices in groups:
+        real = sum(lengths[i] for i in indices)
+        count_tokens(model, real, lengths[indices[-1]] * len(indices) - real)
+        batch = tokenizer.pad({key: [values[i] for i in indices] for key, values in encodings.items()}, return_tensors="pt")
+        yield indices, dict(batch)
@@ -0,0 +1,108 @@
+import functools
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from loguru import logger
+from pydantic import BaseModel
+
+from .Metrics import COALESCED_REQUESTS
+
+
+class _Call:
+    """一次正在执行的计算，后到的相同请求在 event 上等待其结果"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+def request_key(*args, **kwargs) -> str:
+    """把接口参数（pydantic请求体或普通参数）序列化为稳定的键"""
+    def dump(value):
+        return value.model_dump() if isinstance(value, BaseModel) else value
+
+    return json.dumps(
+        {"args": [dump(arg) for arg in args], "kwargs": {name: dump(value) for name, value in kwargs.items()}},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+
+
+class SingleFlight:
+    """
+    请求合并：同一时刻参数完全相同的请求只执行一次计算，其余请求等待并共享结果（包括异常）
+
+    计算结束后立即移除，不缓存结果；结果缓存由 Query_Cache 负责
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # {endpoint: {"requests": n, "coalesced": n}}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def do(self, endpoint: str, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """执行 fn，若已有相同 (endpoint, key) 的计算在进行中，则等待它的结果"""
+        flight_key = (endpoint, key)
+        with self._lock:
+            counter = self._counters.setdefault(endpoint, {"requests": 0, "coalesced": 0})
+            counter["requests"] += 1
+            call = self._calls.get(flight_key)
+            leader = call is None
+            if leader:
+                call = self._calls[flight_key] = _Call()
+            else:
+                counter["coalesced"] += 1
+                COALESCED_REQUESTS.inc(endpoint)
+
+        if not leader:
+            logger.debug(f"合并相同的并发请求: {endpoint}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(flight_key, None)
+            call.event.set()
+
+    def coalesce(self, endpoint: str):
+        """接口装饰器：以全部请求参数为键合并并发的相同请求，被装饰的接口需为同步函数"""
+        def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.do(endpoint, request_key(*args, **kwargs), fn, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各接口的请求数、被合并的请求数和合并率"""
+        with self._lock:
+            endpoints = {
+                endpoint: {
+                    **counter,
+                    "coalescing_rate": counter["coalesced"] / counter["requests"] if counter["requests"] else 0.0,
+                }
+                for endpoint, counter in self._counters.items()
+            }
+            requests = sum(counter["requests"] for counter in self._counters.values())
+            coalesced = sum(counter["coalesced"] for counter in self._counters.values())
+            return {
+                "in_flight": len(self._calls),
+                "requests": requests,
+                "coalesced": coalesced,
+                "coalescing_rate": coalesced / requests if requests else 0.0,
+                "endpoints": endpoints,
+            }
+
+
+# 创建全局实例
+single_flight = SingleFlight()
@@ -0,0 +1,66 @@
+"""
+本地计算的 BM25 稀疏向量，与稠密向量一起存入 Milvus，用于稠密 + 稀疏混合检索
+
+- 词项与词法索引（Lexical_Index）一致：组件名称/交易名称/组件说明的字和字二元组，名称字段的词频计两次；
+  词项按 CRC32 映射为稀疏向量的维度
+- 文档向量的权重为 BM25 中与查询无关的部分 idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * 长度 / 平均长度))，
+  查询向量每个词项权重为1，内积即为 BM25 分数。idf 和平均长度按入库批次（一次上传的文件或一次批量导入）统计，
+  不同批次之间的统计量不同，需要统一时重新入库即可
+"""
+
+import math
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .Lexical_Index import BM25_B, BM25_K1, document_tokens, tokenize
+
+SPARSE_FIELD = "sparse_embedding"
+# 参与计算稀疏向量的字段 {原始字段名: Milvus 规范化字段名}，批量导入时从规范化字段读取
+SPARSE_SOURCE_FIELDS = {"组件名称": "zu_jian_ming_cheng", "交易名称": "jiao_yi_ming_cheng", "组件说明": "zu_jian_shuo_ming"}
+# Milvus 稀疏向量的维度需小于 2^32 - 1
+_DIMENSIONS = 2 ** 32 - 1
+
+
+def _dimension(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8")) % _DIMENSIONS
+
+
+class SparseEncoder:
+    def encode_documents(self, entities: List[Dict[str, Any]], field_name_mapping: Optional[Dict[str, str]] = None) -> List[Dict[int, float]]:
+        """
+        为一批文档计算稀疏向量，idf 和平均长度取自这批文档
+
+        Args:
+            entities: 以原始字段名（组件名称等）为键的文档
+            field_name_mapping: 文档以 Milvus 规范化字段名为键时传入 {原始字段名: 规范化字段名}
+        """
+        if field_name_mapping:
+            entities = [
+                {original: entity.get(normalized) for original, normalized in field_name_mapping.items()}
+                for entity in entities
+            ]
+        counts = [document_tokens(entity) for entity in entities]
+        if not counts:
+            return []
+        frequencies = Counter(token for tokens in counts for token in tokens)
+        average = max(sum(sum(tokens.values()) for tokens in counts) / len(counts), 1.0)
+        vectors = []
+        for tokens in counts:
+            length = sum(tokens.values())
+            vector: Dict[int, float] = {}
+            for token, count in tokens.items():
+                idf = math.log(1 + (len(counts) - frequencies[token] + 0.5) / (frequencies[token] + 0.5))
+                weight = idf * count * (BM25_K1 + 1) / (count + BM25_K1 * (1 - BM25_B + BM25_B * length / average))
+                dimension = _dimension(token)
+                vector[dimension] = vector.get(dimension, 0.0) + weight
+            # Milvus 不接受空的稀疏向量
+            vectors.append(vector or {0: 0.0})
+        return vectors
+
+    def encode_query(self, text: str) -> Dict[int, float]:
+        return {_dimension(token): 1.0 for token in set(tokenize(text))} or {0: 0.0}
+
+
+# 创建全局实例
+sparse_encoder = SparseEncoder()
@@ -0,0 +1,177 @@
+"""
+分阶段启动：模块导入时只登记全局实例的构造函数，服务绑定端口后在后台线程中并行创建，
+创建完成并预热通过后才标记为就绪（/ready）
+
+阶段1：模型和Milvus连接等互不依赖的基础组件
+阶段2：依赖阶段1组件的管道/服务（RAGPipeline、知识库管理器等），此时直接复用阶段1的单例
+
+就绪前业务接口直接返回503：异步接口在事件循环上访问未创建的实例会同步构造模型/连接，阻塞整个进程
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from loguru import logger
+
+from ..config import STARTUP_WORKERS, STARTUP_RETRY_SECONDS
+
+# 就绪前仍可访问的路径：探针、指标、剖析结果和接口文档都不依赖延迟创建的实例
+NOT_READY_ALLOWED_PATHS = ("/health", "/ready", "/metrics", "/profiles", "/docs", "/redoc", "/openapi.json")
+
+
+class LazyInstance:
+    """全局实例的代理：首次访问属性时创建实例，后台启动线程也通过它提前创建"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> Any:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start_time = time.time()
+                    self._instance = self._factory()
+                    logger.info(f"组件 {self._name} 创建完成，耗时 {time.time() - start_time:.2f}s")
+        return self._instance
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.get(), item)
+
+    def __bool__(self) -> bool:
+        return bool(self.get())
+
+    def __repr__(self) -> str:
+        return f"<LazyInstance {self._name} loaded={self.loaded}>"
+
+
+class StartupManager:
+    """登记全局实例和预热函数，在后台按阶段并行加载，并维护就绪状态"""
+
+    def __init__(self, workers: int = STARTUP_WORKERS, retry_seconds: float = STARTUP_RETRY_SECONDS):
+        self.workers = workers
+        self.retry_seconds = retry_seconds
+        # {name: (stage, LazyInstance)}
+        self._components: Dict[str, Any] = {}
+        # [(name, fn)]，全部组件创建完成后依次执行
+        self._warmups: List[Any] = []
+        self._errors: Dict[str, str] = {}
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._ready_at: Optional[float] = None
+
+    def lazy(self, name: str, factory: Callable[[], Any], stage: int = 2) -> LazyInstance:
+        """登记一个全局实例，返回其代理"""
+        instance = LazyInstance(name, factory)
+        self._components[name] = (stage, instance)
+        return instance
+
+    def add_warmup(self, name: str, fn: Callable[[], Any]):
+        """登记预热函数，全部预热成功后服务才就绪"""
+        self._warmups.append((name, fn))
+
+    def preload(self, names: List[str]):
+        """在当前线程中立即创建指定组件（多进程模式下在fork前由主进程加载模型）"""
+        for name in names:
+            if name not in self._components:
+                logger.warning(f"预加载的组件 {name} 未登记，跳过")
+                continue
+            self._components[name][1].get()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def _load_stage(self, stage: int) -> bool:
+        pending = {
+            name: instance for name, (component_stage, instance) in self._components.items()
+            if component_stage == stage and not instance.loaded
+        }
+        if not pending:
+            return True
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix=f"startup-{stage}") as executor:
+            futures = {executor.submit(instance.get): name for name, instance in pending.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    self._errors.pop(name, None)
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.error(f"组件 {name} 创建失败: {e}")
+        return not any(name in self._errors for name in pending)
+
+    def _warm_up(self) -> bool:
+        for name, fn in self._warmups:
+            key = f"warmup:{name}"
+            try:
+                start_time = time.time()
+                fn()
+                self._errors.pop(key, None)
+                logger.info(f"预热 {name} 完成，耗时 {time.time() - start_time:.2f}s")
+            except Exception as e:
+                self._errors[key] = str(e)
+                logger.error(f"预热 {name} 失败: {e}")
+                return False
+        return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            stages = sorted({stage for stage, _ in self._components.values()})
+            if all(self._load_stage(stage) for stage in stages) and self._warm_up():
+                self._ready_at = time.time()
+                self._ready.set()
+                logger.info(f"服务就绪，启动耗时 {self._ready_at - self._started_at:.2f}s")
+                return
+            logger.warning(f"启动未完成，{self.retry_seconds}s 后重试: {self._errors}")
+            self._stopped.wait(self.retry_seconds)
+
+    def start(self):
+        """在后台线程中开始加载，立即返回"""
+        if self._thread is not None:
+            return
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    async def middleware(self, request: Request, call_next):
+        """HTTP中间件：就绪前业务接口返回503，避免在事件循环上同步创建组件"""
+        if self.ready or request.url.path.startswith(NOT_READY_ALLOWED_PATHS):
+            return await call_next(request)
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "服务启动中，组件尚未就绪", "status": self.status()},
+            headers={"Retry-After": str(max(1, int(self.retry_seconds)))}
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "pid": os.getpid(),
+            "startup_seconds": (self._ready_at or time.time()) - self._started_at if self._started_at else None,
+            "components": {
+                name: {"stage": stage, "loaded": instance.loaded}
+                for name, (stage, instance) in sorted(self._components.items())
+            },
+            "errors": dict(self._errors),
+        }
+
+
+# 创建全局实例
+startup_manager = StartupManager()
@@ -0,0 +1,144 @@
+"""
+流量录制：把线上请求的方法、路径、请求体、状态码和耗时按到达顺序写入JSONL文件，供 benchmarks.replay 回放压测
+
+每行一条记录：
+    {"ts": 到达时间(unix秒), "method": "POST", "path": "/rerank/...", "query": "...", "body": {...},
+     "status": 200, "duration_ms": 12.3}
+请求线程只把记录放进队列，由后台线程批量写出，不在请求路径上做磁盘I/O。
+多工作进程（WORKERS>1）共用同一个文件：每批记录用一次 os.write 写入以 O_APPEND 打开的文件描述符，
+不经过用户态缓冲，各进程的写入不会交错成半行；回放时按 ts 排序。服务关闭时 stop() 写完队列中剩余的记录
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from starlette.requests import Request
+
+from ..config import TRAFFIC_RECORD_FILE, TRAFFIC_RECORD_PATHS, TRAFFIC_RECORD_SAMPLE_RATE, TRAFFIC_RECORD_MAX_BODY_BYTES
+
+
+class TrafficRecorder:
+    def __init__(self, path: str = TRAFFIC_RECORD_FILE, prefixes: Optional[List[str]] = None,
+                 sample_rate: float = TRAFFIC_RECORD_SAMPLE_RATE, max_body_bytes: int = TRAFFIC_RECORD_MAX_BODY_BYTES):
+        self.path = path
+        self.prefixes = tuple(prefixes if prefixes is not None else TRAFFIC_RECORD_PATHS)
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.recorded = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=10000)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _should_record(self, request: Request) -> bool:
+        if request.method not in ("POST", "PUT", "GET"):
+            return False
+        if self.prefixes and not request.url.path.startswith(self.prefixes):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    # 写线程在首次录制时启动，prefork模式下每个工作进程各自打开文件描述符
+                    self._writer = threading.Thread(target=self._write_loop, name="traffic-recorder", daemon=True)
+                    self._writer.start()
+                    logger.info(f"流量录制已开启: {self.path}，采样率 {self.sample_rate}，进程 {os.getpid()}")
+
+    def _write_loop(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            stopping = False
+            while not stopping:
+                records = [self._queue.get()]
+                # 一次取出队列中已有的全部记录，合并写出
+                while len(records) < 1000:
+                    try:
+                        records.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = None in records
+                data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records if record is not None)
+                view = memoryview(data.encode("utf-8"))
+                while view:
+                    view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    def stop(self, timeout: float = 5.0):
+        """写完队列中剩余的记录后停止写线程（服务关闭时调用）"""
+        writer = self._writer
+        if writer is None or not writer.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("流量录制队列已满，关闭时未能写完剩余记录")
+            return
+        writer.join(timeout)
+
+    def _decode(self, body: bytes) -> Any:
+        if len(body) > self.max_body_bytes:
+            return None
+        try:
+            return json.loads(body) if body else None
+        except (ValueError, UnicodeDecodeError):
+            return body.decode("utf-8", errors="replace")
+
+    def put(self, record: Dict[str, Any]):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(record)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    async def middleware(self, request: Request, call_next):
+        """HTTP中间件：记录请求体和耗时；请求体超过 max_body_bytes 时只记录元数据"""
+        if not self.enabled or not self._should_record(request):
+            return await call_next(request)
+        ts = time.time()
+        body = await request.body()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            self.put({
+                "ts": ts,
+                "method": request.method,
+                "path": request.url.path,
+                "query": request.url.query,
+                "body": self._decode(body),
+                "body_bytes": len(body),
+                "status": status,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+            })
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "prefixes": list(self.prefixes),
+            "sample_rate": self.sample_rate,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+
+# 创建全局实例
+traffic_recorder = TrafficRecorder()
@@ -4,13 +4,68 @@ import torch
 import torch.nn as nn
 from loguru import logger
 from ..config import EMBEDDING_MODEL_PATH, EMBEDDING_GPU_DEVICES, ENABLE_MEMORY_OPTIMIZATION, ENABLE_MEMORY_POOLING, MAX_MEMORY_FRACTION
-from typing import List
+from ..config import EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_SIZE, EMBEDDING_NORMALIZE, EMBEDDING_MAX_LENGTH
+from .Metrics import track_stage, observe_batch, count_cache
+from .Startup import startup_manager
+from .Inference_Pool import InferenceClient, pool_enabled
+from .Model_Warmup import CompiledForward, first_query_timer, warm_up_model, warmup_text
+from .Sequence_Length import length_buckets
+from typing import Hashable, List, Optional
+from collections import OrderedDict
 import numpy as np
+import threading
 import gc
 import os
+import time
+
+def l2_normalize(vectors) -> np.ndarray:
+    """按行做L2归一化（也支持单个向量），零向量保持不变"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1).astype(np.float32)
+
+
+def cosine_similarities(query, matrix, normalized: bool = EMBEDDING_NORMALIZE) -> np.ndarray:
+    """查询向量与矩阵每一行的余弦相似度；向量已归一化（EMBEDDING_NORMALIZE）时直接做点积"""
+    if normalized:
+        return np.asarray(matrix, dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    return l2_normalize(matrix) @ l2_normalize(query)
+
 
 class EmbeddingModel:
+    _instance = None
+    _initialized = False
+    _init_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        """
+        单例模式，各模块共用一份模型权重
+        """
+        if cls._instance is None:
+            cls._instance = super(EmbeddingModel, cls).__new__(cls)
+        return cls._instance
+
     def __init__(self):
+        with EmbeddingModel._init_lock:
+            if self._initialized:
+                return
+            self._load()
+            self._initialized = True
+
+    def _load(self):
+        """加载分词器和模型；推理池模式下只建立到推理进程的客户端"""
+        # 文本 -> 向量 的LRU缓存，参数列等重复文本较多的场景直接复用
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self._remote = InferenceClient("embedding") if pool_enabled() else None
+        self._dim = None
+        if self._remote is not None:
+            # 向量维度在首次使用时通过握手向推理进程获取，推理池尚未启动时不影响创建
+            self.device = torch.device("cpu")
+            logger.info(f"Embedding model served by inference pool at {self._remote.socket_dir}")
+            return
+
         try:
             self.tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_PATH)
             self.model = AutoModel.from_pretrained(EMBEDDING_MODEL_PATH)
@@ -54,6 +109,8 @@ class EmbeddingModel:
                 self.device = torch.device("cpu")
 
             self.model = self.model.to(self.device)
+            self._infer = CompiledForward("embedding", self.model, self.tokenizer, self.device)
+            self._dim = self.model.config.hidden_size
 
             # Setup memory optimization after device is determined
             if ENABLE_MEMORY_OPTIMIZATION:
@@ -63,6 +120,13 @@ class EmbeddingModel:
             logger.error(f"Failed to load embedding model: {e}")
             raise
 
+    @property
+    def dim(self) -> int:
+        """向量维度；推理池模式下取推理进程握手返回的维度"""
+        if self._dim is None and self._remote is not None:
+            self._dim = int(self._remote.info()["dim"])
+        return self._dim
+
     def _setup_memory_optimization(self):
         """设置内存优化"""
         if ENABLE_MEMORY_POOLING:
@@ -122,22 +186,80 @@ class EmbeddingModel:
             gc.collect()
             logger.debug("GPU内存已清理")
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
-        try:
-            inputs = self.tokenizer(texts, padding=True, truncation=True, return_tensors="pt", max_length=512)
+    def _forward(self, texts: List[str], max_length: Optional[int] = None) -> np.ndarray:
+        """
+        对一批文本做前向计算，返回float32矩阵
+
+        整批分词后按token长度分桶（每桶 EMBEDDING_BATCH_SIZE 条），每桶只padding到桶内最长序列；
+        max_length 为本次调用的截断token数，不超过 EMBEDDING_MAX_LENGTH。推理池模式下随请求转发给推理进程
+        """
+        if self._remote is not None:
+            with track_stage("embed_forward"):
+                return self._remote.embed(texts, max_length)
+        limit = min(max_length or EMBEDDING_MAX_LENGTH, EMBEDDING_MAX_LENGTH)
+        with track_stage("tokenize"):
+            encodings = self.tokenizer(texts, truncation=True, max_length=limit)
+
+        start = time.perf_counter()
+        embeddings = np.empty((len(texts), self.dim), dtype=np.float32)
+        for indices, inputs in length_buckets(self.tokenizer, encodings, EMBEDDING_BATCH_SIZE, "embedding"):
+            observe_batch("embed", len(indices))
             # 将输入数据移动到设备
             inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with track_stage("embed_forward"), torch.no_grad():
+                last_hidden_state = self._infer(inputs)
+                # 只取 [CLS] 行写入结果矩阵，不持有整块隐藏状态
+                embeddings[indices] = last_hidden_state[:, 0, :].float().cpu().numpy()
+        if EMBEDDING_NORMALIZE:
+            embeddings = l2_normalize(embeddings)
+        first_query_timer.record("embedding", time.perf_counter() - start)
+        return embeddings
+
+    def warm_up(self):
+        """按批大小×序列长度分桶预热，不经过文本向量缓存"""
+        if self._remote is not None:
+            # 推理进程启动时已自行预热，这里只确认推理池可用并完成维度握手
+            logger.info(f"推理池向量维度: {self.dim}")
+            return self._forward(["预热"])
+        return warm_up_model("embedding", lambda batch_size, seq_len: self._forward([warmup_text(seq_len)] * batch_size))
+
+    def _cache_get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+
+    def _cache_put(self, key: Hashable, vector: np.ndarray):
+        if EMBEDDING_CACHE_SIZE <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
 
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-            embeddings = outputs.last_hidden_state[:, 0, :].cpu().numpy()
+    def encode(self, texts: List[str], normalize: bool = False, max_length: Optional[int] = None) -> np.ndarray:
+        """
+        编码一批文本
+
+        Args:
+            texts: 待编码文本列表
+            normalize: 是否按行做L2归一化（EMBEDDING_NORMALIZE 开启时输出已归一化）
+            max_length: 截断token数（见 Sequence_Length.token_limit），None 表示只受模型上限约束
+
+        Returns:
+            np.ndarray: shape为 (len(texts), dim) 的连续float32矩阵；只在序列化（JSON响应等）时才转换为列表
+        """
+        try:
+            embeddings = self._forward(texts, max_length)
 
             # 清理GPU内存
             if ENABLE_MEMORY_OPTIMIZATION and self.device.type == 'cuda':
                 self._clear_gpu_memory()
 
             logger.debug(f"Generated embeddings for {len(texts)} texts using {self.device}")
-            return embeddings.tolist()
+            return l2_normalize(embeddings) if normalize and not EMBEDDING_NORMALIZE else embeddings
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
             # 发生错误时也清理内存
@@ -145,5 +267,56 @@ class EmbeddingModel:
                 self._clear_gpu_memory()
             raise
 
+    def encode_batched(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE, normalize: bool = False,
+                       max_length: Optional[int] = None) -> np.ndarray:
+        """
+        批量编码大量文本（入库场景）
+
+        重复文本只编码一次，命中缓存的文本直接复用；其余文本按长度排序后分桶，
+        每个批次内长度接近，减少padding带来的无效计算。
+
+        Args:
+            texts: 待编码文本列表
+            batch_size: 每批编码的文本数量
+            normalize: 是否按行做L2归一化
+            max_length: 截断token数，不同截断长度的向量分别缓存
+
+        Returns:
+            np.ndarray: shape为 (len(texts), dim) 的float32矩阵，行顺序与texts一致
+        """
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            cached = self._cache_get((text, max_length))
+            if cached is not None:
+                vectors[text] = cached
+            else:
+                missing.append(text)
+        count_cache("embedding", "hit", len(vectors))
+        count_cache("embedding", "miss", len(missing))
+
+        try:
+            missing.sort(key=len)
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                embeddings = self._forward(batch, max_length)
+                for text, vector in zip(batch, embeddings):
+                    vectors[text] = vector
+                    self._cache_put((text, max_length), vector)
+        except Exception as e:
+            logger.error(f"Batched embedding generation failed: {e}")
+            raise
+        finally:
+            if ENABLE_MEMORY_OPTIMIZATION and self.device.type == 'cuda':
+                self._clear_gpu_memory()
+
+        result = np.stack([vectors[text] for text in texts]).astype(np.float32, copy=False)
+        logger.debug(f"Generated embeddings for {len(texts)} texts ({len(missing)} encoded, {len(texts) - len(missing)} reused) using {self.device}")
+        return l2_normalize(result) if normalize and not EMBEDDING_NORMALIZE else result
+
 
-embedding_model = EmbeddingModel()
\ No newline at end of file
+embedding_model = startup_manager.lazy("embedding_model", EmbeddingModel, stage=1)
+startup_manager.add_warmup("embedding", lambda: embedding_model.warm_up())
@@ -1,32 +1,127 @@
+import heapq
+import itertools
+from functools import lru_cache
 import networkx as nx
 import numpy as np
-from ..config import COMPONENTS, EDGES, SIMILARITY_THRESHOLD
-from .embedding_utils import EmbeddingModel
+from ..config import COMPONENTS, EDGES, SIMILARITY_THRESHOLD, GRAPH_SEQUENCE_CACHE_SIZE, GRAPH_TOP_K_PATHS
+from .embedding_utils import embedding_model
+from .Sequence_Length import token_limit
+from .Metrics import track_stage
+from ..logger import summarize
 from loguru import logger
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 
-embedding_model = EmbeddingModel()
 
-def cosine_similarity(a, b):
-    """Calculate cosine similarity"""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+class CompiledGraph:
+    """
+    Index-based snapshot of an operation graph for sequence generation.
+
+    Successors are stored in CSR form (indptr / indices / weights) with every row sorted by
+    descending weight; ties keep edge insertion order, the same node the greedy max over
+    networkx successors picks. The greedy successor is therefore the first entry of a row and the
+    successors at or above a probability threshold are a row prefix. Rebuild after mutating the graph.
+    """
+
+    def __init__(self, graph: nx.DiGraph, cache_size: int = GRAPH_SEQUENCE_CACHE_SIZE):
+        self.nodes = list(graph.nodes)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        indptr, indices, weights = [0], [], []
+        for node in self.nodes:
+            row = sorted(((self.index[succ], float(graph[node][succ]['weight'])) for succ in graph.successors(node)),
+                         key=lambda item: -item[1])
+            indices.extend(succ for succ, _ in row)
+            weights.extend(weight for _, weight in row)
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+        has_successor = np.diff(self.indptr) > 0
+        first = self.indptr[:-1][has_successor]
+        best_next = np.full(len(self.nodes), -1, dtype=np.int32)
+        best_next[has_successor] = self.indices[first]
+        best_prob = np.zeros(len(self.nodes), dtype=np.float64)
+        best_prob[has_successor] = self.weights[first]
+        self.best_next, self.best_prob = best_next, best_prob
+        in_degree = np.bincount(self.indices, minlength=len(self.nodes))
+        self.start_nodes = [self.nodes[i] for i in np.flatnonzero(in_degree == 0)]
+
+        # Per-step walks index plain lists; numpy scalar indexing costs more than the walk itself
+        self._best_next = best_next.tolist()
+        self._best_prob = best_prob.tolist()
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._weights = self.weights.tolist()
+        # Results are memoized per arguments; the snapshot never changes, so entries never go stale
+        self.sequence = lru_cache(maxsize=cache_size)(self._walk) if cache_size > 0 else self._walk
+        self.top_k = lru_cache(maxsize=cache_size)(self._top_k) if cache_size > 0 else self._top_k
+
+    def _walk(self, start: int, max_length: int, min_prob: float) -> Tuple[int, ...]:
+        """Greedy walk: follow the best successor while its weight >= min_prob, stop on a cycle or at max_length."""
+        path = [start]
+        visited = {start}
+        current = start
+        for _ in range(max_length - 1):
+            next_node = self._best_next[current]
+            if next_node < 0 or self._best_prob[current] < min_prob or next_node in visited:
+                break
+            path.append(next_node)
+            visited.add(next_node)
+            current = next_node
+        return tuple(path)
+
+    def _top_k(self, start: int, k: int, max_length: int, min_prob: float) -> Tuple[Tuple[Tuple[int, ...], float], ...]:
+        """
+        The k most probable complete paths from start, with their probability (product of edge weights).
+
+        A path is complete when it reaches max_length or has no unvisited successor with weight >= min_prob.
+        Best-first search: extending a path never raises its probability, so complete paths are popped in
+        descending probability order and the search stops after k of them.
+        """
+        order = itertools.count()
+        heap = [(-1.0, next(order), (start,))]
+        results = []
+        while heap and len(results) < k:
+            negative_prob, _, path = heapq.heappop(heap)
+            extended = False
+            if len(path) < max_length:
+                current = path[-1]
+                low, high = self._indptr[current], self._indptr[current + 1]
+                for succ, weight in zip(self._indices[low:high], self._weights[low:high]):
+                    # Rows are sorted by descending weight, eligible successors form a prefix
+                    if weight < min_prob:
+                        break
+                    if succ not in path:
+                        heapq.heappush(heap, (negative_prob * weight, next(order), path + (succ,)))
+                        extended = True
+            if not extended:
+                results.append((path, -negative_prob))
+        return tuple(results)
+
 
 class OperationGraph:
-    def __init__(self):
+    def __init__(self, components: Optional[Iterable[str]] = None, edges: Optional[Iterable[Tuple[str, str, float]]] = None):
+        """Build the graph from COMPONENTS / EDGES in config unless explicit components and edges are given."""
         self.G = nx.DiGraph()
         # Normalize colons in COMPONENTS
-        normalized_components = [comp.replace(':', '：').strip() for comp in set(COMPONENTS)]
+        normalized_components = [comp.replace(':', '：').strip() for comp in set(COMPONENTS if components is None else components)]
         for comp in normalized_components:
             self.G.add_node(comp)
         # Add edges, normalizing colons
-        for from_node, to_node, prob in EDGES:
+        for from_node, to_node, prob in EDGES if edges is None else edges:
             from_node = from_node.replace(':', '：')
             to_node = to_node.replace(':', '：')
             if from_node in self.G and to_node in self.G:
                 self.G.add_edge(from_node, to_node, weight=prob)
             else:
                 logger.warning(f"Edge {from_node} -> {to_node} skipped, nodes not found.")
-        logger.debug(f"Graph initialized with nodes: {list(self.G.nodes)}")
+        logger.debug("Graph initialized with nodes: {}", summarize(list(self.G.nodes)))
+        self.compile()
+
+    def compile(self):
+        """Snapshot self.G into the index-based engine; call again after modifying self.G."""
+        self.compiled = CompiledGraph(self.G)
+        self._normalized_nodes = {self._normalize_colon(node): node for node in self.G.nodes}
 
     def _normalize_colon(self, text: str) -> str:
         """Replace English colon (:) with Chinese colon (：) and strip whitespace."""
@@ -34,18 +129,17 @@ class OperationGraph:
 
     def infer_start_node(self, query: str) -> str:
         """Infer starting node from query using embedding similarity."""
-        query_emb = embedding_model.encode([query])[0]
-        max_sim = -1
-        best_node = None
-        for node in self.G.nodes:
-            node_text = node.replace('组件名称：', '')
-            node_emb = embedding_model.encode([node_text])[0]
-            sim = cosine_similarity(query_emb, node_emb)
-            if sim > max_sim:
-                max_sim = sim
-                best_node = node
+        query_emb = embedding_model.encode([query], normalize=True, max_length=token_limit("query"))[0]
+        nodes = list(self.G.nodes)
+        # 节点文本固定，批量编码后命中向量缓存；一次矩阵乘法得到全部相似度
+        node_embs = embedding_model.encode_batched([node.replace('组件名称：', '') for node in nodes], normalize=True,
+                                                   max_length=token_limit("组件名称"))
+        sims = node_embs @ query_emb
+        best_index = int(np.argmax(sims))
+        max_sim = float(sims[best_index])
+        best_node = nodes[best_index]
         if max_sim < SIMILARITY_THRESHOLD:
-            start_nodes = [n for n in self.G.nodes if self.G.in_degree(n) == 0]
+            start_nodes = self.compiled.start_nodes
             if start_nodes:
                 logger.info(f"Low similarity ({max_sim:.4f}), defaulting to start node: {start_nodes[0]}")
                 return start_nodes[0]
@@ -57,64 +151,68 @@ class OperationGraph:
     def get_next_node(self, current_node: str, min_prob: float = 0.5) -> Optional[str]:
         """Greedily select the next node with highest edge weight above min_prob."""
         current_node = self._normalize_colon(current_node)
-        if current_node not in self.G:
+        index = self.compiled.index.get(current_node)
+        if index is None:
             logger.error(f"Node {current_node} not in graph")
             return None
-        neighbors = [(n, self.G[current_node][n]['weight']) for n in self.G.successors(current_node)]
-        if not neighbors:
-            logger.debug(f"No neighbors for {current_node}")
+        next_index = int(self.compiled.best_next[index])
+        if next_index < 0:
+            logger.debug("No neighbors for {}", current_node)
             return None
-        next_node, prob = max(neighbors, key=lambda x: x[1])
+        prob = float(self.compiled.best_prob[index])
         if prob < min_prob:
-            logger.debug(f"Probability {prob:.4f} below threshold {min_prob}")
+            logger.debug("Probability {:.4f} below threshold {}", prob, min_prob)
             return None
-        logger.debug(f"Next node for {current_node}: {next_node} (prob: {prob:.4f})")
+        next_node = self.compiled.nodes[next_index]
+        logger.debug("Next node for {}: {} (prob: {:.4f})", current_node, next_node, prob)
         return next_node
 
     def generate_sequence(self, start_node: str, max_length: int = 10, min_prob: float = 0.5) -> List[str]:
-        """Generate high-probability sequence from start node (greedy)."""
+        """Generate high-probability sequence from start node (greedy), memoized per (start, max_length, min_prob)."""
         start_node = self._normalize_colon(start_node)
-        if start_node not in self.G:
+        index = self.compiled.index.get(start_node)
+        if index is None:
             logger.error(f"Start node {start_node} not in graph")
             raise ValueError(f"Start node {start_node} not in graph")
-        path = [start_node]
-        visited = {start_node}  # Track visited nodes to avoid cycles
-        current = start_node
-        for _ in range(max_length - 1):
-            next_node = self.get_next_node(current, min_prob)
-            if not next_node:
-                break
-            if next_node in visited:
-                logger.debug(f"Cycle detected, stopping at {next_node}")
-                break
-            path.append(next_node)
-            visited.add(next_node)
-            current = next_node
-        logger.info(f"Generated sequence: {path}")
+        nodes = self.compiled.nodes
+        path = [nodes[i] for i in self.compiled.sequence(index, max_length, min_prob)]
+        logger.debug("Generated sequence: {}", path)
         return path
 
+    def top_k_sequences(self, start_node: str, k: int = GRAPH_TOP_K_PATHS, max_length: int = 10,
+                        min_prob: float = 0.5) -> List[Tuple[List[str], float]]:
+        """Return the k most probable sequences from start node with their path probabilities, best first."""
+        start_node = self._normalize_colon(start_node)
+        index = self.compiled.index.get(start_node)
+        if index is None:
+            logger.error(f"Start node {start_node} not in graph")
+            raise ValueError(f"Start node {start_node} not in graph")
+        nodes = self.compiled.nodes
+        return [([nodes[i] for i in path], prob) for path, prob in self.compiled.top_k(index, k, max_length, min_prob)]
+
     def validate_rag_recall(self, rag_results: List[str], query: str) -> Optional[List[str]]:
         """Validate RAG recalls: check if in graph, return enhanced sequence."""
-        valid_results = []
-        normalized_nodes = {self._normalize_colon(node): node for node in self.G.nodes}
+        with track_stage("graph_validation"):
+            valid_results = []
+            normalized_nodes = self._normalized_nodes
         
-        logger.debug(f"RAG results: {rag_results}")
-        logger.debug(f"Graph nodes: {list(self.G.nodes)}")
+            logger.debug("RAG results: {}", summarize(rag_results))
+            logger.debug("Graph nodes: {}", summarize(self.G.nodes))
         
-        for result in rag_results:
-            normalized_result = self._normalize_colon(result)
-            if normalized_result in normalized_nodes:
+            for result in rag_results:
+                normalized_result = self._normalize_colon(result)
+                if normalized_result in normalized_nodes:
                 
-                full_node = normalized_nodes[normalized_result]
+                    full_node = normalized_nodes[normalized_result]
                 
-                valid_results.append(full_node)
+                    valid_results.append(full_node)
             
-            else:
-                logger.debug(f"Result {result} (normalized: {normalized_result}) not in graph nodes")
+                else:
+                    logger.debug("Result {} (normalized: {}) not in graph nodes", result, normalized_result)
         
-        if not valid_results:
-            logger.info("No valid RAG results, returning None")
-            return None
-        sequence = self.generate_sequence(valid_results[0])
-        logger.info(f"Enhanced sequence from {valid_results[0]}: {sequence}")
-        return sequence
\ No newline at end of file
+            if not valid_results:
+                logger.info("No valid RAG results, returning None")
+                return None
+            sequence = self.generate_sequence(valid_results[0])
+            logger.info(f"Enhanced sequence from {valid_results[0]}: {sequence}")
+            return sequence
\ No newline at end of file
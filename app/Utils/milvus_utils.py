@@ -1,8 +1,16 @@
 from pymilvus import MilvusClient , DataType
 from loguru import logger
 from pymilvus.orm import collection
-from ..config import MILVUS_HOST, MILVUS_PORT, MILVUS_COLLECTION
+from ..config import MILVUS_HOST, MILVUS_PORT, MILVUS_COLLECTION, VECTOR_METRIC_TYPE
+from .Collection_Residency import residency_manager
+from .Metrics import track_stage
+from ..logger import summarize, log_verbose
+from .Query_Cache import query_cache
+from .Lexical_Index import QUERY_WINDOW, lexical_index
+from .Collection_Schema import collection_schema
 import uuid
+import json
+import threading
 from typing import List, Tuple, Dict, Any,Optional
 import time
 import numpy as np
@@ -30,6 +38,9 @@ class My_MilvusClient:
         
         self.dim = dim
         self.collection_name = collection_name
+        # 文件目录缓存 {file_id: file_name}，插入/删除时同步维护，None 表示尚未加载
+        self._file_catalog: Optional[Dict[str, str]] = None
+        self._catalog_lock = threading.Lock()
         self._initialized = False
         self.initialize_collection()
 
@@ -47,8 +58,8 @@ class My_MilvusClient:
         has_collection = self.client.has_collection(collection_name=self.collection_name)
         if has_collection:
             logger.info(f"Collection '{collection_name}' already exists.")
-            # 确保 collection 已加载
-            self.client.load_collection(collection_name=self.collection_name)
+            # 确保 collection 已加载（由驻留管理器按需加载）
+            residency_manager.ensure_loaded(self.collection_name)
             return
         else:
             logger.info(f"Collection '{collection_name}' does not exist. Creating...")
@@ -64,7 +75,7 @@ class My_MilvusClient:
                 "embedding",
                 index_type="IVF_FLAT",
                 # metric_type="L2",#欧氏距离
-                metric_type="COSINE" ,#余弦相似度 
+                metric_type=VECTOR_METRIC_TYPE ,#余弦相似度（向量已归一化时为内积） 
                 params={"nlist": 1024}
             )
 
@@ -75,7 +86,7 @@ class My_MilvusClient:
             )
             logger.info(f"Collection {self.collection_name} created ")
             
-            self.client.load_collection(collection_name=self.collection_name)
+            residency_manager.ensure_loaded(self.collection_name)
             logger.info(f"Collection {self.collection_name} loaded.")   
 
             return
@@ -215,44 +226,140 @@ class My_MilvusClient:
         return normalized   
     
      # ---------- 插入 ----------
-    def insert_documents(self, texts: List[str], embeddings: List[List[float]], file_id: str, file_name: str):
+    def insert_documents(self, texts: List[str], embeddings: np.ndarray, file_id: str, file_name: str):
+        collection_schema.check_vectors(self.client, MILVUS_COLLECTION)
         data = [
             {"id": str(uuid.uuid4()), "embedding": emb, "text": txt, "file_id": file_id, "file_name": file_name}
             for txt, emb in zip(texts, embeddings)
         ]
         self.client.insert(collection_name=MILVUS_COLLECTION, data=data)
+        self._register_file(file_id, file_name)
+        query_cache.invalidate_files([file_id])
         logger.info(f"Inserted {len(texts)} docs with file_id {file_id} and file_name {file_name}.")
+
+    # ---------- 删除 ----------
+    @staticmethod
+    def file_id_filter(file_ids: List[str]) -> str:
+        """构造按文件ID删除/查询的过滤表达式"""
+        if len(file_ids) == 1:
+            return f"file_id == {json.dumps(file_ids[0], ensure_ascii=False)}"
+        return f"file_id in {json.dumps(list(file_ids), ensure_ascii=False)}"
+
+    def delete_by_file_ids(self, file_ids: List[str]) -> Dict[str, Any]:
+        """
+        按过滤表达式删除一个或多个文件的全部文档，一次调用完成，不再先查询主键
+
+        Returns:
+            Dict[str, Any]: {"delete_count": 实际删除的文档数, "file_names": {存在的file_id: file_name},
+                             "missing_file_ids": 不存在的文件ID, "delete_result": 原始结果}
+        """
+        file_ids = list(dict.fromkeys(fid for fid in file_ids if fid))
+        # 只查询本次要删除的文件ID，不加载整个文件目录
+        file_names = self._lookup_file_names(file_ids)
+        missing_file_ids = [fid for fid in file_ids if fid not in file_names]
+        file_ids = [fid for fid in file_ids if fid in file_names]
+        if not file_ids:
+            return {"delete_count": 0, "file_names": {}, "missing_file_ids": missing_file_ids, "delete_result": None}
+
+        delete_result = self.client.delete(
+            collection_name=self.collection_name,
+            filter=self.file_id_filter(file_ids)
+        )
+        # 新版本Milvus返回 {"delete_count": n}，旧版本兼容路径直接返回被删除的主键列表
+        if isinstance(delete_result, dict):
+            delete_count = delete_result.get("delete_count", 0)
+        else:
+            delete_count = len(delete_result or [])
+        self._forget_files(file_ids)
+        query_cache.invalidate_files(file_ids)
+        lexical_index.remove_files(self.collection_name, file_ids)
+        logger.info(f"Deleted {delete_count} docs for file_ids {file_ids}")
+        return {
+            "delete_count": delete_count,
+            "file_names": file_names,
+            "missing_file_ids": missing_file_ids,
+            "delete_result": delete_result
+        }
+
+    def _lookup_file_names(self, file_ids: List[str]) -> Dict[str, str]:
+        """
+        一次 file_id in [...] 查询返回仍存在的 {file_id: file_name}
+
+        单次查询最多返回 QUERY_WINDOW 行，大文件占满窗口时只对尚未出现的文件ID再查一次
+        """
+        file_names = {}
+        pending = list(file_ids)
+        while pending:
+            rows = self.client.query(
+                collection_name=self.collection_name,
+                filter=self.file_id_filter(pending),
+                output_fields=["file_id", "file_name"],
+                limit=QUERY_WINDOW
+            )
+            for row in rows:
+                file_names.setdefault(row.get("file_id"), row.get("file_name"))
+            if len(rows) < QUERY_WINDOW:
+                break
+            pending = [fid for fid in pending if fid not in file_names]
+        return file_names
+
+    # ---------- 文件目录缓存 ----------
+    def get_file_catalog(self) -> Dict[str, str]:
+        """返回 {file_id: file_name} 目录，首次调用时从 Milvus 加载"""
+        with self._catalog_lock:
+            if self._file_catalog is not None:
+                return dict(self._file_catalog)
+        self.refresh_filename_map()
+        with self._catalog_lock:
+            return dict(self._file_catalog or {})
+
+    def _register_file(self, file_id: str, file_name: str):
+        with self._catalog_lock:
+            if self._file_catalog is not None and file_id:
+                self._file_catalog[file_id] = file_name
+
+    def _forget_files(self, file_ids: List[str]):
+        with self._catalog_lock:
+            if self._file_catalog is not None:
+                for file_id in file_ids:
+                    self._file_catalog.pop(file_id, None)
    
       # ---------- 检索 ----------
-    def search_similar(self, query_embedding: List[float], top_k: int = 5) -> List[Tuple[str, float]]:
-        results = self.client.search(
-            collection_name=MILVUS_COLLECTION,
-            data=[query_embedding],
-            limit=top_k,
-            output_fields=["text","file_id", "file_name"]
-        )[0]
-        logger.info(f"Search results: {results}")
+    def search_similar(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[str, float]]:
+        collection_schema.check_vectors(self.client, MILVUS_COLLECTION)
+        residency_manager.ensure_loaded(MILVUS_COLLECTION)
+        with track_stage("milvus_search", MILVUS_COLLECTION):
+            results = self.client.search(
+                collection_name=MILVUS_COLLECTION,
+                data=[query_embedding],
+                limit=top_k,
+                output_fields=["text","file_id", "file_name"]
+            )[0]
+        log_verbose("Search results: {}", summarize(results))
         distances = [hit["distance"] for hit in results]
         normalized_scores = self.normalize_distance(distances)
         search_results = [(hit["entity"]["text"], score) for hit, score in zip(results, normalized_scores)]
-        logger.info(f"Search results with normalized scores: {search_results}")
+        logger.debug("Search results with normalized scores: {}", summarize(search_results))
         return search_results
 
-    def search_similar_in_file(self, query_embedding: List[float], file_id: str, top_k: int ) -> List[Tuple[str, float]]:
-        results = self.client.search(
-            collection_name=MILVUS_COLLECTION,
-            data=[query_embedding],
-            limit=top_k,
-            filter=f'file_id == "{file_id}"',
-            output_fields=["text","file_id", "file_name"]
-        )[0]
+    def search_similar_in_file(self, query_embedding: np.ndarray, file_id: str, top_k: int ) -> List[Tuple[str, float]]:
+        collection_schema.check_vectors(self.client, MILVUS_COLLECTION)
+        residency_manager.ensure_loaded(MILVUS_COLLECTION)
+        with track_stage("milvus_search", MILVUS_COLLECTION):
+            results = self.client.search(
+                collection_name=MILVUS_COLLECTION,
+                data=[query_embedding],
+                limit=top_k,
+                filter=f'file_id == "{file_id}"',
+                output_fields=["text","file_id", "file_name"]
+            )[0]
         file_name = results[0]["entity"]["file_name"]
-        logger.info(f"Search in file_name={file_name} and file_id={file_id} ----> results: {results}")
+        log_verbose("Search in file_name={} and file_id={} ----> results: {}", file_name, file_id, summarize(results))
         distances = [hit["distance"] for hit in results]
         # normalized_scores = self.normalize_distance(distances)
         search_results_0 = [(hit["entity"]["text"], score) for hit, score in zip(results, distances)]
         # search_results_1 = [(hit["entity"]["text"], score) for hit, score in zip(results, distances)]
-        logger.info(f"Search results with normalized scores: {search_results_0}")
+        logger.debug("Search results with normalized scores: {}", summarize(search_results_0))
         return search_results_0
 
     def get_file_id_by_name(self, file_name: str) -> str:
@@ -263,18 +370,18 @@ class My_MilvusClient:
         )
         return results[0]["file_id"] if results else None
     
-    def search_similar_texts_only(self, query_embedding: List[float], top_k: int = 5) -> List[str]:
+    def search_similar_texts_only(self, query_embedding: np.ndarray, top_k: int = 5) -> List[str]:
         """
         向后兼容的方法，只返回文本列表
         """
         results = self.search_similar(query_embedding, top_k)
         texts = [text for text, _ in results]
-        logger.info(f"检索到的内容: {texts}")
+        logger.debug("检索到的内容: {}", summarize(texts))
         return  texts
 
     def search_similar_by_filename(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         file_name: str,
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
@@ -305,8 +412,12 @@ class My_MilvusClient:
 
                 # 按 file_name 去重（同文件名只保留一条即可）
                 mapping = {}
+                catalog = {}
                 for row in results:
                     mapping[row["file_name"]] = row["file_id"]
+                    catalog[row["file_id"]] = row["file_name"]
+                with self._catalog_lock:
+                    self._file_catalog = catalog
 
                 logger.info("已刷新文件名映射，共 {} 条", len(mapping))
                 return mapping
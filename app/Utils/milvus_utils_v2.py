@@ -2,7 +2,15 @@ from pymilvus import MilvusClient, DataType
 from loguru import logger
 import uuid
 from typing import List, Tuple, Dict, Any, Optional
-from ..config import MILVUS_HOST, MILVUS_PORT
+import numpy as np
+from ..config import MILVUS_HOST, MILVUS_PORT, VECTOR_METRIC_TYPE, HYBRID_SEARCH_ENABLED, HYBRID_RRF_K
+from .Collection_Residency import residency_manager
+from .Metrics import track_stage
+from ..logger import summarize, log_verbose
+from .Query_Cache import query_cache
+from .Lexical_Index import lexical_index
+from .Collection_Schema import collection_schema
+from .Sparse_Encoder import sparse_encoder, SPARSE_FIELD
 from pypinyin import pinyin, Style
 
 
@@ -58,18 +66,27 @@ class My_MilvusClient:
         
         return normalized_name
 
+    def _has_sparse_field(self, collection_name: str) -> bool:
+        """知识库是否有稀疏向量字段（启用混合检索后新建的组件表才有）"""
+        return SPARSE_FIELD in collection_schema.field_names(self.client, collection_name)
+
+    def metric_type(self, collection_name: Optional[str] = None) -> Optional[str]:
+        """知识库稠密向量字段的索引度量，检索返回的分数按该度量计算"""
+        return collection_schema.metric_type(self.client, collection_name or self.collection_name)
+
     def _prepare_collection(self, collection_name: str, headers: Optional[List[str]] = None):
+        collection_schema.invalidate(collection_name)
         has_collection = self.client.has_collection(collection_name=collection_name)
         if has_collection:
             logger.info(f"Collection '{collection_name}' already exists.")
-            self.client.load_collection(collection_name=collection_name)
+            residency_manager.ensure_loaded(collection_name)
             # 加载现有字段映射（如果需要）
             try:
                 collection_info = self.client.describe_collection(collection_name)
                 fields = collection_info.get("fields", [])
                 for field in fields:
                     field_name = field["name"]
-                    if field_name.startswith("field_") or field_name in ["id", "embedding", "file_id", "file_name"]:
+                    if field_name.startswith("field_") or field_name in ["id", "embedding", "file_id", "file_name", SPARSE_FIELD]:
                         continue
                     # 假设原始字段名与规范化字段名一致（可根据需要扩展）
                     self.field_name_mapping[field_name] = field_name
@@ -107,9 +124,17 @@ class My_MilvusClient:
         index_params.add_index(
             "embedding",
             index_type="IVF_FLAT",
-            metric_type="COSINE",
+            metric_type=VECTOR_METRIC_TYPE,
             params={"nlist": 1024}
         )
+        if HYBRID_SEARCH_ENABLED:
+            schema.add_field(SPARSE_FIELD, DataType.SPARSE_FLOAT_VECTOR)
+            index_params.add_index(
+                SPARSE_FIELD,
+                index_type="SPARSE_INVERTED_INDEX",
+                metric_type="IP",
+                params={"drop_ratio_build": 0.0}
+            )
 
         try:
             self.client.create_collection(
@@ -122,7 +147,7 @@ class My_MilvusClient:
             logger.error(f"Failed to create collection: {collection_name}, error: {e}")
             raise
 
-    def insert_documents(self, texts: Dict[str, List[str]], embeddings: List[List[float]], file_id: str, file_name: str):
+    def insert_documents(self, texts: Dict[str, List[str]], embeddings: np.ndarray, file_id: str, file_name: str):
         if "组件名称" not in texts:
             logger.error("未找到 '组件名称' 列，无法进行嵌入化处理")
             raise ValueError("texts 字典中必须包含 '组件名称' 列")
@@ -130,6 +155,7 @@ class My_MilvusClient:
         # 获取表头并规范化
         headers = list(texts.keys())
         self._prepare_collection(collection_name=self.collection_name, headers=headers)
+        collection_schema.check_vectors(self.client, self.collection_name)
         
         component_texts = texts["组件名称"]
         if len(component_texts) != len(embeddings):
@@ -137,6 +163,12 @@ class My_MilvusClient:
             raise ValueError("嵌入向量长度必须与 '组件名称' 列长度一致")
         
         num_rows = len(component_texts)
+        sparse_vectors = None
+        if self._has_sparse_field(self.collection_name):
+            sparse_vectors = sparse_encoder.encode_documents([
+                {header: texts[header][i] if i < len(texts[header]) else "" for header in headers}
+                for i in range(num_rows)
+            ])
         data = []
         for i in range(num_rows):
             row_data = {
@@ -145,6 +177,8 @@ class My_MilvusClient:
                 "file_id": file_id,
                 "file_name": file_name
             }
+            if sparse_vectors is not None:
+                row_data[SPARSE_FIELD] = sparse_vectors[i]
             # 使用规范化后的字段名插入数据
             for header in headers:
                 normalized_header = self.field_name_mapping.get(header, self._normalize_field_name(header))
@@ -152,73 +186,119 @@ class My_MilvusClient:
             data.append(row_data)
         
         self.client.insert(collection_name=self.collection_name, data=data)
+        query_cache.invalidate_files([file_id])
+        lexical_index.add_rows(self.collection_name, data, self.field_name_mapping)
         logger.info(f"Inserted {len(data)} rows with file_id {file_id} and file_name {file_name}.")
 
-    def search_similar(self, system_name, query_embedding: List[float], top_k: int = 5, filter_score: float = 0.0) -> List[Tuple[Dict[str, Any], float]]:
-        results = self.client.search(
-            collection_name=self.collection_name,
-            data=[query_embedding],
-            limit=top_k,
-            filter=f" jiao_yi_xi_tong == '{system_name}' ",
-            output_fields=["file_id", "file_name"] + list(self.field_name_mapping.values())
-        )[0]
-        logger.info(f"Search results: {results}")
+    def _to_original_fields(self, entity: Dict[str, Any]) -> Dict[str, Any]:
+        """将规范化字段名转换回原始字段名"""
+        converted_entity = {
+            "file_id": entity["file_id"],
+            "file_name": entity["file_name"]
+        }
+        for original_field, normalized_field in self.field_name_mapping.items():
+            if normalized_field in entity:
+                converted_entity[original_field] = entity[normalized_field]
+        return converted_entity
+
+    @staticmethod
+    def _dense_score(query_embedding: np.ndarray, vector, metric_type: str) -> float:
+        """按知识库的索引度量计算稠密向量分数，与普通向量检索返回的 distance 一致"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        vector = np.asarray(vector, dtype=np.float32)
+        if metric_type == "L2":
+            return float(np.sum((query - vector) ** 2))
+        if metric_type == "COSINE":
+            norm = np.linalg.norm(query) * np.linalg.norm(vector)
+            return float(query @ vector / norm) if norm > 0 else 0.0
+        return float(query @ vector)
+
+    def uses_hybrid_search(self) -> bool:
+        """传入 query_text 的检索是否走混合检索"""
+        return HYBRID_SEARCH_ENABLED and self._has_sparse_field(self.collection_name)
+
+    def _hybrid_search(self, query_embedding: np.ndarray, query_text: str, top_k: int, filter_expr: str, output_fields: List[str]) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        稠密 + 稀疏混合检索，两路结果按RRF融合排序；返回的分数为稠密向量分数（按返回的向量重新计算），
+        与普通向量检索的分数含义一致，filter_score 和重排的 initial_score 不受影响
+        """
+        from pymilvus import AnnSearchRequest, Collection, RRFRanker
+
+        # 搜索参数和重新计算的分数都要用知识库建立时的索引度量，而不是当前的 VECTOR_METRIC_TYPE
+        metric_type = self.metric_type() or VECTOR_METRIC_TYPE
+        requests = [
+            AnnSearchRequest([query_embedding], "embedding", {"metric_type": metric_type}, top_k, expr=filter_expr),
+            AnnSearchRequest([sparse_encoder.encode_query(query_text)], SPARSE_FIELD, {"metric_type": "IP"}, top_k, expr=filter_expr),
+        ]
+        with track_stage("milvus_hybrid_search", self.collection_name):
+            hits = Collection(self.collection_name, using=self.client._using).hybrid_search(
+                requests, RRFRanker(HYBRID_RRF_K), limit=top_k, output_fields=output_fields + ["embedding"]
+            )[0]
+        results = []
+        for hit in hits:
+            entity = hit.to_dict()["entity"]
+            results.append((entity, self._dense_score(query_embedding, entity.pop("embedding"), metric_type)))
+        return results
+
+    def search_similar(self, system_name, query_embedding: np.ndarray, top_k: int = 5, filter_score: float = 0.0, query_text: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """query_text 非空且知识库有稀疏向量字段时做混合检索（HYBRID_SEARCH_ENABLED）"""
+        collection_schema.check_vectors(self.client, self.collection_name)
+        residency_manager.ensure_loaded(self.collection_name)
+        filter_expr = f" jiao_yi_xi_tong == '{system_name}' "
+        output_fields = ["file_id", "file_name"] + list(self.field_name_mapping.values())
+        if query_text and self.uses_hybrid_search():
+            hits = self._hybrid_search(query_embedding, query_text, top_k, filter_expr, output_fields)
+        else:
+            with track_stage("milvus_search", self.collection_name):
+                results = self.client.search(
+                    collection_name=self.collection_name,
+                    data=[query_embedding],
+                    limit=top_k,
+                    filter=filter_expr,
+                    output_fields=output_fields
+                )[0]
+            hits = [(hit["entity"], hit["distance"]) for hit in results]
+        log_verbose("Search results: {}", summarize(hits))
         
          # 过滤掉 distance < filter_score 的结果
-        filtered_results = [
-            (hit["entity"], hit["distance"])
-            for hit in results
-            if hit["distance"] >= filter_score
+        search_results = [
+            (self._to_original_fields(entity), score)
+            for entity, score in hits
+            if score >= filter_score
         ]
-      
-        
-       # 将规范化字段名转换回原始字段名
-        search_results = []
-        for entity, score in filtered_results:
-            converted_entity = {
-                "file_id": entity["file_id"],
-                "file_name": entity["file_name"]
-            }
-            for original_field, normalized_field in self.field_name_mapping.items():
-                if normalized_field in entity:
-                    converted_entity[original_field] = entity[normalized_field]
-            search_results.append((converted_entity, score))
 
-        logger.info(f"Search results with normalized scores: {search_results}")
+        logger.debug("Search results with normalized scores: {}", summarize(search_results))
         return search_results
 
-    def search_similar_in_file(self, system_name, query_embedding: List[float], top_k: int, filter_score: float, file_id: str) -> List[Tuple[Dict[str, Any], float]]:
-        results = self.client.search(
-        collection_name=self.collection_name,
-        data=[query_embedding],
-        limit=top_k,
-        filter=f" file_id == '{file_id}' and jiao_yi_xi_tong == '{system_name}' ",
-        output_fields=["file_id", "file_name", "zu_jian_ID", "zu_jian_ming_cheng", "zu_jian_lei_xing", "jiao_yi_xi_tong", "zu_jian_shuo_ming", ] 
-    )[0]
+    def search_similar_in_file(self, system_name, query_embedding: np.ndarray, top_k: int, filter_score: float, file_id: str, query_text: Optional[str] = None) -> List[Tuple[Dict[str, Any], float]]:
+        collection_schema.check_vectors(self.client, self.collection_name)
+        residency_manager.ensure_loaded(self.collection_name)
+        filter_expr = f" file_id == '{file_id}' and jiao_yi_xi_tong == '{system_name}' "
+        output_fields = ["file_id", "file_name", "zu_jian_ID", "zu_jian_ming_cheng", "zu_jian_lei_xing", "jiao_yi_xi_tong", "zu_jian_shuo_ming", ]
+        if query_text and self.uses_hybrid_search():
+            hits = self._hybrid_search(query_embedding, query_text, top_k, filter_expr, output_fields)
+        else:
+            with track_stage("milvus_search", self.collection_name):
+                results = self.client.search(
+                collection_name=self.collection_name,
+                data=[query_embedding],
+                limit=top_k,
+                filter=filter_expr,
+                output_fields=output_fields
+            )[0]
+            hits = [(hit["entity"], hit["distance"]) for hit in results]
 
-        file_name = results[0]["entity"]["file_name"] if results else ""
-        logger.info(f"Search in file_name={file_name} and file_id={file_id} ----> results: {results}")
+        file_name = hits[0][0]["file_name"] if hits else ""
+        log_verbose("Search in file_name={} and file_id={} ----> results: {}", file_name, file_id, summarize(hits))
 
         # 过滤掉 distance < filter_score 的结果
-        filtered_results = [
-            (hit["entity"], hit["distance"])
-            for hit in results
-            if hit["distance"] >= filter_score
+        search_results = [
+            (self._to_original_fields(entity), score)
+            for entity, score in hits
+            if score >= filter_score
         ]
 
-        # 将规范化字段名转换回原始字段名
-        search_results = []
-        for entity, score in filtered_results:
-            converted_entity = {
-                "file_id": entity["file_id"],
-                "file_name": entity["file_name"]
-            }
-            for original_field, normalized_field in self.field_name_mapping.items():
-                if normalized_field in entity:
-                    converted_entity[original_field] = entity[normalized_field]
-            search_results.append((converted_entity, score))
-
-        logger.info(f"Search results with normalized scores: {search_results}")
+        logger.debug("Search results with normalized scores: {}", summarize(search_results))
         return search_results
 
     def get_file_id_by_name(self, file_name: str) -> str:
@@ -229,13 +309,13 @@ class My_MilvusClient:
         )
         return results[0]["file_id"] if results else None
     
-    def search_similar_texts_only(self, query_embedding: List[float], top_k: int = 5) -> List[str]:
+    def search_similar_texts_only(self, query_embedding: np.ndarray, top_k: int = 5) -> List[str]:
         results = self.search_similar(query_embedding, top_k)
         texts = [str(entity) for entity, _ in results]
-        logger.info(f"检索到的内容: {texts}")
+        logger.debug("检索到的内容: {}", summarize(texts))
         return texts
 
-    def search_similar_by_filename(self, query_embedding: List[float], file_name: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def search_similar_by_filename(self, query_embedding: np.ndarray, file_name: str, top_k: int = 5) -> List[Dict[str, Any]]:
         file_id = self.resolve_filename_to_id(file_name)
         if not file_id:
             logger.warning(f"未找到文件名: {file_name}")
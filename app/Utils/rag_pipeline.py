@@ -2,17 +2,15 @@ import numpy as np
 from typing import List, Dict, Any
 from loguru import logger
 from .milvus_utils import My_MilvusClient
-from .embedding_utils import EmbeddingModel
+from .embedding_utils import EmbeddingModel, cosine_similarities
+from .Sequence_Length import token_limit
 from .reranker_utils import RerankerModel
 from .graph_utils import OperationGraph
+from ..logger import summarize
 from ..config import USE_RERANKER, RERANKER_TOP_K, INITIAL_RETRIEVAL_TOP_K, SIMILARITY_THRESHOLD
 import re 
 
 
-def cosine_similarity(a, b):
-    """Calculate cosine similarity between two vectors"""
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
 class RAGPipeline:
     def __init__(self):
         self.milvus_client = My_MilvusClient(dim=1024)
@@ -36,9 +34,9 @@ class RAGPipeline:
     def ingest_documents(self, texts: List[str], file_id: str = None, file_name: str = None):
         """Ingest documents into Milvus with optional file_id and file_name"""
 
-        logger.debug(f"Ingesting texts: {texts}")
+        logger.debug("Ingesting texts: {}", summarize(texts))
         try:
-            embeddings = self.embedding_model.encode(texts)
+            embeddings = self.embedding_model.encode(texts, max_length=token_limit("passage"))
             self.milvus_client.insert_documents(texts, embeddings, file_id or "", file_name or "")
             logger.info(f"Documents ingested successfully: {len(texts)} docs, file_id={file_id}, file_name={file_name}")
         except Exception as e:
@@ -46,20 +44,20 @@ class RAGPipeline:
             raise
 
 
-    def is_invalid(self, results: List[str], query_emb: List[float]) -> bool:
+    def is_invalid(self, results: List[str], query_emb: np.ndarray) -> bool:
         """Judge if RAG recall is invalid (e.g., low similarity or empty)"""
         if not results:
             logger.warning("No results retrieved from Milvus")
             return True
-        sims = [cosine_similarity(query_emb, self.embedding_model.encode([r])[0]) for r in results]
-        max_sim = max(sims) if sims else 0
+        sims = cosine_similarities(query_emb, self.embedding_model.encode_batched(results, max_length=token_limit("passage")))
+        max_sim = float(sims.max()) if sims.size else 0
         logger.debug(f"Max similarity score: {max_sim}")
         return max_sim < SIMILARITY_THRESHOLD
 
     def query(self, question: str, use_graph: bool = True) -> str:
         """Query the RAG system with optional graph enhancement, return context sequence"""
         try:
-            query_embedding = self.embedding_model.encode([question])[0]
+            query_embedding = self.embedding_model.encode([question], max_length=token_limit("query"))[0]
             
             # Initial retrieval
             initial_top_k = INITIAL_RETRIEVAL_TOP_K if self.reranker else 5
@@ -105,7 +103,7 @@ class RAGPipeline:
     def query_in_file(self, question: str, file_id: str, use_graph: bool = True) -> str:
         """Query within a specific file with optional graph enhancement, return context sequence"""
         try:
-            query_embedding = self.embedding_model.encode([question])[0]
+            query_embedding = self.embedding_model.encode([question], max_length=token_limit("query"))[0]
             
             # Initial retrieval
             initial_top_k = INITIAL_RETRIEVAL_TOP_K if self.reranker else 5
@@ -149,7 +147,7 @@ class RAGPipeline:
     def query_by_file_name(self, question: str, file_name: str, top_k: int = 5, use_graph: bool = True) -> List[Dict[str, Any]]:
         """Query by file name with optional graph enhancement, return structured results"""
         try:
-            query_embedding = self.embedding_model.encode([question])[0]
+            query_embedding = self.embedding_model.encode([question], max_length=token_limit("query"))[0]
             search_results = self.milvus_client.search_similar_by_filename(query_embedding, file_name, top_k)
             
             contexts = [item['text'] for item in search_results]
@@ -211,7 +209,7 @@ class RAGPipeline:
 
             for i, (step_id, step) in enumerate(zip(step_ids, steps), 1):
                 logger.info(f"Processing step {step_id}: {step}")
-                query_embedding = self.embedding_model.encode([step])[0]
+                query_embedding = self.embedding_model.encode([step], max_length=token_limit("query"))[0]
                 
                 # Initial retrieval
                 initial_top_k = INITIAL_RETRIEVAL_TOP_K if self.reranker else 5
@@ -2,13 +2,33 @@ from transformers import AutoTokenizer , AutoModelForSequenceClassification
 import torch
 from loguru import logger
 from ..config import RERANKER_MODEL_PATH, RERANKER_GPU_DEVICES, ENABLE_MEMORY_OPTIMIZATION, MAX_MEMORY_FRACTION, ENABLE_MEMORY_POOLING
+from ..config import (
+    RERANK_CASCADE_ENABLED, RERANK_CASCADE_ACCEPT, RERANK_CASCADE_REJECT, RERANK_CASCADE_BAND_SIZE, RERANK_CASCADE_SHADOW_RATE,
+    RERANKER_MAX_LENGTH, RERANKER_BATCH_SIZE,
+)
 import gc
 import os
-from typing import List, Dict, Tuple
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, List, Dict, Optional, Tuple
+from .Metrics import track_stage, observe_batch, count_cascade, count_shadow
+from .Lexical_Index import name_similarity
+from .Collection_Schema import SIMILARITY_METRICS
+from .Sequence_Length import length_buckets, token_limit, truncate_texts
+from ..logger import summarize
+from .Startup import startup_manager
+from .Inference_Pool import InferenceClient, pool_enabled
+from .Model_Warmup import CompiledForward, first_query_timer, warm_up_model, warmup_text
 
 class RerankerModel:
     _instance = None
     _initialized = False
+    _init_lock = threading.Lock()
+    # 级联重排统计：查询数、跳过模型的查询数、各决定方式的候选数、影子对比结果
+    _cascade_counts = Counter()
+    _cascade_lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
         """
@@ -22,8 +42,19 @@ class RerankerModel:
         """
         初始化重排模型，仅在第一次实例化时加载模型和分词器
         """
-        if self._initialized:
-            logger.info("RerankerModel already initialized, reusing existing instance.")
+        with RerankerModel._init_lock:
+            if self._initialized:
+                logger.info("RerankerModel already initialized, reusing existing instance.")
+                return
+            self._load()
+
+    def _load(self):
+        """加载分词器和模型；推理池模式下只建立到推理进程的客户端"""
+        self._remote = InferenceClient("reranker") if pool_enabled() else None
+        if self._remote is not None:
+            self.device = torch.device("cpu")
+            self._initialized = True
+            logger.info(f"Reranker model served by inference pool at {self._remote.socket_dir}")
             return
 
         try:
@@ -63,6 +94,7 @@ class RerankerModel:
                     self.device = torch.device("cpu")
             
             self.model = self.model.to(self.device)
+            self._infer = CompiledForward("reranker", self.model, self.tokenizer, self.device)
 
             # 设置内存优化
             if ENABLE_MEMORY_OPTIMIZATION:
@@ -129,7 +161,46 @@ class RerankerModel:
             logger.debug("GPU内存已清理")
         
 
-    def rerank(self, query: str, passages: List[str], top_k: int = None) -> List[Tuple[str, float]]:
+    def _score(self, pairs: List[List[str]], passage_max_tokens: Optional[int] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        对一批查询-文档对做前向计算，返回原始分数和sigmoid归一化分数
+
+        文档先截断到 passage_max_tokens 个token，整批分词后按长度分桶（每桶 RERANKER_BATCH_SIZE 对），
+        每桶只padding到桶内最长序列。推理池模式下截断token数随请求发送，由推理进程截断
+        """
+        if self._remote is not None:
+            with track_stage("rerank"):
+                scores = torch.from_numpy(self._remote.score(pairs, passage_max_tokens))
+            return scores, torch.sigmoid(scores)
+        # 编码
+        with track_stage("tokenize"):
+            passages = truncate_texts(self.tokenizer, [passage for _, passage in pairs], passage_max_tokens)
+            encodings = self.tokenizer([query for query, _ in pairs], passages, truncation=True, max_length=RERANKER_MAX_LENGTH)
+
+        # 计算相似度分数
+        start = time.perf_counter()
+        scores = torch.empty(len(pairs), dtype=torch.float32)
+        for indices, inputs in length_buckets(self.tokenizer, encodings, RERANKER_BATCH_SIZE, "reranker"):
+            observe_batch("rerank", len(indices))
+            # 将输入数据移动到设备
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with track_stage("rerank"), torch.no_grad():
+                scores[indices] = self._infer(inputs).view(-1,).float().cpu()
+        normalized_scores = torch.sigmoid(scores)
+        first_query_timer.record("reranker", time.perf_counter() - start)
+        return scores, normalized_scores
+
+    def warm_up(self):
+        """按批大小×序列长度分桶预热；直接调用 _score，失败时抛出而不是返回默认分数"""
+        if self._remote is not None:
+            # 推理进程启动时已自行预热，这里只确认推理池可用
+            return self._score([["预热查询", "预热"]])
+        return warm_up_model(
+            "reranker",
+            lambda batch_size, seq_len: self._score([["预热查询", warmup_text(max(1, seq_len - 8))]] * batch_size)
+        )
+
+    def rerank(self, query: str, passages: List[str], top_k: int = None, passage_max_tokens: Optional[int] = None) -> List[Tuple[str, float]]:
         """
         对检索到的文档进行重排
         
@@ -137,6 +208,7 @@ class RerankerModel:
             query: 查询文本
             passages: 候选文档列表
             top_k: 返回前k个结果，如果为None则返回所有结果
+            passage_max_tokens: 文档一侧的截断token数，None 时取 TOKEN_LIMITS 中 passage 的配置
             
         Returns:
             List[Tuple[str, float]]: 重排后的文档和分数列表，按分数降序排列
@@ -147,27 +219,11 @@ class RerankerModel:
         try:
             # 构建查询-文档对
             pairs = [[query, passage] for passage in passages]
-            logger.debug(f"Pairs: {pairs}")
-            # 编码
-            inputs = self.tokenizer(
-                pairs,
-                padding=True,
-                truncation=True,
-                return_tensors="pt",
-                max_length=512
-            )
-            # logger.debug(f"Tokenizer output: {inputs}")
-         
-            # 将输入数据移动到设备
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # 计算相似度分数s
-            with torch.no_grad():
+            logger.debug("Pairs: {}", summarize(pairs))
+            if passage_max_tokens is None:
+                passage_max_tokens = token_limit("passage")
+            scores, normalized_scores = self._score(pairs, passage_max_tokens)
 
-                # outputs = self.model(**inputs)  
-                scores = self.model(**inputs,return_dict=True).logits.view(-1,).float()  
-                normalized_scores = torch.sigmoid(scores)
-               
             # scores = torch.nn.functional.normalize(scores, p=2, dim=1)
             # 如果只有一个文档，确保scores是数组
             if len(passages) == 1:
@@ -200,7 +256,8 @@ class RerankerModel:
             logger.warning("Reranking failed, returning passages with default scores.")
             return [(passage, 0.0) for passage in passages]
 
-    def rerank_with_scores(self, query: str, passages_with_scores: List[Tuple[str, float]], top_k: int = None) -> List[Tuple[str, float,float]]:
+    def rerank_with_scores(self, query: str, passages_with_scores: List[Tuple[str, float]], top_k: int = None,
+                           passage_max_tokens: Optional[int] = None, metric_type: Optional[str] = None) -> List[Tuple[str, float,float]]:
         """
         对带有初始分数的文档进行重排
         
@@ -208,31 +265,126 @@ class RerankerModel:
             query: 查询文本
             passages_with_scores: 候选文档和初始分数列表
             top_k: 返回前k个结果
+            passage_max_tokens: 文档一侧的截断token数（见 rerank）
+            metric_type: 初始分数来自的索引度量；只有 IP/COSINE 的原始分数是相似度，级联预打分才会使用，
+                None（min-max归一化后的分数或来源未知）和 L2（距离）只按名称相似度预打分
             
         Returns:
             List[Tuple[str, float]]: 重排后的文档和分数列表
         """
         if not passages_with_scores:
             return []
+        if RERANK_CASCADE_ENABLED:
+            return self._cascade(query, passages_with_scores, top_k, passage_max_tokens, metric_type)
         
         # 提取文档文本
         passages = [doc for doc, _ in passages_with_scores]
         
         # 进行重排
-        reranked_results = self.rerank(query, passages, top_k)
+        reranked_results = self.rerank(query, passages, top_k, passage_max_tokens)
         # 如果reranked_results的text在passages_with_scores的text中，如果匹配到，则在reranked_results中添加initial_score
         score_map = dict(passages_with_scores)
         reranked_results = [((text,r_score,score_map.get(text))) for text, r_score in reranked_results] 
 
         return reranked_results
     
-    def rerank_components(self, initial_results: Dict[str, List], top_k: int = None) -> Dict[str, List[Tuple[Dict, float, float]]]:
+    @staticmethod
+    def _prescore(query: str, text: str, initial_score: float, metric_type: Optional[str] = None) -> float:
+        """
+        级联第一级的廉价打分：查询-文档名称相似度，初始分数为 IP/COSINE 原始相似度时取二者中较高的一个。
+        min-max归一化后的分数（最好的一条总是1.0）和 L2 距离不能说明候选与查询有多接近，不参与预打分
+        """
+        similarity = (initial_score or 0.0) if metric_type in SIMILARITY_METRICS else 0.0
+        return max(similarity, name_similarity(query, text))
+
+    def _cascade(self, query: str, passages_with_scores: List[Tuple[str, float]], top_k: int = None,
+                 passage_max_tokens: Optional[int] = None, metric_type: Optional[str] = None) -> List[Tuple[str, float, float]]:
+        """
+        级联重排：预打分不低于 RERANK_CASCADE_ACCEPT 的候选直接采纳并排在最前，低于 RERANK_CASCADE_REJECT 的直接排在最后，
+        只有中间的候选（最多 RERANK_CASCADE_BAND_SIZE 个）交给重排模型；采纳的候选已够 top_k 时不调用模型。
+        跳过模型的候选以预打分作为重排分数，与模型的 sigmoid 分数同在 [0, 1] 区间
+        """
+        scored = sorted(
+            ((text, self._prescore(query, text, initial_score, metric_type), initial_score) for text, initial_score in passages_with_scores),
+            key=lambda item: -item[1],
+        )
+        accepted = [item for item in scored if item[1] >= RERANK_CASCADE_ACCEPT]
+        band = [item for item in scored if RERANK_CASCADE_REJECT <= item[1] < RERANK_CASCADE_ACCEPT]
+        rejected = [item for item in scored if item[1] < RERANK_CASCADE_REJECT]
+        if top_k is not None and len(accepted) >= top_k:
+            band, rejected = [], band + rejected
+        elif RERANK_CASCADE_BAND_SIZE > 0 and len(band) > RERANK_CASCADE_BAND_SIZE:
+            band, rejected = band[:RERANK_CASCADE_BAND_SIZE], band[RERANK_CASCADE_BAND_SIZE:] + rejected
+
+        score_map = {text: initial_score for text, _, initial_score in scored}
+        results = [(text, pre, initial_score) for text, pre, initial_score in accepted]
+        if band:
+            results += [(text, r_score, score_map.get(text)) for text, r_score in self.rerank(query, [text for text, _, _ in band], None, passage_max_tokens)]
+        results += [(text, pre, initial_score) for text, pre, initial_score in rejected]
+        if top_k is not None:
+            results = results[:top_k]
+
+        count_cascade("accepted", len(accepted))
+        count_cascade("reranked", len(band))
+        count_cascade("rejected", len(rejected))
+        with RerankerModel._cascade_lock:
+            counts = RerankerModel._cascade_counts
+            counts["queries"] += 1
+            counts["skipped_queries"] += not band
+            counts["accepted"] += len(accepted)
+            counts["reranked"] += len(band)
+            counts["rejected"] += len(rejected)
+        if len(band) < len(scored) and RERANK_CASCADE_SHADOW_RATE > 0 and random.random() < RERANK_CASCADE_SHADOW_RATE:
+            self._shadow(query, [text for text, _ in passages_with_scores], results, top_k, passage_max_tokens)
+        return results
+
+    def _shadow(self, query: str, passages: List[str], results: List[Tuple[str, float, float]], top_k: int = None,
+                passage_max_tokens: Optional[int] = None):
+        """对跳过了候选的查询再做一次完整重排，统计 top1 是否一致以及 top_k 的重合比例，用来评估级联阈值对准确率的影响"""
+        full = self.rerank(query, passages, top_k or len(results), passage_max_tokens)
+        if not full or not results:
+            return
+        agree = full[0][0] == results[0][0]
+        overlap = len({text for text, _ in full} & {text for text, _, _ in results}) / len(full)
+        count_shadow("agree" if agree else "disagree")
+        with RerankerModel._cascade_lock:
+            counts = RerankerModel._cascade_counts
+            counts["shadow_queries"] += 1
+            counts["shadow_top1_agree"] += agree
+            counts["shadow_overlap"] += overlap
+        if not agree:
+            logger.debug(f"级联重排与完整重排 top1 不一致: {query} -> {results[0][0]} / {full[0][0]}")
+
+    def cascade_stats(self) -> Dict[str, Any]:
+        with RerankerModel._cascade_lock:
+            counts = dict(RerankerModel._cascade_counts)
+        queries = counts.get("queries", 0)
+        candidates = counts.get("accepted", 0) + counts.get("reranked", 0) + counts.get("rejected", 0)
+        shadow = counts.get("shadow_queries", 0)
+        return {
+            "enabled": RERANK_CASCADE_ENABLED,
+            "accept_threshold": RERANK_CASCADE_ACCEPT,
+            "reject_threshold": RERANK_CASCADE_REJECT,
+            "band_size": RERANK_CASCADE_BAND_SIZE,
+            "queries": queries,
+            "skipped_queries": counts.get("skipped_queries", 0),
+            "candidates": {key: counts.get(key, 0) for key in ("accepted", "reranked", "rejected")},
+            "candidate_skip_rate": 1 - counts.get("reranked", 0) / candidates if candidates else 0.0,
+            "shadow_rate": RERANK_CASCADE_SHADOW_RATE,
+            "shadow_queries": shadow,
+            "shadow_top1_agreement": counts.get("shadow_top1_agree", 0) / shadow if shadow else None,
+            "shadow_topk_overlap": counts.get("shadow_overlap", 0.0) / shadow if shadow else None,
+        }
+
+    def rerank_components(self, initial_results: Dict[str, List], top_k: int = None,
+                          metric_type: Optional[str] = None) -> Dict[str, List[Tuple[Dict, float, float]]]:
         """
         对结构化的初始结果进行重排，保留初始分数并添加重排分数
 
         Args:
             initial_results: 字典，键为查询，值为包含 (组件信息, 初始分数) 的列表
             top_k: 返回前 k 个结果，如果为 None 则返回所有结果
+            metric_type: 初始分数来自的索引度量（见 rerank_with_scores）
 
         Returns:
             Dict[str, List[Tuple[Dict, float, float]]]: 重排后的字典，值为 (组件信息, 初始分数, 重排分数) 的列表
@@ -249,7 +401,7 @@ class RerankerModel:
                 passages_with_scores = [(comp['组件名称'], score) for comp, score in components]
                 
                 # 使用 rerank_with_scores 方法进行重排
-                reranked = self.rerank_with_scores(query, passages_with_scores, top_k)
+                reranked = self.rerank_with_scores(query, passages_with_scores, top_k, token_limit("组件名称"), metric_type)
                 
                 # 将重排结果映射回原始组件信息
                 component_map = {comp['组件名称']: comp for comp, _ in components}
@@ -274,7 +426,8 @@ class RerankerModel:
                 for query, components in initial_results.items()
             }
     #交易名称rerank
-    def rerank_transactions(self, initial_results: Dict[str, List], top_k: int = None) -> Dict[str, List[Tuple[Dict, float, float]]]:
+    def rerank_transactions(self, initial_results: Dict[str, List], top_k: int = None,
+                            metric_type: Optional[str] = None) -> Dict[str, List[Tuple[Dict, float, float]]]:
         reranked_results = {}
         try:
             for query, transactions in initial_results.items():
@@ -286,7 +439,7 @@ class RerankerModel:
                 passages_with_scores = [(trans['交易名称'], score) for trans, score in transactions]
                 
                 # 使用 rerank_with_scores 方法进行重排
-                reranked = self.rerank_with_scores(query, passages_with_scores, top_k)
+                reranked = self.rerank_with_scores(query, passages_with_scores, top_k, token_limit("交易名称"), metric_type)
                 
                 # 将重排结果映射回原始交易信息
                 transaction_map = {trans['交易名称']: trans for trans, _ in transactions}
@@ -309,4 +462,8 @@ class RerankerModel:
             return {
                 query: [(trans, score, 0.0) for trans, score in transactions]
                 for query, transactions in initial_results.items()
-            }
\ No newline at end of file
+            }
+
+
+reranker_model = startup_manager.lazy("reranker_model", RerankerModel, stage=1)
+startup_manager.add_warmup("reranker", lambda: reranker_model.warm_up())
@@ -1,6 +1,8 @@
 from pyclbr import Function
 from .embedding_utils import  embedding_model
+from .Sequence_Length import token_limit
 from typing import Dict, List
+import numpy as np
 
 
 class TextToInsertType:
@@ -20,7 +22,7 @@ class TextToInsertType:
         
         components = texts["组件名称"]
         component_length = len(components)
-        embeddings = embedding_model.encode(components)
+        embeddings = embedding_model.encode(components, max_length=token_limit("组件名称"))
         data = []
         for i in range(component_length):
             row_data ={
@@ -40,7 +42,7 @@ class TextToInsertType:
     def text_to_insert_transaction_type(self,texts: Dict[str, List[str]], file_id: str, file_name: str) -> List[Dict]:
         transaction_name = texts["交易名称"]
         transaction_length = len(transaction_name)
-        embeddings = embedding_model.encode(transaction_name)
+        embeddings = embedding_model.encode(transaction_name, max_length=token_limit("交易名称"))
         data = []
         for i in range(transaction_length):
             row_data ={
@@ -62,7 +64,7 @@ class TextToInsertType:
         function_description = texts["功能描述"]
         transactionAndFunction = [f"{name}:{description}" for name, description in zip(transaction_name, function_description)]
         transaction_length = len(transactionAndFunction)
-        embeddings = embedding_model.encode(transactionAndFunction)
+        embeddings = embedding_model.encode(transactionAndFunction, max_length=token_limit("交易名称"))
         data = []
         for i in range(transaction_length):
             row_data ={
@@ -78,20 +80,36 @@ class TextToInsertType:
             data.append(row_data)
         return data
 
+    @staticmethod
+    def _encode_fields(first: List[str], first_field: str, second: List[str], second_field: str) -> np.ndarray:
+        """
+        两列文本按各自字段的截断token数编码，返回按 first + second 顺序拼接的向量矩阵；
+        两个字段的截断配置相同时合并为一次分桶编码
+        """
+        first_limit, second_limit = token_limit(first_field), token_limit(second_field)
+        if first_limit == second_limit:
+            return embedding_model.encode_batched(first + second, max_length=first_limit)
+        return np.concatenate([
+            embedding_model.encode_batched(first, max_length=first_limit),
+            embedding_model.encode_batched(second, max_length=second_limit),
+        ])
+
     #交易名称v3版本
     def text_to_insert_transaction_type_v3(self, texts: Dict[str, List[str]], file_id: str, file_name: str) -> List[Dict]:
-        transaction_name = texts["交易名称"]
-        function_description = texts["功能描述"]
+        """
+        交易名称、功能描述两列合并为一次分桶编码；每行的向量是编码结果矩阵的一行（float32）
+        """
+        transaction_name = list(texts["交易名称"])
+        function_description = list(texts["功能描述"])
         transaction_length = len(transaction_name)
-        Transactionembedding = embedding_model.encode(transaction_name)
-        Functionembedding = embedding_model.encode(function_description)
+        embeddings = self._encode_fields(transaction_name, "交易名称", function_description, "功能描述")
         data = []
         for i in range(transaction_length):
             row_data ={
                 "file_id": file_id,
                 "file_name": file_name,
-                "Transactionembedding": Transactionembedding[i],
-                "Functionembedding": Functionembedding[i],
+                "Transactionembedding": embeddings[i],
+                "Functionembedding": embeddings[transaction_length + i],
                 }
             for key in texts.keys():
                 if key == "交易名称" or key == "功能描述":
@@ -105,18 +123,18 @@ class TextToInsertType:
     将入参、出参向量化
     """
     def text_to_insert_dataItem_type_v1(self, texts: Dict[str, List[str]], file_id: str, file_name: str) -> List[Dict]:
-        input_parameter = texts["输入参数"]
-        output_parameter = texts["输出参数"]
+        input_parameter = list(texts["输入参数"])
+        output_parameter = list(texts["输出参数"])
         transaction_length = len(input_parameter)
-        InputParameterEmbedding = embedding_model.encode(input_parameter)
-        OutputParameterEmbedding = embedding_model.encode(output_parameter)
+        # 入参、出参重复值较多，合并后一次编码可最大化去重和缓存命中
+        embeddings = self._encode_fields(input_parameter, "输入参数", output_parameter, "输出参数")
         data = []
         for i in range(transaction_length):
             row_data ={
                 "file_id": file_id,
                 "file_name": file_name,
-                "InputParameterEmbedding": InputParameterEmbedding[i],
-                "OutputParameterEmbedding": OutputParameterEmbedding[i],
+                "InputParameterEmbedding": embeddings[i],
+                "OutputParameterEmbedding": embeddings[transaction_length + i],
                 }
             for key in texts.keys():
                 if key == "输入参数" or key == "输出参数" or key == "组件ID":
@@ -125,4 +143,3 @@ class TextToInsertType:
                     row_data[key] = texts[key][i]
             data.append(row_data)
         return data
-    
\ No newline at end of file
@@ -12,6 +12,7 @@ from ..services.RerankerService import RerankerService
 from ..services.MultiDataItemRetrievalV1 import MultiDataItemRetrievalV1
 from collections import defaultdict
 from ..Utils.DataComponentParse  import questionParse
+from ..Utils.Single_Flight import single_flight
 
 rerankerService = RerankerService()
 router = APIRouter(prefix = "/DataItem_retrieval", tags = ["DataItem Retrieval API"])
@@ -21,7 +22,8 @@ multidataItemRetrieval = MultiDataItemRetrievalV1()
 
 #交易名称召回
 @router.post("/dataitem_retrieval", summary="DataItem(输入参数&&输出参数)召回", response_model= DataItemV1Response)
-async def dataitem_retrieval(request: DataItemV1Request):
+@single_flight.coalesce("/DataItem_retrieval/dataitem_retrieval")
+def dataitem_retrieval(request: DataItemV1Request):
     question = request.Question
     file_id = request.FileID
     rerank_top_k = request.RerankTopK
@@ -4,9 +4,14 @@ import time
 import uuid
 
 
-from ..Utils.embedding_utils import EmbeddingModel
-from ..Utils.reranker_utils import RerankerModel
+from ..Utils.embedding_utils import embedding_model
+from ..Utils.reranker_utils import reranker_model
 from ..Utils.Initial_Retrieval import InitialRetrieval
+from ..Utils.Startup import startup_manager
+from ..Utils.Query_Cache import query_cache
+from ..Utils.Single_Flight import single_flight
+from ..Utils.Sequence_Length import token_limit
+from ..logger import summarize, log_verbose
 from ..entitys.Retrieval_Code import(
     RetrievalRequest,
     RetrievalInfo,
@@ -15,12 +20,11 @@ from ..entitys.Retrieval_Code import(
 
 
 router = APIRouter(prefix = "/retrieval", tags = ["Retrieval Functions"])
-embedding_model = EmbeddingModel()
-initial_retrieval = InitialRetrieval("Component_Table")
-reranker_model = RerankerModel()
+initial_retrieval = startup_manager.lazy("retrieval_endpoints.initial_retrieval", lambda: InitialRetrieval("Component_Table"))
 
 @router.post("/search", summary = "cha xun ma zhi", response_model = RetrievalResponse)
-async def search(request: RetrievalRequest):
+@single_flight.coalesce("/retrieval/search")
+def search(request: RetrievalRequest):
     file_id = request.file_id
     question = request.question
     rerank_topk = request.rerank_topk
@@ -35,14 +39,27 @@ async def search(request: RetrievalRequest):
 
     query_id = str(uuid.uuid4())
     logger.info(f"Query ID: {query_id}")
+    cache_scope = dict(file_id=file_id, top_k=rerank_topk, filters=(filter_score, initial_topk, use_reranker))
+    try:
+        cached, query_embedding = query_cache.lookup(
+            "/retrieval/search", question,
+            lambda: embedding_model.encode([question], max_length=token_limit("query", "/retrieval/search"))[0],
+            **cache_scope
+        )
+    except Exception as e:
+        logger.error(f"检索异常query_id:{query_id} error:{e}")
+        raise HTTPException(status_code=500, detail= f"检索异常,error:{e}")
+    if cached is not None:
+        logger.info(f"Query ID: {query_id} 命中缓存")
+        return cached.model_copy(update={"question": question, "total_time": time.time() - start_time})
+
     if file_id:
         try :
-            query_embedding  = embedding_model.encode([question])[0]
             initial_results = initial_retrieval.search_by_fileid(query_embedding, file_id, filter_score, initial_topk)
-            logger.info(f"Initial results: {initial_results}")
+            logger.debug("Initial results: {}", summarize(initial_results))
             if use_reranker:
                 rerank_results = reranker_model.rerank_with_scores(question, initial_results, rerank_topk)
-                logger.info(f"Rerank results: {rerank_results}")
+                logger.debug("Rerank results: {}", summarize(rerank_results))
                 end_time = time.time()
                 retriavalinfo = [ RetrievalInfo(content = content, initial_score = initial_score, rerank_score = rerank_score, file_id = file_id) for content, initial_score, rerank_score in rerank_results]
                 total_time = end_time - start_time
@@ -51,7 +68,8 @@ async def search(request: RetrievalRequest):
                     question = question,
                     total_time = total_time
                 )
-                logger.info(f"完成重排序,结果 : {response}")
+                log_verbose("完成重排序,结果 : {}", summarize(response))
+                query_cache.put("/retrieval/search", question, response, embedding=query_embedding, **cache_scope)
                 return response
             else:
                 end_time = time.time()
@@ -62,19 +80,19 @@ async def search(request: RetrievalRequest):
                     question = question,
                     total_time = total_time
                 )
-                logger.info(f"未开启重排模型完成初始排序,结果 : {response}")
+                log_verbose("未开启重排模型完成初始排序,结果 : {}", summarize(response))
+                query_cache.put("/retrieval/search", question, response, embedding=query_embedding, **cache_scope)
                 return response
         except Exception as e:
             logger.error(f"检索异常query_id:{query_id} error:{e}")
             raise HTTPException(status_code=500, detail= f"检索异常,error:{e}")
     else:
         try :
-            query_embedding  = embedding_model.encode([question])[0]
             initial_results = initial_retrieval.search_no_fileid(query_embedding, filter_score, initial_topk)
-            logger.info(f"Initial results: {initial_results}")
+            logger.debug("Initial results: {}", summarize(initial_results))
             if use_reranker:
                 rerank_results = reranker_model.rerank_with_scores(question, initial_results, rerank_topk)
-                logger.info(f"Rerank results: {rerank_results}")
+                logger.debug("Rerank results: {}", summarize(rerank_results))
                 end_time = time.time()
                 retriavalinfo = [ RetrievalInfo(content = content, initial_score = initial_score, rerank_score = rerank_score) for content, initial_score, rerank_score in rerank_results]
                 total_time = end_time - start_time
@@ -83,7 +101,8 @@ async def search(request: RetrievalRequest):
                     question = question,
                     total_time = total_time
                 )
-                logger.info(f"完成重排序,结果 : {response}")
+                log_verbose("完成重排序,结果 : {}", summarize(response))
+                query_cache.put("/retrieval/search", question, response, embedding=query_embedding, **cache_scope)
                 return response
             else:
                 end_time = time.time()
@@ -94,7 +113,8 @@ async def search(request: RetrievalRequest):
                     question = question,
                     total_time = total_time
                 )
-                logger.info(f"未开启重排模型完成初始排序,结果 : {response}")
+                log_verbose("未开启重排模型完成初始排序,结果 : {}", summarize(response))
+                query_cache.put("/retrieval/search", question, response, embedding=query_embedding, **cache_scope)
                 return response
         except Exception as e:
             logger.error(f"检索异常query_id:{query_id} error:{e}")
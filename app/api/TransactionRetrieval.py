@@ -13,6 +13,7 @@ from ..services.RerankerService import RerankerService
 from ..services.Muti_Retrieval_Service import Muti_Retrieval_Service
 from ..Utils.TransactionStepParse import transactionStepParse
 from ..services.MultiTransactionRetrievalV3 import MultiTransactionRetrieval
+from ..Utils.Single_Flight import single_flight
 from collections import defaultdict
 
 
@@ -25,7 +26,8 @@ multiTransactionRetrieval = MultiTransactionRetrieval()
 
 #交易名称召回
 @router.post("/transaction_retrieval", summary="交易名称召回", response_model= TransactionV3Response)
-async def transaction_retrieval(request: TransactionV3Request):
+@single_flight.coalesce("/TransactionRetrieval/transaction_retrieval")
+def transaction_retrieval(request: TransactionV3Request):
     question = request.Question
     file_id = request.FileID
     rerank_top_k = request.RerankTopK
@@ -123,7 +125,8 @@ async def transaction_retrieval(request: TransactionV3Request):
 功能描述: 用于删除不再使用的存款产品，若产品存在正常账户或为传统类产品则不可删除
 """
 @router.post("/RetrievalByCases", summary="交易名称召回,返回内容形式通过测试案例整体返回并去重", response_model= TransactionReturnInCaseGroups)
-async def transaction_retrievalRetByCase(request: TransactionV3Request):
+@single_flight.coalesce("/TransactionRetrieval/RetrievalByCases")
+def transaction_retrievalRetByCase(request: TransactionV3Request):
     question = request.Question
     file_id = request.FileID
     rerank_top_k = request.RerankTopK
@@ -4,6 +4,7 @@ from loguru import logger
 import os
 
 from ..Utils.rag_pipeline import RAGPipeline
+from ..Utils.Startup import startup_manager
 from ..entitys.models import ChatCompletionRequest
 
 router = APIRouter(prefix="/v1", tags=["Chat Operations"])
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/v1", tags=["Chat Operations"])
 DEFAULT_MODEL = os.getenv("DEEPSEEK_MODEL", "DeepSeek-R1-Distill-Qwen-32B")
 
 # 全局RAG实例
-rag = RAGPipeline()
+rag = startup_manager.lazy("chat_endpoints.rag", RAGPipeline)
 
 @router.post("/chat/completions",deprecated=True)
 async def chat_completions(request: ChatCompletionRequest):
@@ -10,6 +10,12 @@ from ..entitys.Delete_Collection import (
     ListCollectionsResponse
 )
 from ..Utils.Collection_Utils import collection_manager
+from ..Utils.Collection_Residency import residency_manager
+from ..Utils.Startup import startup_manager
+from ..Utils.Bulk_Load import resolve_directory
+from ..config import BULK_LOAD_DIR, BULK_LOAD_BATCH_SIZE, BULK_LOAD_WORKERS, SNAPSHOT_DIR
+
+bulk_loader = startup_manager.lazy("bulk_loader", lambda: collection_manager.bulk_loader)
 
 router = APIRouter(prefix="/collection", tags=["Collection Management"])
 
@@ -224,4 +230,200 @@ async def switch_collection(collection_name: str):
             
     except Exception as e:
         logger.error(f"切换知识库API调用失败: {e}")
-        raise HTTPException(status_code=500, detail=f"切换知识库失败: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"切换知识库失败: {str(e)}")
+
+
+@router.post("/bulk_import", summary="从本地目录批量导入预先计算好的向量")
+def bulk_import(directory: str, collection_name: Optional[str] = None, collection_type: Optional[str] = None,
+                batch_size: int = BULK_LOAD_BATCH_SIZE, workers: int = BULK_LOAD_WORKERS):
+    """
+    从服务器本地目录批量导入向量数据（不经过向量模型）
+    
+    - directory 是 BULK_LOAD_DIR 下的相对路径
+    - 目录包含 manifest.json、scalars.parquet 和每个向量字段的 .npy 文件
+    - 集合不存在时按 collection_type 调用已有的建表方法创建
+    - 同步接口：批量插入耗时较长，由FastAPI放到线程池执行，不阻塞事件循环
+    """
+    try:
+        logger.info(f"收到批量导入请求: directory={directory}, collection_name={collection_name}")
+        path = resolve_directory(directory, BULK_LOAD_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = bulk_loader.import_directory(path, collection_name, collection_type, batch_size, workers)
+        return {
+            "success": True,
+            "message": f"成功导入 {result['row_count']} 行到知识库: {result['collection_name']}",
+            **result
+        }
+    except Exception as e:
+        logger.error(f"批量导入API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量导入失败: {str(e)}")
+
+
+@router.post("/bulk_export/{collection_name}", summary="把知识库批量导出到本地目录")
+def bulk_export(collection_name: str, directory: str, collection_type: Optional[str] = None,
+                batch_size: int = BULK_LOAD_BATCH_SIZE):
+    """
+    把知识库导出为 bulk_import 可直接使用的目录格式，用于克隆环境
+    
+    - directory 是 BULK_LOAD_DIR 下的相对路径
+    - 同步接口，在线程池中执行
+    """
+    try:
+        logger.info(f"收到批量导出请求: collection_name={collection_name}, directory={directory}")
+        path = resolve_directory(directory, BULK_LOAD_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = bulk_loader.export_collection(collection_name, path, collection_type, batch_size)
+        return {
+            "success": True,
+            "message": f"成功导出知识库 {collection_name}，共 {result['row_count']} 行",
+            **result
+        }
+    except Exception as e:
+        logger.error(f"批量导出API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量导出失败: {str(e)}")
+
+
+@router.post("/snapshot/{collection_name}", summary="为指定知识库创建快照")
+def snapshot_collection(collection_name: str, snapshot_dir: Optional[str] = None):
+    """
+    为知识库创建快照，用于快速回滚或在副本上做基准测试
+    
+    - 向量写入内存映射的float32文件，标量写入parquet列式文件
+    - 返回行数、耗时和吞吐
+    - 同步接口：全量导出耗时较长，由FastAPI放到线程池执行，不阻塞事件循环
+    """
+    try:
+        logger.info(f"收到创建知识库快照请求: collection_name={collection_name}, snapshot_dir={snapshot_dir}")
+        if snapshot_dir:
+            snapshot_dir = resolve_directory(snapshot_dir, SNAPSHOT_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = collection_manager.snapshot_collection(collection_name=collection_name, snapshot_dir=snapshot_dir)
+        
+        if result["success"]:
+            return result
+        else:
+            raise HTTPException(status_code=404, detail=result["message"])
+            
+    except Exception as e:
+        logger.error(f"创建知识库快照API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"创建知识库快照失败: {str(e)}")
+
+
+@router.post("/restore", summary="从快照恢复知识库")
+def restore_collection(snapshot_dir: str, collection_name: Optional[str] = None, overwrite: bool = False,
+                       workers: int = BULK_LOAD_WORKERS):
+    """
+    从快照恢复知识库
+    
+    - 按快照记录的字段结构和索引配置重建知识库，再并行批量插入
+    - overwrite=true 时先删除已存在的同名知识库
+    - 同步接口，在线程池中执行
+    """
+    try:
+        logger.info(f"收到恢复知识库请求: snapshot_dir={snapshot_dir}, collection_name={collection_name}, overwrite={overwrite}")
+        snapshot_dir = resolve_directory(snapshot_dir, SNAPSHOT_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = collection_manager.restore_collection(
+            snapshot_dir=snapshot_dir,
+            collection_name=collection_name,
+            overwrite=overwrite,
+            workers=workers
+        )
+        
+        if result["success"]:
+            return result
+        else:
+            raise HTTPException(status_code=400, detail=result["message"])
+            
+    except Exception as e:
+        logger.error(f"恢复知识库API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"恢复知识库失败: {str(e)}")
+
+
+@router.post("/migrate_to_ip/{collection_name}", summary="把知识库迁移为归一化向量+IP度量")
+def migrate_to_inner_product(collection_name: str, snapshot_dir: Optional[str] = None):
+    """
+    把COSINE/L2度量的知识库迁移为 单位向量 + IP度量
+    
+    - 先创建快照作为回滚点，返回的 rollback_snapshot_dir 可直接用于 /restore?overwrite=true 回滚
+    - 向量分批L2归一化后重建知识库，索引度量改为IP
+    - 同步接口，在线程池中执行
+    """
+    try:
+        logger.info(f"收到迁移知识库为IP度量请求: collection_name={collection_name}, snapshot_dir={snapshot_dir}")
+        if snapshot_dir:
+            snapshot_dir = resolve_directory(snapshot_dir, SNAPSHOT_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = collection_manager.migrate_to_inner_product(collection_name=collection_name, snapshot_dir=snapshot_dir)
+        
+        if result["success"]:
+            return result
+        else:
+            raise HTTPException(status_code=400, detail=result["message"])
+            
+    except Exception as e:
+        logger.error(f"迁移知识库API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"迁移知识库失败: {str(e)}")
+
+
+@router.get("/residency", summary="获取知识库加载驻留状态")
+async def get_residency():
+    """
+    获取当前已加载到查询节点内存的知识库
+    
+    - 返回内存预算、已用估算内存，以及每个知识库的估算内存和空闲时长
+    """
+    try:
+        return {
+            "success": True,
+            **residency_manager.status()
+        }
+    except Exception as e:
+        logger.error(f"获取知识库驻留状态API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取知识库驻留状态失败: {str(e)}")
+
+
+@router.post("/load/{collection_name}", summary="加载指定知识库")
+async def load_collection(collection_name: str):
+    """
+    按需加载知识库并预热，超出内存预算时按LRU释放最久未使用的知识库
+    """
+    try:
+        logger.info(f"收到加载知识库请求: collection_name={collection_name}")
+        residency_manager.ensure_loaded(collection_name)
+        return {
+            "success": True,
+            "message": f"成功加载知识库: {collection_name}",
+            **residency_manager.status()
+        }
+    except Exception as e:
+        logger.error(f"加载知识库API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"加载知识库失败: {str(e)}")
+
+
+@router.post("/release/{collection_name}", summary="释放指定知识库")
+async def release_collection(collection_name: str):
+    """
+    释放知识库占用的查询节点内存，下次使用时自动重新加载
+    """
+    try:
+        logger.info(f"收到释放知识库请求: collection_name={collection_name}")
+        residency_manager.release(collection_name)
+        return {
+            "success": True,
+            "message": f"成功释放知识库: {collection_name}",
+            **residency_manager.status()
+        }
+    except Exception as e:
+        logger.error(f"释放知识库API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"释放知识库失败: {str(e)}")
@@ -2,13 +2,14 @@ from fastapi import APIRouter, HTTPException
 from loguru import logger
 from typing import Dict, Any, List
 
-from ..entitys.Dele_File import DeleFileRequest, DeleFileResponse, DeleFileResponseData
+from ..entitys.Dele_File import DeleFileRequest, DeleFilesRequest, DeleFileResponse, DeleFileResponseData
 from ..Utils.milvus_utils import My_MilvusClient
+from ..Utils.Startup import startup_manager
 
 router = APIRouter(prefix="/delete", tags=["Delete Operations"])
 
 # 创建Milvus客户端实例
-milvus_client = My_MilvusClient()
+milvus_client = startup_manager.lazy("delete_endpoints.milvus_client", My_MilvusClient, stage=1)
 
 
 class FileDeleterAPI:
@@ -30,14 +31,11 @@ class FileDeleterAPI:
         try:
             logger.info(f"开始删除文件ID: {file_id}")
             
-            # 首先查询该文件ID是否存在
-            existing_docs = self.milvus_client.client.query(
-                collection_name=self.milvus_client.collection_name,
-                filter=f'file_id == "{file_id}"',
-                output_fields=["id", "file_id", "file_name"]
-            )
+            # 直接按表达式删除，删除数量以Milvus返回结果为准
+            result = self.milvus_client.delete_by_file_ids([file_id])
+            deleted_count = result["delete_count"]
             
-            if not existing_docs:
+            if deleted_count == 0:
                 logger.warning(f"文件ID {file_id} 不存在")
                 return {
                     "success": False,
@@ -46,27 +44,16 @@ class FileDeleterAPI:
                     "file_id": file_id
                 }
             
-            # 获取要删除的文档ID列表
-            doc_ids = [doc["id"] for doc in existing_docs]
-            file_name = existing_docs[0].get("file_name", "未知文件")
-            
-            logger.info(f"找到 {len(doc_ids)} 个文档需要删除，文件名: {file_name}")
-            
-            # 执行删除操作
-            delete_result = self.milvus_client.client.delete(
-                collection_name=self.milvus_client.collection_name,
-                pks=doc_ids
-            )
-            
-            logger.info(f"删除操作完成，删除结果: {delete_result}")
+            file_name = result["file_names"].get(file_id) or "未知文件"
+            logger.info(f"删除操作完成，共删除 {deleted_count} 个文档，文件名: {file_name}")
             
             return {
                 "success": True,
                 "message": f"成功删除文件 {file_name} (ID: {file_id})",
-                "deleted_count": len(doc_ids),
+                "deleted_count": deleted_count,
                 "file_id": file_id,
                 "file_name": file_name,
-                "delete_result": delete_result
+                "delete_result": result["delete_result"]
             }
             
         except Exception as e:
@@ -78,6 +65,57 @@ class FileDeleterAPI:
                 "file_id": file_id
             }
     
+    def delete_files_by_ids(self, file_ids: List[str]) -> Dict[str, Any]:
+        """
+        批量删除多个文件ID的文档，只发起一次删除调用
+        
+        Args:
+            file_ids: 要删除的文件ID列表
+            
+        Returns:
+            Dict[str, Any]: 删除结果
+        """
+        try:
+            logger.info(f"开始批量删除文件ID: {file_ids}")
+            
+            result = self.milvus_client.delete_by_file_ids(file_ids)
+            deleted_count = result["delete_count"]
+            
+            if deleted_count == 0:
+                logger.warning(f"文件ID {file_ids} 均不存在")
+                return {
+                    "success": False,
+                    "message": f"文件ID {file_ids} 均不存在",
+                    "deleted_count": 0,
+                    "file_ids": file_ids
+                }
+            
+            # file_names 只包含删除前确实存在的文件ID
+            deleted_file_ids = list(result["file_names"].keys())
+            missing_file_ids = result["missing_file_ids"]
+            logger.info(f"批量删除完成，共删除 {len(deleted_file_ids)} 个文件、{deleted_count} 个文档")
+            if missing_file_ids:
+                logger.warning(f"以下文件ID不存在: {missing_file_ids}")
+            
+            return {
+                "success": True,
+                "message": f"成功删除 {len(deleted_file_ids)} 个文件",
+                "deleted_count": deleted_count,
+                "file_ids": deleted_file_ids,
+                "file_names": result["file_names"],
+                "missing_file_ids": missing_file_ids,
+                "delete_result": result["delete_result"]
+            }
+            
+        except Exception as e:
+            logger.error(f"批量删除文件ID {file_ids} 时发生错误: {e}")
+            return {
+                "success": False,
+                "message": f"删除失败: {str(e)}",
+                "deleted_count": 0,
+                "file_ids": file_ids
+            }
+    
     def list_all_files(self) -> Dict[str, Any]:
         """
         列出所有文件信息
@@ -211,6 +249,41 @@ async def delete_file(request: DeleFileRequest):
         raise HTTPException(status_code=500, detail=f"删除文件失败: {str(e)}")
 
 
+@router.post("/files", summary="批量删除多个文件ID的文档", response_model=DeleFileResponse)
+async def delete_files(request: DeleFilesRequest):
+    """
+    批量删除多个文件ID的所有文档
+    
+    - 通过一次表达式删除完成，不再逐个查询主键
+    - 删除数量以Milvus返回结果为准
+    """
+    try:
+        logger.info(f"收到批量删除文件请求: file_ids={request.file_ids}")
+        
+        result = file_deleter.delete_files_by_ids(request.file_ids)
+        
+        if result["success"]:
+            return DeleFileResponse(
+                status=True,
+                message=result["message"],
+                data=DeleFileResponseData(
+                    status=f"文件删除成功，共删除 {result['deleted_count']} 个文档"
+                )
+            )
+        else:
+            return DeleFileResponse(
+                status=False,
+                message=result["message"],
+                data=DeleFileResponseData(
+                    status="文件删除失败"
+                )
+            )
+            
+    except Exception as e:
+        logger.error(f"批量删除文件API调用失败: {e}")
+        raise HTTPException(status_code=500, detail=f"删除文件失败: {str(e)}")
+
+
 @router.get("/files", summary="列出所有文件")
 async def list_files():
     """
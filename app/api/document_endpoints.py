@@ -5,14 +5,15 @@ from ..Utils.excel_processor import ExcelProcessor
 from ..Utils.rag_pipeline import RAGPipeline
 from ..entitys.models import DocumentUploadResponse
 from ..Utils.Documents_Utils import DocumentUtils
+from ..Utils.Startup import startup_manager
 
 
 router = APIRouter(prefix="/document", tags=["Document Operations"])
 
 # 全局实例
 excel_processor = ExcelProcessor()
-rag = RAGPipeline()
-DocUtils = DocumentUtils()
+rag = startup_manager.lazy("document_endpoints.rag", RAGPipeline)
+DocUtils = startup_manager.lazy("document_endpoints.doc_utils", DocumentUtils)
 
 
 @router.post("/New_Upload", summary="上传并解析Excel文档_NEW", response_model=DocumentUploadResponse)
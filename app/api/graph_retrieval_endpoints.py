@@ -3,12 +3,13 @@ from ast import Mult
 from fastapi import APIRouter, HTTPException
 from ..entitys.GraphS import GraphRequestbyFileId, GraphResponsebyFileId, MultiStepRequest, MultiStepItem, MultiStepResponse # Reuse your existing models
 from ..Utils.rag_pipeline import RAGPipeline
+from ..Utils.Startup import startup_manager
 from loguru import logger
 from typing import List
 
 router = APIRouter(prefix="/graph_retrieval", tags=["graph_retrieval"])
 
-rag_pipeline = RAGPipeline()  # Initialize the pipeline
+rag_pipeline = startup_manager.lazy("graph_retrieval_endpoints.rag_pipeline", RAGPipeline)  # Initialize the pipeline
 
 @router.post("/by_file_id", response_model=GraphResponsebyFileId)
 async def graph_retrieval_by_file_id(request: GraphRequestbyFileId) -> GraphResponsebyFileId:
@@ -1,18 +1,29 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from ..entitys.models import StatusResponse
 from ..entitys.ResMilvusId import MilVusInfo
 from ..Utils.milvus_utils import My_MilvusClient
+from ..Utils.Startup import startup_manager
 from typing import Dict, Any, List
 from loguru import logger
 router = APIRouter(tags=["Health Check"])
 
 # 创建Milvus客户端实例
-milvus_client = My_MilvusClient()
+milvus_client = startup_manager.lazy("health_endpoints.milvus_client", My_MilvusClient, stage=1)
 
 @router.get("/health", summary="Health check endpoint", response_model=StatusResponse)
 async def health_check():
+    """存活探针：进程能响应即返回，不等待模型和Milvus加载"""
     return StatusResponse(status="healthy")
 
+@router.get("/ready", summary="Readiness check endpoint")
+async def readiness_check():
+    """
+    就绪探针：模型、Milvus连接等组件全部创建完成，且预热推理和检索成功后返回200，否则返回503
+    """
+    status = startup_manager.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @router.get("/milvus/collection/info", summary="获取Milvus Collection详细信息",response_model=MilVusInfo)
 async def get_collection_info() -> MilVusInfo :
     """
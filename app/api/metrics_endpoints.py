@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..Utils.Metrics import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", summary="Prometheus指标", response_class=PlainTextResponse)
+async def get_metrics():
+    """以 Prometheus 文本格式导出分阶段耗时、批大小、缓存命中和请求合并指标"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
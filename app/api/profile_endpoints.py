@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from ..Utils.Profiler import profiler
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"])
+
+
+@router.get("", summary="最近的请求剖析结果")
+async def list_profiles(limit: int = Query(50, ge=1, le=1000)):
+    """按时间倒序列出最近保存的请求剖析结果（ID、接口、状态码、耗时、样本数），不含调用栈"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="请求剖析未开启（PROFILE_ENABLED）")
+    try:
+        return {"enabled": profiler.enabled, "header": profiler.header, "profiles": profiler.list_profiles(limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{profile_id}", summary="获取请求剖析结果")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|collapsed)$")):
+    """
+    format=json 返回元数据和 {折叠栈: 样本数}；format=collapsed 返回折叠栈文本，
+    可直接用 flamegraph.pl 或 speedscope 生成火焰图
+    """
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="请求剖析未开启（PROFILE_ENABLED）")
+    result = profiler.get_profile(profile_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"剖析结果不存在: {profile_id}")
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed(result))
+    return result
@@ -4,6 +4,10 @@ from loguru import logger
 import os
 
 from ..Utils.rag_pipeline import RAGPipeline
+from ..Utils.Startup import startup_manager
+from ..Utils.Query_Cache import query_cache
+from ..Utils.Single_Flight import single_flight
+from ..Utils.Sequence_Length import token_limit
 from ..entitys.models import (
     IngestRequest, QueryRequest, QueryResponse, 
     RecallRequest, RecallResponse, RecallItem,
@@ -18,7 +22,7 @@ DEFAULT_MODEL = os.getenv("DEEPSEEK_MODEL", "DeepSeek-R1-Distill-Qwen-32B")
 router = APIRouter(prefix="/rag", tags=["RAG Operations"])
 
 # 全局RAG实例
-rag = RAGPipeline()
+rag = startup_manager.lazy("rag_endpoints.rag", RAGPipeline)
 
 @router.post("/ingest", summary="Ingest documents into the RAG system",deprecated=True)
 async def ingest_documents(request: IngestRequest):
@@ -39,9 +43,15 @@ async def query_rag(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/recall", summary="召回检索内容和相似度分数", response_model=RecallResponse)
-async def recall(request: RecallRequest):
+@single_flight.coalesce("/rag/recall")
+def recall(request: RecallRequest):
     try:
-        query_embedding = rag.embedding_model.encode([request.question])[0]
+        cached, query_embedding = query_cache.lookup(
+            "/rag/recall", request.question,
+            lambda: rag.embedding_model.encode([request.question], max_length=token_limit("query", "/rag/recall"))[0]
+        )
+        if cached is not None:
+            return cached
         
         # 初始检索：获取更多候选文档
         initial_top_k = INITIAL_RETRIEVAL_TOP_K if rag.reranker else 5
@@ -55,7 +65,9 @@ async def recall(request: RecallRequest):
         else:
             formatted = [RecallItem(content=text, score=score) for text, score in results]
         
-        return RecallResponse(Recall_Content=formatted)
+        response = RecallResponse(Recall_Content=formatted)
+        query_cache.put("/rag/recall", request.question, response, embedding=query_embedding)
+        return response
     except Exception as e:
         logger.error(f"Recall endpoint error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,9 +2,12 @@ from fastapi import APIRouter, HTTPException
 from loguru import logger
 import time
 import uuid
-from ..Utils.reranker_utils import RerankerModel
+from ..Utils.reranker_utils import reranker_model
 from ..Utils.milvus_utils_v2 import My_MilvusClient
 from ..Utils.rag_pipeline import RAGPipeline
+from ..Utils.Startup import startup_manager
+from ..Utils.Query_Cache import query_cache
+from ..Utils.Lexical_Index import lexical_index
 from ..entitys.Rerank import(
     ComponentInfo,
     ComponentResult,
@@ -15,20 +18,23 @@ from ..entitys.Rerank import(
     RerankBatchResponse,
     RerankResponse_Componets
 )
-from ..config import USE_RERANKER, RERANKER_TOP_K, INITIAL_RETRIEVAL_TOP_K
+from ..config import USE_RERANKER, RERANKER_TOP_K, INITIAL_RETRIEVAL_TOP_K, INFERENCE_MODE
 from ..Utils.System_Recogni import system_recogni
 from ..Utils.Components_Recogni import components_recogni
-from ..Utils.Mutil_Retrieval import Multi_Retrieval_withfile_id, Multi_Retrieval_withoutfile_id
+from ..Utils.Mutil_Retrieval import Multi_Retrieval_withfile_id, Multi_Retrieval_withoutfile_id, retrieval_metric_type
+from ..Utils.Single_Flight import single_flight
+from ..Utils.Sequence_Length import token_limit
 
 
 router = APIRouter(prefix="/rerank", tags=["Rerank Operations"])
 
-rag = RAGPipeline()
-Milvus_Components = My_MilvusClient()
-reranker = RerankerModel()
+rag = startup_manager.lazy("rerank_endpoints.rag", RAGPipeline)
+Milvus_Components = startup_manager.lazy("rerank_endpoints.milvus_components", My_MilvusClient)
+reranker = reranker_model
 
 @router.post("/rerank_by_file_id", summary="根据文件ID重排查询", response_model=RerankResponse)
-async def rerank_by_file_id(request: RerankRequest):
+@single_flight.coalesce("/rerank/rerank_by_file_id")
+def rerank_by_file_id(request: RerankRequest):
     """
     根据文件ID重排查询
     
@@ -47,7 +53,7 @@ async def rerank_by_file_id(request: RerankRequest):
         logger.info(f"开始重排查询 {query_id}: {request.question}")
          # 初始检索
         retrieval_start = time.time()
-        query_embedding = rag.embedding_model.encode([request.question])[0]
+        query_embedding = rag.embedding_model.encode([request.question], max_length=token_limit("query", "/rerank/rerank_by_file_id"))[0]
         initial_top_k = request.initial_top_k or INITIAL_RETRIEVAL_TOP_K
         if request.file_id:
             effective_file_id = request.file_id
@@ -88,7 +94,8 @@ async def rerank_by_file_id(request: RerankRequest):
 
 
 @router.post("/Retrieval_In_Componets_Table", summary="组件信息表查询", response_model=RerankResponse_Componets)
-async def rerank_in_componets_table(request: RerankRequest):
+@single_flight.coalesce("/rerank/Retrieval_In_Componets_Table")
+def rerank_in_componets_table(request: RerankRequest):
     question = request.question
     """
     question:
@@ -158,7 +165,7 @@ async def rerank_in_componets_table(request: RerankRequest):
         # 3️⃣ 重排处理
         rerank_start = time.time()
         if use_reranker:
-            reranked_results = reranker.rerank_components(initial_results, top_k)
+            reranked_results = reranker.rerank_components(initial_results, top_k, metric_type=retrieval_metric_type())
         else:
             reranked_results = {
                 query: [(comp, score, score) for comp, score in components]
@@ -201,7 +208,8 @@ async def rerank_in_componets_table(request: RerankRequest):
         
 
 @router.post("/single", summary="单次重排查询", response_model=RerankResponse)
-async def rerank_single(request: RerankRequest):
+@single_flight.coalesce("/rerank/single")
+def rerank_single(request: RerankRequest):
     """
     对单个查询进行重排
     
@@ -227,11 +235,21 @@ async def rerank_single(request: RerankRequest):
             if not effective_file_id:
                 raise HTTPException(status_code=404, detail=f"未找到文件 {request.file_name}")
         
-        # 初始检索
-        retrieval_start = time.time()
-        query_embedding = rag.embedding_model.encode([request.question])[0]
+        # 查询缓存（精确匹配 + 语义匹配）
         initial_top_k = request.initial_top_k or INITIAL_RETRIEVAL_TOP_K
+        top_k = request.top_k or RERANKER_TOP_K
+        cache_scope = dict(file_id=effective_file_id, top_k=top_k, filters=(initial_top_k, request.file_name))
+        retrieval_start = time.time()
+        cached, query_embedding = query_cache.lookup(
+            "/rerank/single", request.question,
+            lambda: rag.embedding_model.encode([request.question], max_length=token_limit("query", "/rerank/single"))[0],
+            **cache_scope
+        )
+        if cached is not None:
+            logger.info(f"重排查询 {query_id} 命中缓存")
+            return cached.model_copy(update={"question": request.question, "total_time_ms": (time.time() - start_time) * 1000})
 
+        # 初始检索
         if effective_file_id:
             initial_results = rag.milvus_client.search_similar_in_file(query_embedding, file_id=effective_file_id, top_k=initial_top_k)
         else:
@@ -245,7 +263,7 @@ async def rerank_single(request: RerankRequest):
         reranked_results = rag.reranker.rerank_with_scores(
             request.question, 
             initial_results, 
-            top_k=request.top_k or RERANKER_TOP_K
+            top_k=top_k
         )
         rerank_time = (time.time() - rerank_start) * 1000
         
@@ -255,7 +273,7 @@ async def rerank_single(request: RerankRequest):
         rerank_results  = list(text,score)
         '''    
         rerank_results = [RerankItem(content=text, rerank_score=score, initial_score=initial_score,file_id=effective_file_id,file_name=request.file_name) for text, score,initial_score in reranked_results]
-        return RerankResponse(
+        response = RerankResponse(
             question=request.question,
             total_documents=len(initial_results),
             reranked_documents=len(reranked_results),
@@ -264,6 +282,8 @@ async def rerank_single(request: RerankRequest):
             total_time_ms=retrieval_time + rerank_time,
             results=rerank_results
         )
+        query_cache.put("/rerank/single", request.question, response, embedding=query_embedding, **cache_scope)
+        return response
     except Exception as e:
         logger.error(f"重排查询失败: {e}")
         raise HTTPException(status_code=500, detail=f"重排查询失败: {str(e)}")
@@ -271,13 +291,14 @@ async def rerank_single(request: RerankRequest):
 
 
 @router.post("/batch", summary="批量重排查询", response_model=RerankBatchResponse , deprecated=True)
-async def rerank_batch(request: RerankBatchRequest):
+def rerank_batch(request: RerankBatchRequest):
     """
     批量重排查询
     
     - 支持多个问题同时处理
     - 提高处理效率
     - 返回批量处理统计信息
+    - 同步接口：逐个调用会阻塞等待的 rerank_single，由FastAPI放到线程池执行，不占用事件循环
     """
     try:
         batch_start_time = time.time()
@@ -302,7 +323,7 @@ async def rerank_batch(request: RerankBatchRequest):
                 )
                 
                 # 调用单个重排
-                single_response = await rerank_single(single_request)
+                single_response = rerank_single(single_request)
                 batch_results.append(single_response)
                 processed_count += 1
                 
@@ -337,6 +358,7 @@ async def get_rerank_status():
         status = {
             "reranker_enabled": USE_RERANKER,
             "reranker_loaded": rag.reranker is not None,
+            "inference_mode": INFERENCE_MODE,
             "reranker_device": str(rag.reranker.device) if rag.reranker else None,
             "reranker_model_info": {
                 "model_name": "bge-reranker-large",
@@ -353,6 +375,10 @@ async def get_rerank_status():
                 "reranker_top_k": RERANKER_TOP_K,
                 "initial_retrieval_top_k": INITIAL_RETRIEVAL_TOP_K
             },
+            "query_cache": query_cache.stats(),
+            "lexical_index": lexical_index.stats(),
+            "rerank_cascade": reranker.cascade_stats(),
+            "request_coalescing": single_flight.stats(),
             "service_status": "healthy" if rag.reranker else "unavailable"
         }
         
@@ -12,20 +12,23 @@ from fastapi import APIRouter, HTTPException, APIRouter
 from loguru import logger
 import time
 import uuid
-from ..Utils.reranker_utils import RerankerModel
+from ..Utils.reranker_utils import reranker_model
 from ..Utils.System_Recogni import system_recogni
 from ..Utils.Components_Recogni import components_recogni
 from ..services.Muti_Retrieval_Service import Muti_Retrieval_Service
 from ..Utils.TransactionStepParse import transactionStepParse
 from ..services.MultiTransactionRetrieval import MultiTransactionRetrieval
+from ..Utils.Single_Flight import single_flight
+from ..logger import summarize, log_verbose
 
-reranker = RerankerModel()
+reranker = reranker_model
 router = APIRouter(prefix = "/retrieval_v2", tags = ["Retrieval API v2"])
 service = Muti_Retrieval_Service()
 multiTransactionRetrieval = MultiTransactionRetrieval()
 
 @router.post("/retrieval", summary="检索召回", response_model=RerankResponse_Componets_v2)
-async def retrieval(request: RerankRequest):
+@single_flight.coalesce("/retrieval_v2/retrieval")
+def retrieval(request: RerankRequest):
     question = request.question
     file_id = request.file_id
     top_k = request.top_k
@@ -57,7 +60,7 @@ async def retrieval(request: RerankRequest):
             initial_results =  service.Multi_Retrieval_withfile_id(components = components, system_name = system_name, file_id = file_id, filter_score = filter_score, top_k = initial_top_k)
         else:
             initial_results =  service.Multi_Retrieval_withoutfile_id(components = components, system_name = system_name, filter_score = filter_score, top_k = initial_top_k)
-        logger.info(f"Initial Results: {initial_results}")
+        log_verbose("Initial Results: {}", summarize(initial_results))
         retrieval_end_time = time.time()
         reranke_start_time = time.time()
         if use_reranker:
@@ -103,7 +106,8 @@ async def retrieval(request: RerankRequest):
 
 #交易名称召回
 @router.post("/transaction_retrieval", summary="交易名称召回", response_model=RerankResponse_Transaction_v2)
-async def transaction_retrieval(request: RerankRequest):
+@single_flight.coalesce("/retrieval_v2/transaction_retrieval")
+def transaction_retrieval(request: RerankRequest):
     question = request.question
     file_id = request.file_id
     top_k = request.top_k
@@ -125,7 +129,7 @@ async def transaction_retrieval(request: RerankRequest):
             initial_results = multiTransactionRetrieval.multiTransactionRetrieval(steps = steps, file_id = file_id, top_k = initial_top_k, filter_score = filter_score)
         else:
             initial_results = multiTransactionRetrieval.multiTransactionRetrievalNoFileId(steps = steps, top_k = initial_top_k, filter_score = filter_score)
-        logger.info(f"Initial Results: {initial_results}")
+        log_verbose("Initial Results: {}", summarize(initial_results))
         retrieval_end_time = time.time()
         reranke_start_time = time.time()
         if use_reranker:
@@ -11,6 +11,12 @@ RERANKER_MODEL_PATH = os.getenv("RERANKER_MODEL_PATH", "/app/models/bge-reranker
 DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "http://192.168.242.193:8100/v1/chat/completions")
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "DeepSeek-R1-Distill-Qwen-32B")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "")  # 额外写入的日志文件，为空则只输出到stderr
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"  # 日志文件是否按JSON结构化输出
+LOG_ENQUEUE = os.getenv("LOG_ENQUEUE", "true").lower() == "true"  # 日志由后台线程异步写出
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # 完整检索结果等大块日志的采样率
+LOG_MAX_ITEMS = int(os.getenv("LOG_MAX_ITEMS", "5"))  # 日志摘要中列表/字典最多展示的条目数
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "500"))  # 日志摘要的最大字符数
 HF_ENDPOINT = os.getenv("HF_ENDPOINT", "https://hf-mirror.com")  # Add mirror endpoint
 
 # GPU配置 - 按照用户需求
@@ -27,6 +33,97 @@ USE_RERANKER = os.getenv("USE_RERANKER", "true").lower() == "true"  # 是否启
 RERANKER_TOP_K = int(os.getenv("RERANKER_TOP_K", "5"))  # 重排后返回的文档数量
 INITIAL_RETRIEVAL_TOP_K = int(os.getenv("INITIAL_RETRIEVAL_TOP_K", "10"))  # 初始检索的文档数量
 
+# 级联重排配置：先用初始检索分数和名称相似度预打分，只有介于两个阈值之间的候选才交给重排模型
+RERANK_CASCADE_ENABLED = os.getenv("RERANK_CASCADE_ENABLED", "true").lower() == "true"  # 是否启用级联重排
+RERANK_CASCADE_ACCEPT = float(os.getenv("RERANK_CASCADE_ACCEPT", "0.97"))  # 预打分不低于该值的候选直接采纳，不经过重排模型
+RERANK_CASCADE_REJECT = float(os.getenv("RERANK_CASCADE_REJECT", "0.0"))  # 预打分低于该值的候选直接排在最后，不经过重排模型
+RERANK_CASCADE_BAND_SIZE = int(os.getenv("RERANK_CASCADE_BAND_SIZE", "0"))  # 每个查询最多交给重排模型的候选数（按预打分取前N），0表示不限
+RERANK_CASCADE_SHADOW_RATE = float(os.getenv("RERANK_CASCADE_SHADOW_RATE", "0"))  # 按比例对跳过了候选的查询再做一次完整重排，统计与级联结果的一致率
+
+# 向量化/入库批处理配置
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # 按长度分桶后每批编码的文本数量
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "8192"))  # 文本向量LRU缓存条数，0表示关闭
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true"  # 编码时输出L2归一化向量，相似度计算退化为点积
+VECTOR_METRIC_TYPE = "IP" if EMBEDDING_NORMALIZE else "COSINE"  # 新建知识库的向量度量；向量已归一化时IP与COSINE排序和分数一致
+MILVUS_INSERT_BATCH_SIZE = int(os.getenv("MILVUS_INSERT_BATCH_SIZE", "1000"))  # 每次调用Milvus insert的最大行数
+BULK_LOAD_BATCH_SIZE = int(os.getenv("BULK_LOAD_BATCH_SIZE", "5000"))  # 离线批量导入/导出每批行数
+BULK_LOAD_WORKERS = int(os.getenv("BULK_LOAD_WORKERS", "4"))  # 离线批量导入并行线程数
+BULK_LOAD_DIR = os.getenv("BULK_LOAD_DIR", "./bulk_data")  # 接口批量导入/导出允许读写的根目录，请求中的目录按其相对路径解析
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")  # 知识库快照默认保存目录
+
+# 推理序列长度配置：整批分词后按实际token长度排序分桶，每桶只padding到桶内最长序列
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", "512"))  # 向量模型单条输入的最大token数（含特殊token）
+RERANKER_MAX_LENGTH = int(os.getenv("RERANKER_MAX_LENGTH", "512"))  # 重排模型单个查询-文档对的最大token数（含特殊token）
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "32"))  # 重排时按长度分桶后每批的查询-文档对数量
+TOKEN_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (item.split("=", 1) for item in os.getenv("TOKEN_LIMITS", "").split(",") if "=" in item)
+}  # 按用途/字段的截断token数，如 query=64,passage=256,组件名称=32；可加接口前缀单独配置，如 /rerank/single:query=32；未配置的只受模型上限约束
+
+# 知识库驻留（加载/释放）配置
+COLLECTION_MEMORY_BUDGET_MB = int(os.getenv("COLLECTION_MEMORY_BUDGET_MB", "4096"))  # 已加载知识库的估算内存预算
+COLLECTION_PINNED = [name.strip() for name in os.getenv("COLLECTION_PINNED", MILVUS_COLLECTION).split(",") if name.strip()]  # 常驻不释放的知识库
+COLLECTION_LOAD_CHECK_SECONDS = float(os.getenv("COLLECTION_LOAD_CHECK_SECONDS", "1"))  # 已加载的知识库距上次确认超过该时间时重新读取加载状态（可能已被其他工作进程/副本释放），0表示每次检索都确认
+COLLECTION_SCHEMA_TTL_SECONDS = float(os.getenv("COLLECTION_SCHEMA_TTL_SECONDS", "60"))  # 缓存的知识库索引度量的有效期，过期后重新读取其他进程的改动，0表示不过期
+
+# 检索结果语义缓存配置
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))  # 缓存条数上限，超出按LRU淘汰
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "600"))  # 缓存有效期，0表示不过期
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0"))  # 语义命中的最低余弦相似度，默认0只做精确匹配；名称相近的查询（如 查询二类账户编号/查询三类账户编号）相似度也很高，开启需谨慎
+
+# 词法索引配置（组件名称/交易名称的精确匹配 + BM25，与向量检索融合）
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"  # 是否启用内存词法索引
+LEXICAL_INDEX_COLLECTIONS = [name.strip() for name in os.getenv("LEXICAL_INDEX_COLLECTIONS", "Component_Table").split(",") if name.strip()]  # 建立词法索引的知识库
+LEXICAL_EXACT_SHORTCUT = os.getenv("LEXICAL_EXACT_SHORTCUT", "true").lower() == "true"  # 名称精确命中时跳过向量化和向量检索
+LEXICAL_FUSION_WEIGHT = float(os.getenv("LEXICAL_FUSION_WEIGHT", "1.0"))  # 倒数排名融合中词法召回相对向量召回的权重，0表示不融合
+LEXICAL_RRF_K = int(os.getenv("LEXICAL_RRF_K", "60"))  # 倒数排名融合的平滑常数
+LEXICAL_MAX_DF_RATIO = float(os.getenv("LEXICAL_MAX_DF_RATIO", "0.1"))  # BM25跳过出现在超过该比例文档中的词项（每个交易系统至少保留256篇以内的词项）
+LEXICAL_INDEX_TTL_SECONDS = float(os.getenv("LEXICAL_INDEX_TTL_SECONDS", "300"))  # 词法索引建立后的有效期，过期后在后台从Milvus重建以包含其他工作进程/副本的写入，0表示不过期
+
+# 混合检索配置（稠密向量 + 入库时本地计算的BM25稀疏向量，Milvus hybrid_search 按RRF融合）
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"  # 新建的组件表增加稀疏向量字段，检索时做混合检索
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))  # 混合检索倒数排名融合的平滑常数
+
+# 指标配置
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # 是否记录分阶段耗时并开放 /metrics
+
+# 流量录制配置（录制结果用 python -m benchmarks.replay 回放）
+TRAFFIC_RECORD_FILE = os.getenv("TRAFFIC_RECORD_FILE", "")  # 录制的JSONL文件，为空则不录制
+TRAFFIC_RECORD_PATHS = [path.strip() for path in os.getenv("TRAFFIC_RECORD_PATHS", "/rerank,/retrieval_v2,/TransactionRetrieval,/DataItem_retrieval,/graph").split(",") if path.strip()]  # 只录制这些前缀的接口
+TRAFFIC_RECORD_SAMPLE_RATE = float(os.getenv("TRAFFIC_RECORD_SAMPLE_RATE", "1.0"))  # 录制采样率
+TRAFFIC_RECORD_MAX_BODY_BYTES = int(os.getenv("TRAFFIC_RECORD_MAX_BODY_BYTES", "65536"))  # 超过该大小的请求体只记录元数据
+
+# 请求级采样剖析配置（结果通过 /profiles 查看）
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"  # 是否允许剖析请求（请求头触发或按采样率）；结果含源码路径和调用栈，只在排查时开启
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")  # 带该请求头（值为1/true）的请求会被剖析
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 按比例随机剖析请求，0表示只按请求头
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))  # 调用栈采样间隔
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")  # 剖析结果保存目录
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))  # 最多保留的剖析结果数，超出时删除最早的
+
+# 启动配置
+STARTUP_WORKERS = int(os.getenv("STARTUP_WORKERS", "4"))  # 后台并行创建组件的线程数
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "10"))  # 组件创建或预热失败（如Milvus不可用）后的重试间隔
+
+# 模型预热/编译配置
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"  # 关闭时只用单条短文本做连通性预热
+MODEL_WARMUP_BATCH_SIZES = [int(size) for size in os.getenv("MODEL_WARMUP_BATCH_SIZES", "1,8,32").split(",") if size.strip()]  # 预热的批大小
+MODEL_WARMUP_SEQ_LENGTHS = [int(size) for size in os.getenv("MODEL_WARMUP_SEQ_LENGTHS", "32,128,512").split(",") if size.strip()]  # 预热的序列长度分桶
+MODEL_COMPILE = os.getenv("MODEL_COMPILE", "none").lower()  # CPU推理图编译：none / torch_compile / torchscript，编译失败自动回退eager
+
+# 多进程部署配置（python main.py --workers N）
+WORKERS = int(os.getenv("WORKERS", "1"))  # 工作进程数，大于1时主进程先加载模型再fork，子进程写时复制共享权重
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))  # 每个工作进程的torch计算线程数，0表示CPU核数/工作进程数
+PRELOAD_COMPONENTS = [name.strip() for name in os.getenv("PRELOAD_COMPONENTS", "embedding_model,reranker_model").split(",") if name.strip()]  # fork前在主进程中创建的组件，只放模型，Milvus连接不能跨fork共享
+
+# 进程外推理池配置（python -m app.Utils.Inference_Pool --model embedding|reranker）
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local").lower()  # local：模型在API进程内加载；pool：通过Unix socket调用独立推理进程
+INFERENCE_SOCKET_DIR = os.getenv("INFERENCE_SOCKET_DIR", "/tmp/rag-inference")  # 推理进程socket目录，文件名为 <模型>-<编号>.sock
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))  # 每个模型默认启动的推理进程数
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "64"))  # 推理进程跨请求合批的最大条数
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "2"))  # 合批时等待后续请求的最长时间
+
 
 
 
@@ -88,4 +185,8 @@ EDGES = [
 ]
 
 # 相似度阈值
-SIMILARITY_THRESHOLD = 0.7  # 用于判断RAG召回有效性
\ No newline at end of file
+SIMILARITY_THRESHOLD = 0.7  # 用于判断RAG召回有效性
+
+# 操作图序列生成配置
+GRAPH_SEQUENCE_CACHE_SIZE = int(os.getenv("GRAPH_SEQUENCE_CACHE_SIZE", "4096"))  # 按 (起点, 最大长度, 最小概率) 缓存生成的序列条数，0表示不缓存
+GRAPH_TOP_K_PATHS = int(os.getenv("GRAPH_TOP_K_PATHS", "3"))  # top_k_sequences 默认返回的路径数
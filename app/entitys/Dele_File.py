@@ -5,6 +5,10 @@ class DeleFileRequest(BaseModel):
     id: str = Field(..., description="知识库ID")
     file_id: str = Field(..., description="文件ID")
 
+class DeleFilesRequest(BaseModel):
+    id: str = Field(..., description="知识库ID")
+    file_ids: List[str] = Field(..., description="文件ID列表")
+
 class DeleFileResponseData(BaseModel):
     status: str = Field(..., description="文件删除成功/文件删除失败")
 
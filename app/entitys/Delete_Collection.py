@@ -23,6 +23,7 @@ class CollectionInfo(BaseModel):
     document_count: int = Field(..., description="文档数量")
     description: str = Field("", description="知识库描述")
     is_current: bool = Field(False, description="是否为当前使用的知识库")
+    is_loaded: bool = Field(False, description="是否已加载到查询节点内存")
 
 class ListCollectionsResponse(BaseModel):
     success: bool = Field(..., description="操作是否成功")
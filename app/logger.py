@@ -1,8 +1,69 @@
 from loguru import logger
+import random
 import sys
-from .config import LOG_LEVEL
+from numbers import Number
+from typing import Any
+import numpy as np
+from .config import LOG_LEVEL, LOG_FILE, LOG_JSON, LOG_ENQUEUE, LOG_SAMPLE_RATE, LOG_MAX_ITEMS, LOG_MAX_CHARS
 
 def setup_logger():
     logger.remove()  # Clear default handlers
-    logger.add(sys.stderr, level=LOG_LEVEL, format="{time} {level} {message}")
-    return logger
\ No newline at end of file
+    # enqueue=True：格式化后的记录交给后台线程写出，请求线程不等待I/O
+    logger.add(sys.stderr, level=LOG_LEVEL, format="{time} {level} {message}", enqueue=LOG_ENQUEUE)
+    if LOG_FILE:
+        logger.add(LOG_FILE, level=LOG_LEVEL, rotation="100 MB", retention=10, serialize=LOG_JSON, enqueue=LOG_ENQUEUE)
+    return logger
+
+
+def _summarize(value: Any, max_items: int, max_chars: int) -> str:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}...({len(value)} chars)"
+    if isinstance(value, np.ndarray):
+        if value.ndim == 1 and value.size > max_items:
+            return f"<vector dim={value.size} head={np.round(value[:3], 4).tolist()}>"
+        if value.ndim > 1:
+            return f"<ndarray shape={value.shape} dtype={value.dtype}>"
+        return str(value.tolist())
+    if isinstance(value, dict):
+        items = list(value.items())
+        body = ", ".join(f"{key}: {_summarize(item, max_items, max_chars)}" for key, item in items[:max_items])
+        more = f", ...(+{len(items) - max_items})" if len(items) > max_items else ""
+        return "{" + body + more + "}"
+    if hasattr(value, "model_fields"):
+        return f"{type(value).__name__}{_summarize(dict(value), max_items, max_chars)}"
+    if isinstance(value, (list, tuple)):
+        if len(value) > max_items and all(isinstance(item, Number) for item in value[:max_items]):
+            return f"<vector dim={len(value)} head={[round(float(item), 4) for item in value[:3]]}>"
+        body = ", ".join(_summarize(item, max_items, max_chars) for item in value[:max_items])
+        more = f", ...(+{len(value) - max_items})" if len(value) > max_items else ""
+        return "[" + body + more + "]"
+    return str(value)
+
+
+class summarize:
+    """
+    日志参数包装：只有记录真正输出时才把向量/检索结果/响应对象格式化为限长摘要
+    用法：logger.debug("Search results: {}", summarize(results))
+    """
+    __slots__ = ("value", "max_items", "max_chars")
+
+    def __init__(self, value: Any, max_items: int = LOG_MAX_ITEMS, max_chars: int = LOG_MAX_CHARS):
+        self.value = value
+        self.max_items = max_items
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        text = _summarize(self.value, self.max_items, self.max_chars)
+        return text if len(text) <= self.max_chars else f"{text[:self.max_chars]}...({len(text)} chars)"
+
+    def __format__(self, format_spec: str) -> str:
+        return format(str(self), format_spec)
+
+
+def log_verbose(message: str, *args, level: str = "DEBUG", rate: float = LOG_SAMPLE_RATE):
+    """
+    记录大块内容（完整检索结果、响应体等），按采样率抽样输出
+    参数应为 summarize(...) 包装或普通标量，避免在未输出时做格式化
+    """
+    if rate >= 1 or (rate > 0 and random.random() < rate):
+        logger.opt(depth=1).log(level, message, *args)
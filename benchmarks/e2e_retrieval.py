@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端检索基准：在进程内启动服务，用合成的组件信息表压测真实检索接口，输出可在不同提交之间对比的JSON结果
+
+后端：
+    --backend fake    NumPy实现的 Milvus 替身（benchmarks.fake_milvus），不需要 Milvus 服务
+    --backend milvus  连接 MILVUS_HOST:MILVUS_PORT 上的 Milvus / Milvus Lite；
+                      Component_Table 已存在时直接使用已有数据，--reseed 时删除后重新写入合成数据
+
+场景（--scenarios）：
+    components         /rerank/Retrieval_In_Componets_Table，不重排
+    components_rerank  同上，use_reranker=true
+    retrieval_v2       /retrieval_v2/retrieval
+    transaction        /TransactionRetrieval/transaction_retrieval
+    dataitem           /DataItem_retrieval/dataitem_retrieval
+路由未挂载时尝试导入对应模块并挂载，导入失败的场景在结果中记录 skipped 原因
+
+每个场景报告客户端测得的 p50/p95/p99、RPS、错误数，以及服务端 rag_stage_duration_seconds 指标
+在压测时段内的分阶段耗时（每请求调用次数、每请求耗时）。--compare 指定基线结果时附带与基线的比值
+
+用法：python -m benchmarks.e2e_retrieval --rows 20000 --requests 200 --concurrency 8 --output result.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SYSTEMS = ["核心系统", "信贷系统", "柜面系统", "网银系统", "支付系统"]
+ACTIONS = ["查询", "新增", "修改", "冻结", "解冻", "挂失", "销户", "开立", "生成", "校验"]
+OBJECTS = [
+    "个人活期存款账户编号", "零存整取账户编号", "教育储蓄账户编号", "二类账户编号", "三类账户编号",
+    "个人支票账户编号", "保证金活期账户", "账户币种", "证件类型", "身份证号码", "账户详情", "现金存款",
+]
+TYPES = ["查询类", "交易类", "工具类"]
+COMPONENT_TABLE = "Component_Table"
+
+SCENARIOS = {
+    "components": ("/rerank/Retrieval_In_Componets_Table", "app.api.rerank_endpoints", "rerank"),
+    "components_rerank": ("/rerank/Retrieval_In_Componets_Table", "app.api.rerank_endpoints", "rerank"),
+    "retrieval_v2": ("/retrieval_v2/retrieval", "app.api.retrieval_v2", "rerank"),
+    "transaction": ("/TransactionRetrieval/transaction_retrieval", "app.api.TransactionRetrieval", "v3"),
+    "dataitem": ("/DataItem_retrieval/dataitem_retrieval", "app.api.DataItem_retrieval", "v3"),
+}
+
+
+def component_name(rng: random.Random, index: int) -> str:
+    return f"{rng.choice(ACTIONS)}{rng.choice(OBJECTS)}{index}"
+
+
+def build_table(rows: int, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    names = [component_name(rng, i) for i in range(rows)]
+    return {
+        "组件名称": names,
+        "组件ID": [f"C{i:07d}" for i in range(rows)],
+        "组件类型": [rng.choice(TYPES) for _ in range(rows)],
+        "交易系统": [SYSTEMS[i % len(SYSTEMS)] for i in range(rows)],
+        "组件说明": [f"{name}，返回处理结果" for name in names],
+    }
+
+
+def seed_components(table: Dict[str, List[str]], files: int, vectors: str, reseed: bool) -> Dict[str, Any]:
+    """按 files 个文件写入组件信息表，返回写入行数和耗时；已有数据且未指定 reseed 时跳过"""
+    from app.Utils.embedding_utils import embedding_model, l2_normalize
+    from app.Utils.milvus_utils_v2 import My_MilvusClient
+
+    client = My_MilvusClient(dim=embedding_model.dim, collection_name=COMPONENT_TABLE)
+    if client.client.has_collection(COMPONENT_TABLE):
+        if not reseed:
+            rows = int(client.client.get_collection_stats(COMPONENT_TABLE).get("row_count", 0))
+            return {"rows": rows, "seconds": 0.0, "reused": True}
+        client.client.drop_collection(COMPONENT_TABLE)
+
+    start = time.time()
+    total = len(table["组件名称"])
+    if vectors == "model":
+        embeddings = embedding_model.encode_batched(table["组件名称"])
+    else:
+        # 随机单位向量：只关心检索链路耗时，不关心召回质量，省去大表编码时间
+        embeddings = l2_normalize(np.random.default_rng(0).standard_normal((total, embedding_model.dim)).astype(np.float32))
+    bounds = np.linspace(0, total, files + 1, dtype=int)
+    for file_index, (file_start, file_end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        file_id = f"bench-file-{file_index:04d}"
+        for start_row in range(file_start, file_end, 1000):
+            end_row = min(start_row + 1000, file_end)
+            chunk = {key: values[start_row:end_row] for key, values in table.items()}
+            client.insert_documents(chunk, embeddings[start_row:end_row], file_id, f"组件信息表{file_index}.xlsx")
+    return {"rows": total, "seconds": time.time() - start, "reused": False}
+
+
+class QuestionFactory:
+    """按测试案例格式生成问题：&&系统&& 标注交易系统，<组件> 标注要检索的组件，命中率之外的组件为表中不存在的名称"""
+
+    def __init__(self, names: List[str], components: int, hit_rate: float, seed: int):
+        self.names = names
+        self.components = components
+        self.hit_rate = hit_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def __call__(self) -> str:
+        with self.lock:
+            self.counter += 1
+            picks = [
+                self.rng.choice(self.names) if self.names and self.rng.random() < self.hit_rate
+                else component_name(self.rng, 10 ** 7 + self.rng.randint(0, 10 ** 6))
+                for _ in range(self.components)
+            ]
+            system = self.rng.choice(SYSTEMS)
+            counter = self.counter
+        steps = "\n".join(f"{i + 2}、进入<{name}>交易" for i, name in enumerate(picks))
+        return f"#测试意图：基准请求{counter}\n#操作步骤：\n1、登录&&{system}&&\n{steps}\n"
+
+
+def build_payload(kind: str, question: str, args, use_reranker: bool) -> Dict[str, Any]:
+    if kind == "v3":
+        return {
+            "Question": question, "RerankTopK": args.top_k, "InitialFilterScores": args.filter_score,
+            "InitialTopK": args.initial_top_k, "UseReranker": use_reranker,
+        }
+    return {
+        "question": question, "top_k": args.top_k, "filter_scores": args.filter_score,
+        "initial_top_k": args.initial_top_k, "use_reranker": use_reranker,
+    }
+
+
+def mount(app, path: str, module: str) -> Optional[str]:
+    """确保路由已挂载，返回 None；无法挂载时返回原因"""
+    if any(getattr(route, "path", None) == path for route in app.routes):
+        return None
+    try:
+        app.include_router(importlib.import_module(module).router)
+    except Exception as e:
+        return f"{module} 导入失败: {type(e).__name__}: {e}"
+    if not any(getattr(route, "path", None) == path for route in app.routes):
+        return f"{module} 中没有路由 {path}"
+    return None
+
+
+def start_server(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def wait_ready(port: int, timeout: float) -> float:
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5).read()
+            return time.time() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise TimeoutError(f"{timeout}s 内服务未就绪")
+
+
+def post(port: int, path: str, payload: Dict[str, Any]) -> Tuple[float, int]:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        urllib.request.urlopen(request, timeout=300).read()
+        status = 200
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def stage_breakdown(before: Dict, after: Dict, endpoint: str, requests: int) -> Dict[str, Dict[str, float]]:
+    """压测时段内该接口各阶段的 每请求调用次数 / 每请求耗时 / 单次平均耗时"""
+    stages: Dict[str, List[float]] = {}
+    for labels, (count, total) in after.items():
+        stage, label_endpoint = labels[0], labels[1]
+        if label_endpoint != endpoint:
+            continue
+        previous_count, previous_total = before.get(labels, (0, 0.0))
+        entry = stages.setdefault(stage, [0, 0.0])
+        entry[0] += count - previous_count
+        entry[1] += total - previous_total
+    return {
+        stage: {
+            "calls_per_request": count / requests,
+            "ms_per_request": total * 1000 / requests,
+            "mean_ms": total * 1000 / count if count else 0.0,
+        }
+        for stage, (count, total) in sorted(stages.items(), key=lambda item: -item[1][1])
+        if count
+    }
+
+
+def run_scenario(port: int, path: str, make_payload: Callable[[], Dict[str, Any]], args) -> Dict[str, Any]:
+    from app.Utils.Metrics import STAGE_LATENCY
+
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(lambda _: post(port, path, make_payload()), range(args.warmup)))
+        before = STAGE_LATENCY.totals()
+        start = time.perf_counter()
+        results = list(executor.map(lambda _: post(port, path, make_payload()), range(args.requests)))
+        elapsed = time.perf_counter() - start
+        after = STAGE_LATENCY.totals()
+    latencies = np.array([latency for latency, _ in results])
+    errors = sum(1 for _, status in results if status != 200)
+    return {
+        "path": path,
+        "requests": args.requests,
+        "errors": errors,
+        "rps": args.requests / elapsed,
+        "mean_ms": float(latencies.mean() * 1000),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "stages": stage_breakdown(before, after, path, args.requests),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """当前结果 / 基线结果，延迟类指标小于1、rps大于1表示变快"""
+    comparison = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        comparison[name] = {
+            key: current[key] / previous[key]
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+            if previous.get(key)
+        }
+    return comparison
+
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端检索基准")
+    parser.add_argument("--backend", choices=["fake", "milvus"], default="fake")
+    parser.add_argument("--scenarios", default="components,components_rerank,retrieval_v2,transaction,dataitem")
+    parser.add_argument("--rows", type=int, default=20000, help="合成组件信息表的行数")
+    parser.add_argument("--files", type=int, default=10, help="合成数据分成的文件数（file_id 个数）")
+    parser.add_argument("--vectors", choices=["random", "model"], default="random", help="表中向量来源：随机单位向量或嵌入模型编码")
+    parser.add_argument("--reseed", action="store_true", help="milvus 后端下删除已有的 Component_Table 重新写入")
+    parser.add_argument("--components", type=int, default=3, help="每个问题中的组件数")
+    parser.add_argument("--hit-rate", type=float, default=0.8, help="问题中的组件取自表中已有名称的比例")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--initial-top-k", type=int, default=10)
+    parser.add_argument("--filter-score", type=float, default=-1.0, help="初始检索过滤阈值，默认保留全部命中")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="保留检索结果缓存（默认关闭，测的是未命中缓存的链路）")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    parser.add_argument("--compare", help="基线结果JSON，附带与基线的比值")
+    args = parser.parse_args()
+
+    # 配置在导入 app 时读取，必须先设置环境变量
+    os.environ["QUERY_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.backend == "fake":
+        from benchmarks import fake_milvus
+        fake_milvus.install()
+
+    from main import app
+    from app.config import MILVUS_HOST, MILVUS_PORT
+
+    table = build_table(args.rows, args.seed)
+    seed = seed_components(table, args.files, args.vectors, args.reseed)
+    server, thread = start_server(app, args.port)
+    try:
+        ready_seconds = wait_ready(args.port, args.timeout)
+        questions = QuestionFactory(table["组件名称"], args.components, args.hit_rate, args.seed)
+        scenarios = {}
+        for name in [name.strip() for name in args.scenarios.split(",") if name.strip()]:
+            path, module, kind = SCENARIOS[name]
+            reason = mount(app, path, module)
+            if reason:
+                scenarios[name] = {"path": path, "skipped": reason}
+                continue
+            use_reranker = name.endswith("_rerank")
+            scenarios[name] = run_scenario(args.port, path, lambda: build_payload(kind, questions(), args, use_reranker), args)
+            print(f"{name}: {scenarios[name]['rps']:.1f} rps, p95 {scenarios[name]['p95_ms']:.1f}ms", file=sys.stderr)
+    finally:
+        server.should_exit = True
+        thread.join(30)
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "backend": args.backend if args.backend == "fake" else f"milvus://{MILVUS_HOST}:{MILVUS_PORT}",
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "seed": seed,
+        "ready_seconds": ready_seconds,
+        "scenarios": scenarios,
+    }
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
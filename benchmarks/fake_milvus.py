@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy实现的进程内 Milvus 替身，覆盖本项目用到的 MilvusClient 接口（建表/索引/插入/检索/查询/删除/加载状态）
+
+检索为暴力精确检索，度量取自索引配置（IP / COSINE / L2）；过滤表达式转成 Python 表达式逐行求值，
+同一表达式的命中掩码缓存到下次写入为止。用于在没有 Milvus 服务的机器上跑端到端基准，
+延迟特征与真实 Milvus 不同，对比不同提交时应使用同一种后端
+
+用法：在导入 app 之前调用 install()，之后所有 `from pymilvus import MilvusClient` 拿到的都是替身
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pymilvus
+from pymilvus import DataType, MilvusClient
+from pymilvus.client.types import LoadState
+
+_TOKEN = re.compile(r"&&|\|\||\bNOT\b|\bAND\b|\bOR\b|\bIN\b")
+_REPLACEMENTS = {"&&": " and ", "||": " or ", "AND": " and ", "OR": " or ", "NOT": " not ", "IN": " in "}
+
+
+def _compile_filter(expression: str):
+    expression = (expression or "").strip()
+    if not expression:
+        return None
+    if " like " in expression.lower():
+        raise NotImplementedError(f"替身不支持 like 表达式: {expression}")
+    return compile(_TOKEN.sub(lambda m: _REPLACEMENTS[m.group(0)], expression), "<filter>", "eval")
+
+
+class _Collection:
+    def __init__(self, name: str, fields: List[Dict[str, Any]], auto_id: bool, dynamic: bool):
+        self.name = name
+        self.fields = fields
+        self.auto_id = auto_id
+        self.dynamic = dynamic
+        self.primary = next(field["name"] for field in fields if field.get("is_primary"))
+        self.vector_fields = [field["name"] for field in fields if field["type"] == DataType.FLOAT_VECTOR]
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+        self.loaded = True
+        self.rows: List[Dict[str, Any]] = []
+        self.vectors: Dict[str, List[np.ndarray]] = {field: [] for field in self.vector_fields}
+        self.next_id = 1
+        self.version = 0
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+
+    def metric(self, field: str) -> str:
+        for index in self.indexes.values():
+            if index["field_name"] == field:
+                return index["metric_type"]
+        return "COSINE"
+
+    def matrix(self, field: str) -> np.ndarray:
+        matrix = self._matrices.get(field)
+        if matrix is None:
+            vectors = self.vectors[field]
+            dim = next(int(f["params"]["dim"]) for f in self.fields if f["name"] == field)
+            matrix = np.vstack(vectors).astype(np.float32) if vectors else np.empty((0, dim), dtype=np.float32)
+            if self.metric(field) == "COSINE":
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms > 0, norms, 1)
+            self._matrices[field] = matrix
+        return matrix
+
+    def mask(self, expression: str) -> Optional[np.ndarray]:
+        code = _compile_filter(expression)
+        if code is None:
+            return None
+        mask = self._masks.get(expression)
+        if mask is None:
+            mask = np.fromiter(
+                (bool(eval(code, {"__builtins__": {}}, row)) for row in self.rows), dtype=bool, count=len(self.rows)
+            )
+            self._masks[expression] = mask
+        return mask
+
+    def changed(self):
+        self.version += 1
+        self._matrices.clear()
+        self._masks.clear()
+
+
+class FakeMilvusClient(MilvusClient):
+    """进程内共享同一份数据，多个客户端实例看到的知识库相同（与连接同一个 Milvus 服务一致）"""
+
+    _collections: Dict[str, _Collection] = {}
+    _lock = threading.RLock()
+
+    def __init__(self, uri: str = "", *args, **kwargs):
+        self.uri = uri
+
+    # ---- 知识库 ----
+
+    def has_collection(self, collection_name: str, **kwargs) -> bool:
+        return collection_name in self._collections
+
+    def list_collections(self, **kwargs) -> List[str]:
+        return list(self._collections)
+
+    def create_collection(self, collection_name: str, dimension: Optional[int] = None, primary_field_name: str = "id",
+                          id_type: str = "int", vector_field_name: str = "vector", metric_type: str = "COSINE",
+                          auto_id: bool = False, schema=None, index_params=None, **kwargs):
+        with self._lock:
+            if collection_name in self._collections:
+                return
+            if schema is None:
+                fields = [
+                    {"name": primary_field_name, "type": DataType.INT64 if id_type == "int" else DataType.VARCHAR,
+                     "params": {}, "is_primary": True, "auto_id": auto_id},
+                    {"name": vector_field_name, "type": DataType.FLOAT_VECTOR, "params": {"dim": dimension}},
+                ]
+                collection = _Collection(collection_name, fields, auto_id, dynamic=True)
+                collection.indexes[vector_field_name] = {
+                    "field_name": vector_field_name, "index_name": vector_field_name,
+                    "index_type": "AUTOINDEX", "metric_type": metric_type,
+                }
+            else:
+                fields = [
+                    {"name": field.name, "type": field.dtype, "params": dict(field.params),
+                     "is_primary": field.is_primary, "auto_id": field.auto_id}
+                    for field in schema.fields
+                ]
+                auto_id = schema.auto_id or any(field.auto_id for field in schema.fields)
+                collection = _Collection(collection_name, fields, auto_id, dynamic=schema.enable_dynamic_field)
+            self._collections[collection_name] = collection
+            if index_params is not None:
+                self.create_index(collection_name, index_params)
+
+    def describe_collection(self, collection_name: str, **kwargs) -> Dict[str, Any]:
+        collection = self._get(collection_name)
+        return {
+            "collection_name": collection_name,
+            "auto_id": collection.auto_id,
+            "fields": [dict(field) for field in collection.fields],
+            "enable_dynamic_field": collection.dynamic,
+        }
+
+    def drop_collection(self, collection_name: str, **kwargs):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+
+    def get_collection_stats(self, collection_name: str, **kwargs) -> Dict[str, Any]:
+        return {"row_count": len(self._get(collection_name).rows)}
+
+    def load_collection(self, collection_name: str, **kwargs):
+        self._get(collection_name).loaded = True
+
+    def release_collection(self, collection_name: str, **kwargs):
+        self._get(collection_name).loaded = False
+
+    def get_load_state(self, collection_name: str, **kwargs) -> Dict[str, Any]:
+        return {"state": LoadState.Loaded if self._get(collection_name).loaded else LoadState.NotLoad}
+
+    # ---- 索引 ----
+
+    def create_index(self, collection_name: str, index_params, **kwargs):
+        collection = self._get(collection_name)
+        with self._lock:
+            for index in index_params:
+                name = index.get("index_name") or index["field_name"]
+                collection.indexes[name] = {
+                    "field_name": index["field_name"], "index_name": name,
+                    "index_type": index.get("index_type") or "AUTOINDEX",
+                    "metric_type": index.get("metric_type") or "COSINE",
+                    **{key: str(value) for key, value in (index.get("params") or {}).items()},
+                }
+            collection.changed()
+
+    def list_indexes(self, collection_name: str, field_name: Optional[str] = "", **kwargs) -> List[str]:
+        indexes = self._get(collection_name).indexes
+        return [name for name, index in indexes.items() if not field_name or index["field_name"] == field_name]
+
+    def describe_index(self, collection_name: str, index_name: str, **kwargs) -> Dict[str, Any]:
+        return dict(self._get(collection_name).indexes[index_name])
+
+    def drop_index(self, collection_name: str, index_name: str, **kwargs):
+        collection = self._get(collection_name)
+        with self._lock:
+            collection.indexes.pop(index_name, None)
+            collection.changed()
+
+    # ---- 数据 ----
+
+    def insert(self, collection_name: str, data, **kwargs) -> Dict[str, Any]:
+        collection = self._get(collection_name)
+        rows = [data] if isinstance(data, dict) else list(data)
+        ids = []
+        with self._lock:
+            for row in rows:
+                row = dict(row)
+                if collection.auto_id:
+                    row[collection.primary] = collection.next_id
+                    collection.next_id += 1
+                for field in collection.vector_fields:
+                    collection.vectors[field].append(np.asarray(row.pop(field), dtype=np.float32))
+                collection.rows.append(row)
+                ids.append(row[collection.primary])
+            collection.changed()
+        return {"insert_count": len(rows), "ids": ids}
+
+    def upsert(self, collection_name: str, data, **kwargs) -> Dict[str, Any]:
+        rows = [data] if isinstance(data, dict) else list(data)
+        primary = self._get(collection_name).primary
+        self.delete(collection_name, ids=[row[primary] for row in rows])
+        result = self.insert(collection_name, rows)
+        return {"upsert_count": result["insert_count"]}
+
+    def delete(self, collection_name: str, ids=None, filter: Optional[str] = "", **kwargs) -> Dict[str, Any]:
+        collection = self._get(collection_name)
+        with self._lock:
+            if ids is not None:
+                wanted = set(ids if isinstance(ids, list) else [ids])
+                keep = np.array([row[collection.primary] not in wanted for row in collection.rows], dtype=bool)
+            else:
+                mask = collection.mask(filter)
+                keep = np.zeros(len(collection.rows), dtype=bool) if mask is None else ~mask
+            deleted = int(len(collection.rows) - keep.sum())
+            collection.rows = [row for row, kept in zip(collection.rows, keep) if kept]
+            for field in collection.vector_fields:
+                collection.vectors[field] = [vector for vector, kept in zip(collection.vectors[field], keep) if kept]
+            collection.changed()
+        return {"delete_count": deleted}
+
+    def _entity(self, collection: _Collection, index: int, output_fields: Optional[List[str]]) -> Dict[str, Any]:
+        row = collection.rows[index]
+        if not output_fields:
+            return {collection.primary: row[collection.primary]}
+        entity = {}
+        for field in output_fields:
+            if field == "*":
+                entity.update(row)
+            elif field in collection.vectors:
+                entity[field] = collection.vectors[field][index].tolist()
+            elif field in row:
+                entity[field] = row[field]
+        return entity
+
+    def query(self, collection_name: str, filter: str = "", output_fields: Optional[List[str]] = None,
+              ids=None, limit: Optional[int] = None, offset: int = 0, **kwargs) -> List[Dict[str, Any]]:
+        collection = self._get(collection_name)
+        with self._lock:
+            if ids is not None:
+                wanted = set(ids if isinstance(ids, list) else [ids])
+                indices = [i for i, row in enumerate(collection.rows) if row[collection.primary] in wanted]
+            else:
+                mask = collection.mask(filter)
+                indices = range(len(collection.rows)) if mask is None else np.flatnonzero(mask)
+            indices = list(indices)[offset:offset + limit if limit else None]
+            fields = [collection.primary] + [field for field in (output_fields or []) if field != collection.primary]
+            return [self._entity(collection, i, fields) for i in indices]
+
+    def search(self, collection_name: str, data, filter: str = "", limit: int = 10,
+               output_fields: Optional[List[str]] = None, anns_field: Optional[str] = None, **kwargs) -> List[List[Dict[str, Any]]]:
+        collection = self._get(collection_name)
+        field = anns_field or collection.vector_fields[0]
+        with self._lock:
+            matrix = collection.matrix(field)
+            mask = collection.mask(filter)
+            metric = collection.metric(field)
+            candidates = np.arange(len(matrix)) if mask is None else np.flatnonzero(mask)
+            subset = matrix if mask is None else matrix[candidates]
+            results = []
+            for query in np.asarray(data, dtype=np.float32).reshape(-1, matrix.shape[1]):
+                if metric == "L2":
+                    scores = -np.sum((subset - query) ** 2, axis=1)
+                else:
+                    if metric == "COSINE":
+                        norm = np.linalg.norm(query)
+                        query = query / norm if norm > 0 else query
+                    scores = subset @ query
+                count = min(limit, len(scores))
+                top = np.argpartition(-scores, count - 1)[:count] if count else np.empty(0, dtype=int)
+                top = top[np.argsort(-scores[top], kind="stable")]
+                results.append([
+                    {
+                        "id": collection.rows[candidates[i]][collection.primary],
+                        "distance": float(-scores[i] if metric == "L2" else scores[i]),
+                        "entity": self._entity(collection, candidates[i], output_fields),
+                    }
+                    for i in top
+                ])
+            return results
+
+    def _get(self, collection_name: str) -> _Collection:
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            raise pymilvus.MilvusException(message=f"collection not found[collection={collection_name}]")
+        return collection
+
+
+def install():
+    """把 pymilvus.MilvusClient 替换为替身，必须在导入 app 之前调用"""
+    pymilvus.MilvusClient = FakeMilvusClient
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+操作图序列生成基准：networkx 逐步遍历 与 编译后的索引图（CompiledGraph）在不同规模随机图上的单次调用延迟
+
+- 图：--nodes 个组件，每个组件 --out-degree 条出边，出边概率随机并按节点归一化（与从日志统计的转移概率一致）
+- 对比：
+    networkx    原实现：每一步重新收集 successors 并取最大权重
+    compiled    CSR + 预计算的最佳后继表，不缓存
+    memoized    compiled + 按 (起点, 最大长度, 最小概率) 缓存
+    top_k       最佳优先搜索返回概率最高的 --k 条完整路径，不缓存；top_k_memoized 为缓存后
+  compiled 与 networkx 在每个起点上的结果必须一致，否则以非零状态码退出
+
+用法：python -m benchmarks.graph_engine --nodes 100,1000,5000 --out-degree 4 --output graph.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.e2e_retrieval import git_revision
+
+
+def build_edges(nodes: List[str], out_degree: int, rng: random.Random) -> List[tuple]:
+    edges = []
+    for node in nodes:
+        targets = rng.sample(nodes, min(out_degree, len(nodes)))
+        weights = [rng.random() ** 2 for _ in targets]
+        total = sum(weights)
+        edges += [(node, target, weight / total) for target, weight in zip(targets, weights) if target != node]
+    return edges
+
+
+def networkx_sequence(graph, start: str, max_length: int, min_prob: float) -> List[str]:
+    """原实现的贪心遍历，作为对照"""
+    path, visited, current = [start], {start}, start
+    for _ in range(max_length - 1):
+        neighbors = [(n, graph[current][n]['weight']) for n in graph.successors(current)]
+        if not neighbors:
+            break
+        next_node, prob = max(neighbors, key=lambda x: x[1])
+        if prob < min_prob or next_node in visited:
+            break
+        path.append(next_node)
+        visited.add(next_node)
+        current = next_node
+    return path
+
+
+def timed(run: Callable[[str], Any], starts: List[str], repeat: int) -> Dict[str, float]:
+    latencies = []
+    for _ in range(repeat):
+        for start in starts:
+            begin = time.perf_counter()
+            run(start)
+            latencies.append(time.perf_counter() - begin)
+    latencies = np.array(latencies) * 1e6
+    return {"p50_us": float(np.percentile(latencies, 50)), "p95_us": float(np.percentile(latencies, 95)),
+            "mean_us": float(latencies.mean())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="操作图序列生成基准")
+    parser.add_argument("--nodes", default="100,1000,5000")
+    parser.add_argument("--out-degree", type=int, default=4)
+    parser.add_argument("--max-length", type=int, default=10)
+    parser.add_argument("--min-prob", type=float, default=0.3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--starts", type=int, default=200, help="每个规模随机抽取的起点数")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    args = parser.parse_args()
+
+    from loguru import logger
+
+    from app.Utils.graph_utils import CompiledGraph, OperationGraph
+
+    logger.remove()
+    rng = random.Random(args.seed)
+    results, mismatches = [], 0
+    for size in [int(size) for size in args.nodes.split(",")]:
+        nodes = [f"组件名称： 组件{i:05d}" for i in range(size)]
+        build_start = time.perf_counter()
+        graph = OperationGraph(nodes, build_edges(nodes, args.out_degree, rng))
+        compile_ms = (time.perf_counter() - build_start) * 1000
+        starts = rng.sample(graph.compiled.nodes, min(args.starts, size))
+        uncached = CompiledGraph(graph.G, cache_size=0)
+        index = graph.compiled.index
+
+        for start in starts:
+            expected = networkx_sequence(graph.G, start, args.max_length, args.min_prob)
+            if graph.generate_sequence(start, args.max_length, args.min_prob) != expected:
+                mismatches += 1
+        row = {
+            "nodes": size,
+            "edges": graph.G.number_of_edges(),
+            "build_ms": compile_ms,
+            "networkx": timed(lambda start: networkx_sequence(graph.G, start, args.max_length, args.min_prob), starts, args.repeat),
+            "compiled": timed(lambda start: uncached.sequence(index[start], args.max_length, args.min_prob), starts, args.repeat),
+            "memoized": timed(lambda start: graph.compiled.sequence(index[start], args.max_length, args.min_prob), starts, args.repeat),
+            "top_k": timed(lambda start: uncached.top_k(index[start], args.k, args.max_length, args.min_prob), starts, args.repeat),
+            "top_k_memoized": timed(lambda start: graph.compiled.top_k(index[start], args.k, args.max_length, args.min_prob), starts, args.repeat),
+        }
+        results.append(row)
+        print(f"{size} 个节点: networkx {row['networkx']['p50_us']:.1f}us, compiled {row['compiled']['p50_us']:.1f}us, "
+              f"memoized {row['memoized']['p50_us']:.2f}us, top_{args.k} {row['top_k']['p50_us']:.1f}us / {row['top_k_memoized']['p50_us']:.2f}us", file=sys.stderr)
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "out_degree": args.out_degree,
+            "max_length": args.max_length,
+            "min_prob": args.min_prob,
+            "k": args.k,
+        },
+        "results": results,
+        "mismatches": mismatches,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    if mismatches:
+        print(f"{mismatches} 个起点的编译图序列与 networkx 遍历不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
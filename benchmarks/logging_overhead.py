@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志开销基准：模拟一次组件检索请求（每个组件：查询向量 + Milvus原始命中 + 处理后结果 + 响应体）
+对比改造前（INFO级别f-string输出完整向量/结果）与改造后（限长摘要 + 采样 + 异步sink）的单请求耗时
+
+用法：python -m benchmarks.logging_overhead --requests 200 --components 8
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from loguru import logger
+
+from app.logger import summarize, log_verbose
+
+
+def make_request_payload(components: int, top_k: int, dim: int):
+    payload = []
+    for c in range(components):
+        embedding = [random.uniform(-1, 1) for _ in range(dim)]
+        hits = [
+            {
+                "id": f"{c}-{i}",
+                "distance": random.random(),
+                "entity": {
+                    "file_id": "f7c1d1de-2b1f-4c1e-9c55-1f2d0b6a7e11",
+                    "file_name": "组件信息表.xlsx",
+                    "zu_jian_ID": f"C{i:05d}",
+                    "zu_jian_ming_cheng": f"查询个人活期存款账户编号{i}",
+                    "zu_jian_lei_xing": "查询类",
+                    "jiao_yi_xi_tong": "核心系统",
+                    "zu_jian_shuo_ming": "根据客户证件号码查询名下正常状态的个人活期存款账户编号，返回账户编号列表" * 2,
+                },
+            }
+            for i in range(top_k)
+        ]
+        results = [(hit["entity"], hit["distance"]) for hit in hits]
+        payload.append((embedding, hits, results))
+    return payload
+
+
+def request_before(payload):
+    for embedding, hits, results in payload:
+        logger.info(f"Query embedding: {embedding}")
+        logger.info(f"Search results: {hits}")
+        logger.info(f"Search results with normalized scores: {results}")
+    logger.info(f"完成重排序,结果 : {payload}")
+
+
+def request_after(payload):
+    for embedding, hits, results in payload:
+        logger.debug("Query embedding: {}", summarize(embedding))
+        log_verbose("Search results: {}", summarize(hits))
+        logger.debug("Search results with normalized scores: {}", summarize(results))
+    log_verbose("完成重排序,结果 : {}", summarize(payload))
+
+
+def run(fn, payload, requests: int, sink: str, enqueue: bool) -> float:
+    logger.remove()
+    handler = logger.add(sink, level="INFO", format="{time} {level} {message}", enqueue=enqueue)
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn(payload)
+    elapsed = time.perf_counter() - start
+    logger.remove(handler)  # 等待异步队列写完，保证下一轮不受影响
+    return elapsed / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志开销基准")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--components", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=1024)
+    args = parser.parse_args()
+
+    payload = make_request_payload(args.components, args.top_k, args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = os.path.join(tmp, "bench.log")
+        report = {
+            "components_per_request": args.components,
+            "before_sync_us": run(request_before, payload, args.requests, sink, enqueue=False),
+            "before_enqueue_us": run(request_before, payload, args.requests, sink, enqueue=True),
+            "after_sync_us": run(request_after, payload, args.requests, sink, enqueue=False),
+            "after_enqueue_us": run(request_after, payload, args.requests, sink, enqueue=True),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
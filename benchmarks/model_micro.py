@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型微基准：EmbeddingModel.encode 和 RerankerModel.rerank 在 批大小 × 序列长度 × 线程数 × 推理后端 上的吞吐、延迟和内存
+
+推理后端（--backends）：
+    fp32           默认 eager 推理
+    bf16           权重转为 bfloat16（CPU 需支持 AVX512-BF16/AMX 才有收益）
+    int8           torch 动态量化，Linear 层权重 int8
+    torchscript    MODEL_COMPILE=torchscript
+    torch_compile  MODEL_COMPILE=torch_compile
+    onnx           导出为 ONNX 后用 onnxruntime 推理（未安装 onnxruntime 时记为 skipped）
+
+每个 后端 × 线程数 在独立子进程中运行（线程数和峰值内存互不影响），报告每个形状的 p50/p95 延迟、
+每秒处理条数，以及进程加载后 RSS 和峰值 RSS。fidelity 为同一批探针文本上与 fp32 的一致性：
+嵌入向量的最小余弦相似度、重排分数的最大绝对误差
+
+EMBEDDING_MODEL_PATH / RERANKER_MODEL_PATH 不存在时自动生成小型测试模型（benchmarks.tiny_models）
+
+用法：python -m benchmarks.model_micro --batch-sizes 1,8,32 --seq-lengths 32,128,512 --threads 1,4 --output micro.json --csv micro.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.e2e_retrieval import git_revision
+
+BACKENDS = ["fp32", "bf16", "int8", "torchscript", "torch_compile", "onnx"]
+PROBES = ["查询个人活期存款账户编号", "现金存款", "根据账户编号查询账户详情信息，包括余额，状态等信息", "登录", "查询冻结的个人活期存款账户编号"]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class OnnxForward:
+    """把 HF 模型导出为 ONNX，用 onnxruntime 推理，接口与 CompiledForward 一致：inputs -> 第一个输出张量"""
+
+    def __init__(self, model, tokenizer, threads: int):
+        import onnxruntime
+        import torch
+
+        from app.Utils.Model_Warmup import _FirstOutput, _INPUT_NAMES
+
+        example = tokenizer(["预热文本" * 4, "预热"], padding=True, return_tensors="pt")
+        self.names = [name for name in _INPUT_NAMES if name in example]
+        path = os.path.join(tempfile.mkdtemp(prefix="onnx-"), "model.onnx")
+        torch.onnx.export(
+            _FirstOutput(model, self.names), tuple(example[name] for name in self.names), path,
+            input_names=self.names, output_names=["output"], opset_version=17, dynamo=False,
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in self.names}, "output": {0: "batch"}},
+        )
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def __call__(self, inputs):
+        import torch
+
+        feeds = {name: inputs[name].cpu().numpy() for name in self.names}
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+
+def apply_backend(instance, name: str, backend: str, threads: int):
+    """在已加载的 EmbeddingModel / RerankerModel 上切换推理后端（torchscript/torch_compile 由 MODEL_COMPILE 在加载时处理）"""
+    import torch
+
+    from app.Utils.Model_Warmup import CompiledForward
+
+    if backend == "bf16":
+        instance.model.to(torch.bfloat16)
+    elif backend == "int8":
+        instance.model = torch.ao.quantization.quantize_dynamic(instance.model, {torch.nn.Linear}, dtype=torch.qint8)
+        instance._infer = CompiledForward(name, instance.model, instance.tokenizer, instance.device, mode="none")
+    elif backend == "onnx":
+        instance._infer = OnnxForward(instance.model, instance.tokenizer, threads)
+
+
+def measure(run, repeat: int) -> List[float]:
+    run()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_worker(args) -> Dict[str, Any]:
+    import torch
+
+    torch.set_num_threads(args.threads)
+    from app.Utils.Model_Warmup import warmup_text
+    from app.Utils.embedding_utils import EmbeddingModel
+    from app.Utils.reranker_utils import RerankerModel
+
+    embedding = EmbeddingModel()
+    reranker = RerankerModel()
+    apply_backend(embedding, "embedding", args.backend, args.threads)
+    apply_backend(reranker, "reranker", args.backend, args.threads)
+    load_rss = rss_mb()
+
+    rows = []
+    for seq_len in [int(size) for size in args.seq_lengths.split(",")]:
+        text = warmup_text(seq_len)
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            # 每批文本各不相同（末尾编号），避免任何层面的缓存
+            workloads = {
+                "embedding": lambda: embedding.encode([f"{i}{text}"[:len(text)] for i in range(batch_size)]),
+                "reranker": lambda: reranker.rerank("查询个人活期存款账户编号", [f"{i}{text}"[:len(text)] for i in range(batch_size)]),
+            }
+            for model, run in workloads.items():
+                latencies = np.array(measure(run, args.repeat))
+                rows.append({
+                    "model": model, "backend": args.backend, "threads": args.threads,
+                    "batch_size": batch_size, "seq_len": seq_len,
+                    "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                    "p95_ms": float(np.percentile(latencies, 95) * 1000),
+                    "items_per_second": float(batch_size / np.median(latencies)),
+                })
+    probes = {
+        "embedding": embedding.encode(PROBES).tolist(),
+        "reranker": [score for _, score in sorted(reranker.rerank(PROBES[0], PROBES), key=lambda item: PROBES.index(item[0]))],
+    }
+    return {
+        "backend": args.backend,
+        "threads": args.threads,
+        "load_rss_mb": load_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "rows": rows,
+        "probes": probes,
+    }
+
+
+def fidelity(result: Dict[str, Any], reference: Dict[str, Any]) -> Dict[str, float]:
+    vectors = np.array(result["probes"]["embedding"], dtype=np.float32)
+    expected = np.array(reference["probes"]["embedding"], dtype=np.float32)
+    cosine = np.sum(vectors * expected, axis=1) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(expected, axis=1))
+    score_diff = np.abs(np.array(result["probes"]["reranker"]) - np.array(reference["probes"]["reranker"]))
+    return {"embedding_min_cosine": float(cosine.min()), "reranker_max_score_diff": float(score_diff.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EmbeddingModel / RerankerModel 微基准")
+    parser.add_argument("--backends", default="fp32,bf16,int8,torchscript,onnx")
+    parser.add_argument("--threads", default=",".join(sorted({"1", str(os.cpu_count() or 1)}, key=int)))
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--seq-lengths", default="32,128,512")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--models-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".models"),
+                        help="真实权重不存在时生成测试模型的目录")
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    parser.add_argument("--csv", help="结果CSV写入的文件（每个 模型×后端×线程×形状 一行）")
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_output:
+        args.threads = int(args.threads)
+        with open(args.worker_output, "w", encoding="utf-8") as f:
+            json.dump(run_worker(args), f, ensure_ascii=False)
+        return
+
+    from app.config import EMBEDDING_MODEL_PATH, RERANKER_MODEL_PATH
+
+    env = dict(os.environ, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"), EMBEDDING_CACHE_SIZE="0",
+               INFERENCE_MODE="local", MODEL_COMPILE="none")
+    models = {"embedding": EMBEDDING_MODEL_PATH, "reranker": RERANKER_MODEL_PATH}
+    if not (os.path.isdir(EMBEDDING_MODEL_PATH) and os.path.isdir(RERANKER_MODEL_PATH)):
+        from benchmarks.tiny_models import ensure_tiny_models
+
+        models["embedding"], models["reranker"] = ensure_tiny_models(args.models_dir)
+        env.update(EMBEDDING_MODEL_PATH=models["embedding"], RERANKER_MODEL_PATH=models["reranker"])
+        print(f"未找到模型权重，使用测试模型 {args.models_dir}", file=sys.stderr)
+
+    results, skipped = [], []
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        if backend not in BACKENDS:
+            raise SystemExit(f"未知的推理后端: {backend}")
+        for threads in [int(count) for count in args.threads.split(",")]:
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+                output_path = handle.name
+            worker_env = dict(env, MODEL_COMPILE=backend) if backend in ("torchscript", "torch_compile") else env
+            command = [sys.executable, "-m", "benchmarks.model_micro", "--backend", backend, "--threads", str(threads),
+                       "--batch-sizes", args.batch_sizes, "--seq-lengths", args.seq_lengths, "--repeat", str(args.repeat),
+                       "--worker-output", output_path]
+            completed = subprocess.run(command, env=worker_env, stderr=subprocess.PIPE, text=True)
+            try:
+                if completed.returncode != 0:
+                    reason = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"退出码 {completed.returncode}"
+                    skipped.append({"backend": backend, "threads": threads, "reason": reason})
+                    print(f"{backend} × {threads} 线程跳过: {reason}", file=sys.stderr)
+                    continue
+                with open(output_path, "r", encoding="utf-8") as f:
+                    results.append(json.load(f))
+                print(f"{backend} × {threads} 线程完成，峰值RSS {results[-1]['peak_rss_mb']:.0f}MB", file=sys.stderr)
+            finally:
+                os.unlink(output_path)
+
+    references = {result["threads"]: result for result in results if result["backend"] == "fp32"}
+    for result in results:
+        if result["threads"] in references:
+            result["fidelity"] = fidelity(result, references[result["threads"]])
+    rows = [
+        {**row, "load_rss_mb": result["load_rss_mb"], "peak_rss_mb": result["peak_rss_mb"], **result.get("fidelity", {})}
+        for result in results for row in result["rows"]
+    ]
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "cpu_count": os.cpu_count(),
+            "models": models,
+            "repeat": args.repeat,
+        },
+        "runs": [{key: value for key, value in result.items() if key not in ("rows", "probes")} for result in results],
+        "skipped": skipped,
+        "rows": rows,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    if args.csv and rows:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程部署基准：分别以 1/2/4/8 个工作进程启动服务，压测同一接口，记录 RPS、延迟和进程组内存
+
+内存同时报告 RSS 之和与 PSS 之和：RSS 会把写时复制共享的权重页在每个进程里各算一次，
+PSS 按共享进程数分摊，更接近真实占用（读取 /proc/<pid>/smaps_rollup，仅 Linux）
+
+--mode prefork：python main.py --workers N（主进程加载模型后fork）
+--mode uvicorn：uvicorn main:app --workers N（每个工作进程各自加载模型，作为对照）
+
+用法：python -m benchmarks.multi_worker --workers 1,2,4,8 --requests 400 --concurrency 16
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+WORDS = ["查询", "个人", "活期", "存款", "账户", "编号", "冻结", "挂失", "销户", "证件", "类型", "币种", "现金", "交易", "组件", "客户"]
+
+
+def random_question() -> str:
+    # 每次请求使用不同的问题，避免命中查询缓存
+    return "".join(random.choices(WORDS, k=random.randint(3, 8))) + str(random.randint(0, 10 ** 6))
+
+
+def process_tree(root: int) -> List[int]:
+    pids = [root]
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_mb(root: int) -> Dict[str, float]:
+    rss = pss = 0
+    for pid in process_tree(root):
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return {"rss_mb": rss / 1024, "pss_mb": pss / 1024}
+
+
+def wait_ready(port: int, workers: int, timeout: float) -> float:
+    """轮询 /ready 直到 workers 个不同的工作进程都报告就绪"""
+    start = time.time()
+    ready = set()
+    while time.time() - start < timeout:
+        try:
+            status = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5).read())
+            ready.add(status["pid"])
+            if len(ready) >= workers:
+                return time.time() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"{timeout}s 内只有 {len(ready)}/{workers} 个工作进程就绪")
+
+
+def post(port: int, path: str) -> float:
+    body = json.dumps({"question": random_question()}).encode()
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    urllib.request.urlopen(request, timeout=120).read()
+    return time.perf_counter() - start
+
+
+def run_load(port: int, path: str, requests: int, concurrency: int) -> Dict[str, float]:
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(lambda _: post(port, path), range(concurrency)))  # 每个连接先跑一次
+        start = time.perf_counter()
+        latencies = np.array(list(executor.map(lambda _: post(port, path), range(requests))))
+        elapsed = time.perf_counter() - start
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def bench(workers: int, args) -> Dict[str, float]:
+    env = dict(os.environ, QUERY_CACHE_ENABLED="false", LOG_LEVEL="WARNING")
+    if args.mode == "prefork":
+        command = [sys.executable, "main.py", "--workers", str(workers), "--port", str(args.port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers), "--port", str(args.port), "--log-level", "warning"]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_seconds = wait_ready(args.port, workers, args.timeout)
+        idle = memory_mb(server.pid)
+        result = run_load(args.port, args.path, args.requests, args.concurrency)
+        loaded = memory_mb(server.pid)
+        return {
+            "workers": workers,
+            "ready_seconds": ready_seconds,
+            **result,
+            "idle_rss_mb": idle["rss_mb"],
+            "idle_pss_mb": idle["pss_mb"],
+            "loaded_rss_mb": loaded["rss_mb"],
+            "loaded_pss_mb": loaded["pss_mb"],
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程部署基准")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--mode", choices=["prefork", "uvicorn"], default="prefork")
+    parser.add_argument("--path", default="/rerank/single")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    report = {
+        "mode": args.mode,
+        "path": args.path,
+        "cpu_count": os.cpu_count(),
+        "runs": [bench(int(workers), args) for workers in args.workers.split(",")],
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
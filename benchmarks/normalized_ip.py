@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+归一化向量 + IP度量基准：验证与 原始向量 + COSINE度量 的检索排序一致，并对比两者的耗时
+
+1. NumPy暴力检索：原始向量的余弦（点积除以模长） vs 归一化向量矩阵点积，比较每个查询的 top_k 排序和分数
+2. Milvus（FLAT索引，精确检索）：同一批数据分别建 COSINE 和 IP 两个知识库，比较命中ID顺序和分数
+3. 有效性校验：改造前逐对计算余弦（每次求两次范数）vs 改造后一次矩阵点积
+
+排序不一致时以非零状态码退出；单元测试见 app/Tests/test_normalized_similarity.py
+
+用法：python -m benchmarks.normalized_ip --rows 20000 --queries 200 --dim 1024 [--no-milvus]
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.Utils.embedding_utils import l2_normalize, cosine_similarities
+from app.config import MILVUS_HOST, MILVUS_PORT
+
+
+def pairwise_cosine(query: np.ndarray, matrix: np.ndarray) -> List[float]:
+    """改造前的做法：逐对计算余弦相似度"""
+    return [float(np.dot(query, row) / (np.linalg.norm(query) * np.linalg.norm(row))) for row in matrix]
+
+
+def timed(func, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # 稳定排序保证分数相同的行按行号排列，两种度量的并列情况一致
+    return np.argsort(-scores, axis=-1, kind="stable")[..., :k]
+
+
+def raw_cosine(queries: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """原始向量的余弦相似度：点积除以两侧模长，不经过 l2_normalize"""
+    norms = np.outer(np.linalg.norm(queries, axis=1), np.linalg.norm(vectors, axis=1))
+    return (queries @ vectors.T) / norms
+
+
+def bench_numpy(vectors: np.ndarray, queries: np.ndarray, normalized: np.ndarray, k: int) -> Dict[str, float]:
+    unit_queries = l2_normalize(queries)
+    raw_scores = raw_cosine(queries, vectors)
+    ip_scores = cosine_similarities(unit_queries.T, normalized, normalized=True).T
+    mismatches = int(np.sum(np.any(top_k(raw_scores, k) != top_k(ip_scores, k), axis=1)))
+    return {
+        "mismatched_queries": mismatches,
+        "max_score_diff": float(np.max(np.abs(raw_scores - ip_scores))),
+        "cosine_seconds": timed(lambda: raw_cosine(queries, vectors)),
+        "ip_seconds": timed(lambda: unit_queries @ normalized.T),
+    }
+
+
+def bench_milvus(vectors: np.ndarray, queries: np.ndarray, normalized: np.ndarray, k: int) -> Dict[str, float]:
+    from pymilvus import MilvusClient
+
+    client = MilvusClient(uri=f"http://{MILVUS_HOST}:{MILVUS_PORT}")
+    dim = vectors.shape[1]
+    names = {"COSINE": "bench_normalized_cosine", "IP": "bench_normalized_ip"}
+    data = {"COSINE": vectors, "IP": normalized}
+    query_data = {"COSINE": queries, "IP": l2_normalize(queries)}
+    results, timings = {}, {}
+    try:
+        for metric, name in names.items():
+            if client.has_collection(name):
+                client.drop_collection(name)
+            client.create_collection(name, dimension=dim, metric_type=metric, auto_id=False, consistency_level="Strong")
+            # 默认索引为近似检索，换成FLAT保证两种度量都是精确结果
+            client.release_collection(name)
+            client.drop_index(name, "vector")
+            index_params = client.prepare_index_params()
+            index_params.add_index(field_name="vector", index_type="FLAT", metric_type=metric)
+            client.create_index(name, index_params)
+            client.load_collection(name)
+            for start in range(0, len(vectors), 1000):
+                rows = data[metric][start:start + 1000]
+                client.insert(name, [{"id": start + i, "vector": row} for i, row in enumerate(rows)])
+
+            hits = client.search(name, data=query_data[metric], limit=k, output_fields=["id"])
+            results[metric] = [[(hit["id"], hit["distance"]) for hit in query_hits] for query_hits in hits]
+            timings[metric] = timed(lambda: client.search(name, data=query_data[metric], limit=k))
+    finally:
+        for name in names.values():
+            if client.has_collection(name):
+                client.drop_collection(name)
+
+    mismatches, max_diff = 0, 0.0
+    for cosine_hits, ip_hits in zip(results["COSINE"], results["IP"]):
+        if [hit[0] for hit in cosine_hits] != [hit[0] for hit in ip_hits]:
+            # 分数几乎相同的相邻命中交换位置不算排序错误
+            cosine_scores = np.array([hit[1] for hit in cosine_hits])
+            ip_scores = np.array([hit[1] for hit in ip_hits])
+            if np.max(np.abs(cosine_scores - ip_scores)) > 1e-5 or set(h[0] for h in cosine_hits) != set(h[0] for h in ip_hits):
+                mismatches += 1
+        max_diff = max(max_diff, max(abs(a[1] - b[1]) for a, b in zip(cosine_hits, ip_hits)))
+    return {
+        "mismatched_queries": mismatches,
+        "max_score_diff": float(max_diff),
+        "cosine_seconds": timings["COSINE"],
+        "ip_seconds": timings["IP"],
+    }
+
+
+def bench_validation(vectors: np.ndarray, normalized: np.ndarray, candidates: int) -> Dict[str, float]:
+    query = vectors[0]
+    raw = vectors[:candidates]
+    unit = normalized[:candidates]
+    unit_query = l2_normalize(query)
+    before = pairwise_cosine(query, raw)
+    after = cosine_similarities(unit_query, unit, normalized=True)
+    return {
+        "candidates": candidates,
+        "max_score_diff": float(np.max(np.abs(np.array(before) - after))),
+        "pairwise_seconds": timed(lambda: pairwise_cosine(query, raw)),
+        "matrix_dot_seconds": timed(lambda: cosine_similarities(unit_query, unit, normalized=True)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="归一化向量 + IP度量基准")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=50, help="有效性校验中每次比较的候选数")
+    parser.add_argument("--no-milvus", action="store_true", help="只做NumPy对比，不连接Milvus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # 模长随机缩放：未归一化时 IP 与 COSINE 排序不同，归一化后必须一致
+    vectors = (rng.standard_normal((args.rows, args.dim)) * rng.uniform(0.1, 10, (args.rows, 1))).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    normalized = l2_normalize(vectors)
+
+    report = {
+        "rows": args.rows,
+        "queries": args.queries,
+        "dim": args.dim,
+        "numpy": bench_numpy(vectors, queries, normalized, args.top_k),
+        "validation": bench_validation(vectors, normalized, args.candidates),
+    }
+    if not args.no_milvus:
+        report["milvus"] = bench_milvus(vectors, queries, normalized, args.top_k)
+    for section in ("numpy", "milvus"):
+        if section in report:
+            report[section]["speedup"] = report[section]["cosine_seconds"] / report[section]["ip_seconds"]
+    report["validation"]["speedup"] = report["validation"]["pairwise_seconds"] / report["validation"]["matrix_dot_seconds"]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    failed = [section for section in ("numpy", "milvus") if report.get(section, {}).get("mismatched_queries")]
+    if failed:
+        print(f"排序不一致: {failed}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
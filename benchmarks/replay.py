@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流量回放压测：按录制文件（TRAFFIC_RECORD_FILE，见 app/Utils/Traffic_Recorder.py）中请求的到达间隔回放到目标实例
+
+- 开环回放：第 i 条请求计划在 (ts_i - ts_0) / rate 秒时发出，不等待前面的请求返回；
+  --rates 1,2,4,8 依次按原速率的倍数回放，用来找饱和点
+- 延迟从计划发出时间算起（包含客户端排队），避免服务变慢时压测端也跟着降速而低估延迟；
+  service_ms 为实际发出到返回的耗时
+- 每个速率 × 接口报告 p50/p95/p99、错误率、实际吞吐与计划吞吐之比；
+  吞吐比低于 --min-throughput-ratio、p95 超过 --slo-ms 或错误率超过 --max-error-rate 的第一个速率记为饱和点
+
+用法：python -m benchmarks.replay traffic.jsonl --target http://127.0.0.1:8012 --rates 1,2,4 --concurrency 32 --output replay.json
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.e2e_retrieval import git_revision
+
+
+def load_records(path: str, paths: List[str], limit: int) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("body") is None and record.get("body_bytes"):
+                continue  # 请求体过大未录制，无法回放
+            if paths and not record["path"].startswith(tuple(paths)):
+                continue
+            records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+def send(target: str, record: Dict[str, Any], timeout: float) -> int:
+    url = f"{target}{record['path']}" + (f"?{record['query']}" if record.get("query") else "")
+    body = record.get("body")
+    data = None if body is None else (json.dumps(body, ensure_ascii=False) if not isinstance(body, str) else body).encode("utf-8")
+    request = urllib.request.Request(url, data=data, method=record["method"], headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return 0
+
+
+def replay(records: List[Dict[str, Any]], target: str, rate: float, concurrency: int, timeout: float) -> List[Dict[str, Any]]:
+    """按 rate 倍速开环回放，返回每条请求的接口、状态、计划延迟和服务耗时"""
+    origin = records[0]["ts"]
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def run(record: Dict[str, Any], scheduled: float):
+        sent = time.perf_counter()
+        status = send(target, record, timeout)
+        done = time.perf_counter()
+        with lock:
+            results.append({
+                "path": record["path"],
+                "status": status,
+                "latency_ms": (done - scheduled) * 1000,
+                "service_ms": (done - sent) * 1000,
+                "done": done,
+            })
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        start = time.perf_counter()
+        for record in records:
+            scheduled = start + (record["ts"] - origin) / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(run, record, scheduled)
+    for result in results:
+        result["done"] -= start
+    return results
+
+
+def summarize(results: List[Dict[str, Any]], offered_seconds: float) -> Dict[str, Any]:
+    latencies = np.array([result["latency_ms"] for result in results])
+    service = np.array([result["service_ms"] for result in results])
+    errors = sum(1 for result in results if not 200 <= result["status"] < 300)
+    elapsed = max(result["done"] for result in results)
+    return {
+        "requests": len(results),
+        "error_rate": errors / len(results),
+        "offered_rps": len(results) / offered_seconds if offered_seconds > 0 else None,
+        "achieved_rps": len(results) / elapsed if elapsed > 0 else None,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "service_p50_ms": float(np.percentile(service, 50)),
+        "service_p95_ms": float(np.percentile(service, 95)),
+    }
+
+
+def saturated(summary: Dict[str, Any], args) -> List[str]:
+    reasons = []
+    if summary["offered_rps"] and summary["achieved_rps"] / summary["offered_rps"] < args.min_throughput_ratio:
+        reasons.append(f"吞吐 {summary['achieved_rps']:.1f}/{summary['offered_rps']:.1f} rps")
+    if args.slo_ms and summary["p95_ms"] > args.slo_ms:
+        reasons.append(f"p95 {summary['p95_ms']:.0f}ms > {args.slo_ms}ms")
+    if summary["error_rate"] > args.max_error_rate:
+        reasons.append(f"错误率 {summary['error_rate']:.1%}")
+    return reasons
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制流量回放压测")
+    parser.add_argument("record_file")
+    parser.add_argument("--target", default="http://127.0.0.1:8012")
+    parser.add_argument("--rates", default="1", help="相对原始到达速率的倍数，逗号分隔依次回放")
+    parser.add_argument("--concurrency", type=int, default=32, help="最大并发请求数，超出的请求在客户端排队")
+    parser.add_argument("--paths", default="", help="只回放这些前缀的接口（逗号分隔）")
+    parser.add_argument("--limit", type=int, default=0, help="最多回放的请求数，0表示全部")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--slo-ms", type=float, default=0, help="p95 延迟目标，0表示不按延迟判断饱和")
+    parser.add_argument("--min-throughput-ratio", type=float, default=0.9)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    args = parser.parse_args()
+
+    records = load_records(args.record_file, [path for path in args.paths.split(",") if path], args.limit)
+    if not records:
+        raise SystemExit(f"{args.record_file} 中没有可回放的请求")
+    span = records[-1]["ts"] - records[0]["ts"]
+
+    runs = []
+    saturation: Dict[str, Any] = {}
+    for rate in [float(rate) for rate in args.rates.split(",")]:
+        results = replay(records, args.target, rate, args.concurrency, args.timeout)
+        endpoints = {}
+        for path in sorted({result["path"] for result in results}):
+            endpoint_results = [result for result in results if result["path"] == path]
+            endpoints[path] = summarize(endpoint_results, span / rate)
+            reasons = saturated(endpoints[path], args)
+            if reasons and path not in saturation:
+                saturation[path] = {"rate": rate, "reasons": reasons}
+        overall = summarize(results, span / rate)
+        runs.append({"rate": rate, "overall": overall, "endpoints": endpoints})
+        print(f"x{rate}: {overall['achieved_rps']:.1f} rps, p95 {overall['p95_ms']:.0f}ms, 错误率 {overall['error_rate']:.1%}")
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": args.target,
+            "record_file": args.record_file,
+            "records": len(records),
+            "recorded_seconds": span,
+            "concurrency": args.concurrency,
+        },
+        "runs": runs,
+        "saturation": saturation,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索质量 × 延迟基准：用标注好的测试步骤（步骤 → 期望的组件名称/交易名称）评估不同配置下的召回质量
+
+- 知识库：仓库中的 组件信息表.xlsx，用嵌入模型编码后写入 Component_Table（fake 后端每次重建；
+  milvus 后端已有数据时直接使用，--reseed 时删除后重建）
+- 标注集（benchmarks/golden/*.jsonl，每行一个用例）：
+      {"step": "存款账户信息查询", "system": "核心系统", "expected": ["账户详情查询"], "pipeline": "components"}
+  pipeline 为 components（/rerank/Retrieval_In_Componets_Table）或 transaction
+  （/TransactionRetrieval/transaction_retrieval，期望值为交易名称）；接口无法挂载时该流水线记为 skipped
+- 配置（benchmarks/golden/configs.json）：[{"name": ..., "env": {环境变量}, "request": {请求字段}}]
+  配置在导入时读取，每个配置在独立子进程中运行
+
+报告每个配置的 recall@k、MRR 和单步检索延迟；任何配置的 recall@k 或 MRR 比第一个配置（基线）
+低出 --tolerance 以上时以非零状态码退出。--baseline-file 指定历史结果时，同名配置也与历史结果比较
+
+用法：python -m benchmarks.retrieval_quality --configs benchmarks/golden/configs.json --output quality.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.e2e_retrieval import COMPONENT_TABLE, SCENARIOS, git_revision, mount, start_server, wait_ready
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(BENCHMARK_DIR, "golden")
+COMPONENT_FILE = os.path.join(os.path.dirname(BENCHMARK_DIR), "组件信息表.xlsx")
+
+
+def load_cases(paths: List[str]) -> List[Dict[str, Any]]:
+    cases = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    case = json.loads(line)
+                    case.setdefault("pipeline", "components")
+                    cases.append(case)
+    return cases
+
+
+def seed_component_table(reseed: bool) -> Dict[str, Any]:
+    """把 组件信息表.xlsx 编码后写入 Component_Table"""
+    import pandas as pd
+
+    from app.Utils.embedding_utils import embedding_model
+    from app.Utils.milvus_utils_v2 import My_MilvusClient
+
+    client = My_MilvusClient(dim=embedding_model.dim, collection_name=COMPONENT_TABLE)
+    if client.client.has_collection(COMPONENT_TABLE):
+        if not reseed:
+            return {"rows": int(client.client.get_collection_stats(COMPONENT_TABLE).get("row_count", 0)), "reused": True}
+        client.client.drop_collection(COMPONENT_TABLE)
+    table = pd.read_excel(COMPONENT_FILE, dtype=str).fillna("")
+    texts = {column: table[column].tolist() for column in table.columns}
+    embeddings = embedding_model.encode_batched(texts["组件名称"])
+    client.insert_documents(texts, embeddings, "golden-components", os.path.basename(COMPONENT_FILE))
+    return {"rows": len(table), "reused": False}
+
+
+def question_for(case: Dict[str, Any]) -> str:
+    return f"#测试意图：检索质量评估\n#操作步骤：\n1、登录&&{case['system']}&&\n2、进入<{case['step']}>交易\n"
+
+
+def ranked_names(pipeline: str, response: Dict[str, Any]) -> List[str]:
+    """按返回顺序取出候选名称（去重）"""
+    names = []
+    for hits in response.get("results", {}).values():
+        for hit in hits:
+            name = hit["component"]["组件名称"] if pipeline == "components" else (hit.get("Transaction") or {}).get("交易名称")
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+def request_case(port: int, pipeline: str, case: Dict[str, Any], max_k: int, overrides: Dict[str, Any]) -> Dict[str, Any]:
+    question = question_for(case)
+    if pipeline == "components":
+        payload = {"question": question, "top_k": max_k, "initial_top_k": max_k, "filter_scores": -1.0, "use_reranker": False}
+    else:
+        payload = {"Question": question, "RerankTopK": max_k, "InitialTopK": max_k, "InitialFilterScores": -1.0, "UseReranker": False}
+    payload.update(overrides)
+    path = SCENARIOS[pipeline][0]
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    response = json.loads(urllib.request.urlopen(request, timeout=300).read())
+    return {"latency": time.perf_counter() - start, "ranked": ranked_names(pipeline, response)}
+
+
+def score(cases: List[Dict[str, Any]], outcomes: List[Dict[str, Any]], ks: List[int]) -> Dict[str, Any]:
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    misses = []
+    for case, outcome in zip(cases, outcomes):
+        expected = set(case["expected"])
+        ranked = outcome["ranked"]
+        for k in ks:
+            recalls[k].append(len(expected & set(ranked[:k])) / len(expected))
+        rank = next((i + 1 for i, name in enumerate(ranked) if name in expected), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        if rank != 1:
+            misses.append({"step": case["step"], "expected": case["expected"], "top3": ranked[:3]})
+    latencies = np.array([outcome["latency"] for outcome in outcomes])
+    return {
+        "cases": len(cases),
+        **{f"recall@{k}": float(np.mean(values)) for k, values in recalls.items()},
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency_mean_ms": float(latencies.mean() * 1000),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "misses": misses,
+    }
+
+
+def run_worker(args, config: Dict[str, Any]) -> Dict[str, Any]:
+    """子进程：在本进程内启动服务，按配置跑完全部用例"""
+    os.environ["QUERY_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.backend == "fake":
+        from benchmarks import fake_milvus
+        fake_milvus.install()
+
+    from main import app
+
+    seed = seed_component_table(args.reseed or args.backend == "fake")
+    ks = sorted(int(k) for k in args.ks.split(","))
+    cases = load_cases(args.cases)
+    server, thread = start_server(app, args.port)
+    try:
+        wait_ready(args.port, args.timeout)
+        pipelines = {}
+        for pipeline in sorted({case["pipeline"] for case in cases}):
+            path, module, _ = SCENARIOS[pipeline]
+            selected = [case for case in cases if case["pipeline"] == pipeline]
+            reason = mount(app, path, module)
+            if reason:
+                pipelines[pipeline] = {"cases": len(selected), "skipped": reason}
+                continue
+            overrides = dict(config.get("request", {}))
+            if pipeline == "transaction" and "use_reranker" in overrides:
+                overrides["UseReranker"] = overrides.pop("use_reranker")
+            for case in selected[:args.warmup]:
+                request_case(args.port, pipeline, case, max(ks), overrides)
+            outcomes = [request_case(args.port, pipeline, case, max(ks), overrides) for case in selected]
+            pipelines[pipeline] = score(selected, outcomes, ks)
+    finally:
+        server.should_exit = True
+        thread.join(30)
+    return {"name": config["name"], "env": config.get("env", {}), "request": config.get("request", {}), "seed": seed, "pipelines": pipelines}
+
+
+def regressions(result: Dict[str, Any], reference: Dict[str, Any], tolerance: float, label: str) -> List[str]:
+    found = []
+    for pipeline, metrics in result["pipelines"].items():
+        previous = reference["pipelines"].get(pipeline)
+        if not previous or "skipped" in metrics or "skipped" in previous:
+            continue
+        for key, value in metrics.items():
+            if (key.startswith("recall@") or key == "mrr") and key in previous and previous[key] - value > tolerance:
+                found.append(f"{result['name']}/{pipeline} {key} {value:.3f} < {label} {previous[key]:.3f} - {tolerance}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索质量 × 延迟基准")
+    parser.add_argument("--backend", choices=["fake", "milvus"], default="fake")
+    parser.add_argument("--cases", nargs="+", default=[os.path.join(GOLDEN_DIR, "components.jsonl")])
+    parser.add_argument("--configs", default=os.path.join(GOLDEN_DIR, "configs.json"))
+    parser.add_argument("--only", help="只运行这些配置（逗号分隔的名称）")
+    parser.add_argument("--ks", default="1,3,5,10")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="recall@k / MRR 允许比基线低的幅度")
+    parser.add_argument("--reseed", action="store_true", help="milvus 后端下删除已有的 Component_Table 重建")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8097)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--baseline-file", help="历史结果JSON，同名配置也与之比较")
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    parser.add_argument("--worker-config", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_config:
+        result = run_worker(args, json.loads(args.worker_config))
+        with open(args.worker_output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        return
+
+    with open(args.configs, "r", encoding="utf-8") as f:
+        configs = json.load(f)
+    if args.only:
+        names = {name.strip() for name in args.only.split(",")}
+        configs = [config for config in configs if config["name"] in names]
+
+    results = []
+    for config in configs:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+            output_path = handle.name
+        try:
+            command = [sys.executable, "-m", "benchmarks.retrieval_quality", *sys.argv[1:],
+                       "--worker-config", json.dumps(config, ensure_ascii=False), "--worker-output", output_path]
+            env = {**os.environ, **{key: str(value) for key, value in config.get("env", {}).items()}}
+            subprocess.run(command, env=env, check=True)
+            with open(output_path, "r", encoding="utf-8") as f:
+                results.append(json.load(f))
+        finally:
+            os.unlink(output_path)
+        summary = {pipeline: {key: value for key, value in metrics.items() if key != "misses"}
+                   for pipeline, metrics in results[-1]["pipelines"].items()}
+        print(f"{config['name']}: {json.dumps(summary, ensure_ascii=False)}", file=sys.stderr)
+
+    failures = []
+    for result in results[1:]:
+        failures += regressions(result, results[0], args.tolerance, results[0]["name"])
+    if args.baseline_file:
+        with open(args.baseline_file, "r", encoding="utf-8") as f:
+            previous = {result["name"]: result for result in json.load(f)["configs"]}
+        for result in results:
+            if result["name"] in previous:
+                failures += regressions(result, previous[result["name"]], args.tolerance, "历史结果")
+
+    report = {
+        "meta": {**git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "backend": args.backend,
+                 "tolerance": args.tolerance, "cases": args.cases},
+        "configs": results,
+        "regressions": failures,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    if failures:
+        print("召回质量回退:\n" + "\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序列长度基准：在真实文本的长度分布上比较 固定截断 × 批内padding 与 按长度分桶 × 按用途截断 的推理开销
+
+- 长度分布：组件信息表.xlsx 各文本列 + 标注集（benchmarks/golden/*.jsonl）中的测试步骤，报告每个字段的
+  token 数 p50/p90/p99/max
+- 负载：embedding 为各文本列混合后的入库批次（--copies 份打乱），reranker 为每个测试步骤 × 全部组件名称和组件说明
+- 模式：
+    fixed       原实现：按到达顺序每 --batch-size 条一批，max_length=512，padding 到批内最长序列
+    bucketed    app.Utils.Sequence_Length.length_buckets 按长度分桶，截断只受模型上限约束
+    limited     分桶 + 按用途截断（--limits，默认取 TOKEN_LIMITS；embedding 按字段、reranker 按 passage）
+  报告每个模式的中位耗时、每秒条数、实际/padding token 数，以及与 fixed 的一致性
+  （嵌入向量最小余弦相似度、重排分数最大绝对误差）
+
+EMBEDDING_MODEL_PATH / RERANKER_MODEL_PATH 不存在时自动生成小型测试模型（benchmarks.tiny_models）
+
+用法：python -m benchmarks.sequence_length --batch-size 32 --copies 20 --limits passage=64,组件说明=64 --output lengths.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks.e2e_retrieval import git_revision
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPONENT_FILE = os.path.join(os.path.dirname(BENCHMARK_DIR), "组件信息表.xlsx")
+TEXT_FIELDS = ["组件名称", "交易名称", "组件说明", "功能描述"]
+FIXED_MAX_LENGTH = 512
+
+
+def load_fields(table: str, cases: List[str]) -> Dict[str, List[str]]:
+    import pandas as pd
+
+    frame = pd.read_excel(table).fillna("")
+    fields = {field: [str(text) for text in frame[field] if str(text).strip()] for field in TEXT_FIELDS if field in frame}
+    steps = []
+    for path in cases:
+        with open(path, "r", encoding="utf-8") as f:
+            steps += [json.loads(line)["step"] for line in f if line.strip()]
+    fields["query"] = steps
+    return fields
+
+
+def length_distribution(tokenizer, fields: Dict[str, List[str]]) -> Dict[str, Dict[str, float]]:
+    distribution = {}
+    for field, texts in fields.items():
+        lengths = np.array([len(ids) for ids in tokenizer(texts, truncation=True, max_length=FIXED_MAX_LENGTH)["input_ids"]])
+        distribution[field] = {
+            "count": len(texts),
+            "p50": float(np.percentile(lengths, 50)),
+            "p90": float(np.percentile(lengths, 90)),
+            "p99": float(np.percentile(lengths, 99)),
+            "max": int(lengths.max()),
+        }
+    return distribution
+
+
+def fixed_batches(tokenizer, encode: Callable, batch_size: int):
+    """原实现：按到达顺序分批，每批 padding 到批内最长序列"""
+    def run(items: List[Any]):
+        for start in range(0, len(items), batch_size):
+            indices = list(range(start, min(start + batch_size, len(items))))
+            inputs = encode([items[i] for i in indices], padding=True, return_tensors="pt")
+            lengths = inputs["attention_mask"].sum(dim=1)
+            yield indices, dict(inputs), int(lengths.sum()), int(inputs["attention_mask"].numel() - lengths.sum())
+    return run
+
+
+def bucketed_batches(tokenizer, encode: Callable, batch_size: int):
+    from app.Utils.Sequence_Length import length_buckets
+
+    def run(items: List[Any]):
+        for indices, inputs in length_buckets(tokenizer, encode(items), batch_size, "benchmark"):
+            lengths = inputs["attention_mask"].sum(dim=1)
+            yield indices, inputs, int(lengths.sum()), int(inputs["attention_mask"].numel() - lengths.sum())
+    return run
+
+
+def measure(instance, batches: Callable, items: List[Any], output: Callable, repeat: int) -> Tuple[Dict[str, Any], np.ndarray]:
+    import torch
+
+    def run() -> Tuple[np.ndarray, int, int]:
+        results: List[Any] = [None] * len(items)
+        real = padding = 0
+        for indices, inputs, batch_real, batch_padding in batches(items):
+            with torch.no_grad():
+                values = output(instance._infer(inputs))
+            for position, index in enumerate(indices):
+                results[index] = values[position]
+            real, padding = real + batch_real, padding + batch_padding
+        return np.stack(results), real, padding
+
+    run()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        values, real, padding = run()
+        latencies.append(time.perf_counter() - start)
+    seconds = float(np.median(latencies))
+    return {
+        "seconds": seconds,
+        "items_per_second": len(items) / seconds,
+        "real_tokens": real,
+        "padding_tokens": padding,
+        "padding_ratio": padding / (real + padding),
+    }, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按实际token长度分桶/截断的推理基准")
+    parser.add_argument("--table", default=COMPONENT_FILE, help="提供真实长度分布的组件表（Excel）")
+    parser.add_argument("--cases", nargs="*", default=sorted(glob.glob(os.path.join(BENCHMARK_DIR, "golden", "*.jsonl"))))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--copies", type=int, default=20, help="入库负载中组件表的份数（打乱后混合）")
+    parser.add_argument("--limits", default=None, help="limited 模式的截断token数，如 passage=64,组件说明=64；默认取 TOKEN_LIMITS")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--models-dir", default=os.path.join(BENCHMARK_DIR, ".models"), help="真实权重不存在时生成测试模型的目录")
+    parser.add_argument("--output", help="结果JSON写入的文件")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from app.config import EMBEDDING_MODEL_PATH, RERANKER_MODEL_PATH, TOKEN_LIMITS
+
+    if not (os.path.isdir(EMBEDDING_MODEL_PATH) and os.path.isdir(RERANKER_MODEL_PATH)):
+        from benchmarks.tiny_models import ensure_tiny_models
+
+        embedding_path, reranker_path = ensure_tiny_models(args.models_dir)
+        print(f"未找到模型权重，使用测试模型 {args.models_dir}", file=sys.stderr)
+        # 模型路径在导入 app.config 时读取，换成测试模型后重新启动
+        os.environ.update(EMBEDDING_MODEL_PATH=embedding_path, RERANKER_MODEL_PATH=reranker_path)
+        os.execv(sys.executable, [sys.executable, "-m", "benchmarks.sequence_length", *sys.argv[1:]])
+
+    from app.Utils.Sequence_Length import truncate_texts
+    from app.Utils.embedding_utils import EmbeddingModel
+    from app.Utils.reranker_utils import RerankerModel
+
+    limits = TOKEN_LIMITS if args.limits is None else {
+        name.strip(): int(limit) for name, limit in (item.split("=", 1) for item in args.limits.split(",") if "=" in item)
+    }
+    embedding, reranker = EmbeddingModel(), RerankerModel()
+    fields = load_fields(args.table, args.cases)
+    rng = random.Random(args.seed)
+
+    documents = [(field, text) for field, texts in fields.items() if field != "query" for text in texts] * args.copies
+    rng.shuffle(documents)
+    passages = [text for field in ("组件名称", "交易名称", "组件说明") for text in fields.get(field, [])]
+    pairs = [(step, passage) for step in fields["query"] for passage in passages]
+
+    def embed_encoder(limited: bool):
+        def encode(items, **kwargs):
+            texts = [text for _, text in items]
+            if limited:
+                texts = [truncate_texts(embedding.tokenizer, [text], limits.get(field))[0] for field, text in items]
+            return embedding.tokenizer(texts, truncation=True, max_length=FIXED_MAX_LENGTH, **kwargs)
+        return encode
+
+    def rerank_encoder(limited: bool):
+        def encode(items, **kwargs):
+            texts = [passage for _, passage in items]
+            if limited:
+                texts = truncate_texts(reranker.tokenizer, texts, limits.get("passage"))
+            return reranker.tokenizer([query for query, _ in items], texts, truncation=True, max_length=FIXED_MAX_LENGTH, **kwargs)
+        return encode
+
+    workloads = {
+        "embedding": (embedding, documents, lambda hidden: hidden[:, 0, :].float().cpu().numpy(), embed_encoder),
+        "reranker": (reranker, pairs, lambda logits: logits.view(-1).float().cpu().numpy(), rerank_encoder),
+    }
+    results = {}
+    for name, (instance, items, output, encoder) in workloads.items():
+        modes = {
+            "fixed": fixed_batches(instance.tokenizer, encoder(False), args.batch_size),
+            "bucketed": bucketed_batches(instance.tokenizer, encoder(False), args.batch_size),
+            "limited": bucketed_batches(instance.tokenizer, encoder(True), args.batch_size),
+        }
+        results[name] = {"items": len(items), "modes": {}}
+        reference = None
+        for mode, batches in modes.items():
+            summary, values = measure(instance, batches, items, output, args.repeat)
+            if reference is None:
+                reference = values
+            elif name == "embedding":
+                cosine = np.sum(values * reference, axis=1) / (np.linalg.norm(values, axis=1) * np.linalg.norm(reference, axis=1))
+                summary["min_cosine_vs_fixed"] = float(cosine.min())
+            else:
+                summary["max_score_diff_vs_fixed"] = float(np.abs(values - reference).max())
+            results[name]["modes"][mode] = summary
+            print(f"{name} {mode}: {summary['seconds'] * 1000:.0f}ms, {summary['items_per_second']:.0f} 条/秒, "
+                  f"padding {summary['padding_ratio']:.0%}", file=sys.stderr)
+        fixed = results[name]["modes"]["fixed"]["seconds"]
+        for summary in results[name]["modes"].values():
+            summary["speedup_vs_fixed"] = fixed / summary["seconds"]
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "table": args.table,
+            "batch_size": args.batch_size,
+            "copies": args.copies,
+            "limits": limits,
+            "models": {"embedding": EMBEDDING_MODEL_PATH, "reranker": RERANKER_MODEL_PATH},
+        },
+        "lengths": length_distribution(embedding.tokenizer, fields),
+        "workloads": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
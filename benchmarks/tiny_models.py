@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+本地生成的小型测试模型：随机初始化的 BERT 嵌入模型和交叉编码重排模型，结构和分词方式与 bge 系列一致
+（中文按字切分，[CLS] 向量 / 单输出 logits），用于没有真实权重的机器上跑基准，分数没有语义
+
+用法：python -m benchmarks.tiny_models --output ./benchmarks/.models
+"""
+
+import argparse
+import os
+from typing import Tuple
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def _vocab() -> list:
+    ascii_tokens = [chr(code) for code in range(33, 127)]
+    punctuation = list("，。！？；：、“”‘’（）《》【】…—·")
+    cjk = [chr(code) for code in range(0x4E00, 0x9FA6)]
+    return SPECIAL_TOKENS + ascii_tokens + punctuation + cjk
+
+
+def _save(model, directory: str):
+    from transformers import BertTokenizerFast
+
+    os.makedirs(directory, exist_ok=True)
+    vocab_path = os.path.join(directory, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(_vocab()) + "\n")
+    BertTokenizerFast(vocab_file=vocab_path, do_lower_case=True, tokenize_chinese_chars=True).save_pretrained(directory)
+    model.save_pretrained(directory)
+
+
+def ensure_tiny_models(directory: str, hidden_size: int = 1024, layers: int = 2, heads: int = 8, seed: int = 0) -> Tuple[str, str]:
+    """生成（或复用已生成的）嵌入模型和重排模型，返回两者的目录"""
+    embedding_path = os.path.join(directory, "embedding")
+    reranker_path = os.path.join(directory, "reranker")
+    if os.path.exists(os.path.join(embedding_path, "config.json")) and os.path.exists(os.path.join(reranker_path, "config.json")):
+        return embedding_path, reranker_path
+
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertModel
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(_vocab()), hidden_size=hidden_size, num_hidden_layers=layers, num_attention_heads=heads,
+        intermediate_size=hidden_size, max_position_embeddings=512, pad_token_id=0,
+    )
+    _save(BertModel(config).eval(), embedding_path)
+    config.num_labels = 1
+    _save(BertForSequenceClassification(config).eval(), reranker_path)
+    return embedding_path, reranker_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成小型测试模型")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".models"))
+    parser.add_argument("--hidden-size", type=int, default=1024)
+    parser.add_argument("--layers", type=int, default=2)
+    args = parser.parse_args()
+    embedding_path, reranker_path = ensure_tiny_models(args.output, args.hidden_size, args.layers)
+    print(f"EMBEDDING_MODEL_PATH={embedding_path}")
+    print(f"RERANKER_MODEL_PATH={reranker_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.logger import setup_logger
+from app.Utils.Metrics import metrics_middleware, instrument_serialization
+from app.Utils.Startup import startup_manager
+from app.Utils.Traffic_Recorder import traffic_recorder
+from app.Utils.Profiler import profiler, instrument_threadpool
 from app.api.rag_endpoints import router as rag_router
 from app.api.chat_endpoints import router as chat_router
 from app.api.document_endpoints import router as document_router
@@ -10,11 +16,24 @@ from app.api.rerank_endpoints import router as rerank_router
 from app.api.delete_endpoints import router as delete_router
 from app.api.collection_endpoints import router as collection_router
 from app.api.graph_retrieval_endpoints import router as graph_retrieval_router
+from app.api.metrics_endpoints import router as metrics_router
+from app.api.profile_endpoints import router as profile_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 模型和Milvus连接在后台线程中加载，端口立即可用；加载和预热完成后 /ready 才返回200
+    startup_manager.start()
+    yield
+    startup_manager.stop()
+    traffic_recorder.stop()
+
 
 app = FastAPI(
     title="RAG System API",
     version="1.0.0",
-    description="A simple Retrieval-Augmented Generation (RAG) system API"
+    description="A simple Retrieval-Augmented Generation (RAG) system API",
+    lifespan=lifespan
 )
 
 setup_logger()
@@ -28,6 +47,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 分阶段耗时指标
+app.middleware("http")(metrics_middleware)
+instrument_serialization()
+
+# 就绪前业务接口返回503（/health、/ready、/metrics 等除外）
+app.middleware("http")(startup_manager.middleware)
+
+# 流量录制（TRAFFIC_RECORD_FILE 非空时开启）
+if traffic_recorder.enabled:
+    app.middleware("http")(traffic_recorder.middleware)
+
+# 请求级采样剖析（请求头 X-Profile: 1 或 PROFILE_SAMPLE_RATE 触发，结果见 /profiles）
+if profiler.enabled:
+    app.middleware("http")(profiler.middleware)
+    instrument_threadpool()
+
 # 包含API路由
 app.include_router(rag_router)
 app.include_router(chat_router)
@@ -37,7 +72,24 @@ app.include_router(rerank_router)
 app.include_router(delete_router)
 app.include_router(collection_router)
 app.include_router(graph_retrieval_router)
+app.include_router(metrics_router)
+app.include_router(profile_router)
 
 if __name__ == "__main__":
+    import argparse
+
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8012)
+
+    from app.config import WORKERS
+    from app.Utils.Prefork import run_prefork
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="大于1时先在主进程加载模型再fork工作进程")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_prefork(app, args.host, args.port, args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)